@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CarrinhoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'carrinho'
+
+    def ready(self):
+        from . import signals  # noqa: F401
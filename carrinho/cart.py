@@ -1,18 +1,62 @@
+import hashlib
 from decimal import Decimal
 from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from produtos.condicional import ultima_alteracao_catalogo
+from produtos.fatias import estoque_real
 from produtos.models import Produto
 
+from . import codificacao, persistente, reservas
+
+# Número de itens do carrinho, mantido a cada alteração para o cabeçalho
+TOTAL_SESSION = getattr(settings, 'CARRINHO_TOTAL_SESSION', 'carrinho_total')
+# Resultado da última revalidação de preços, válido enquanto nem o catálogo nem o carrinho mudarem
+PRECOS_SESSION = getattr(settings, 'CARRINHO_PRECOS_SESSION', 'carrinho_precos')
+
+
+def descrever_alerta(alerta):
+    """Mensagem exibida ao cliente para um alerta da revalidação"""
+    if alerta['tipo'] == 'preco':
+        return f"O preço de {alerta['nome']} mudou de R$ {alerta['preco_anterior']} para R$ {alerta['preco_atual']}."
+    if alerta['tipo'] == 'removido':
+        return 'Um produto do seu carrinho não existe mais e foi removido.'
+    if alerta['tipo'] == 'indisponivel':
+        return f"{alerta['nome']} está indisponível no momento."
+    return f"{alerta['nome']}: restam apenas {alerta['disponivel']} unidade(s)."
+
 
 class Carrinho:
-    def __init__(self, request):
+    def __init__(self, request, usuario=None):
         """
-        Inicializa o carrinho com a sessão do usuário
+        Inicializa o carrinho com a sessão do usuário.
+
+        Usuários logados usam o carrinho do banco (carrinho.persistente);
+        itens que estejam na sessão, de antes do login, são mesclados a ele.
+        usuario serve ao sinal de login, quando request.user pode não existir.
         """
         self.session = request.session
-        carrinho = self.session.get(settings.CARRINHO_SESSION_ID)
-        if not carrinho:
-            carrinho = self.session[settings.CARRINHO_SESSION_ID] = {}
-        self.carrinho = carrinho
+        self._itens = None
+        usuario = usuario or getattr(request, 'user', None)
+        self.usuario = usuario if usuario is not None and usuario.is_authenticated else None
+        if self.usuario is not None:
+            guardado = self.session.pop(settings.CARRINHO_SESSION_ID, None)
+            if guardado is not None:
+                self.session.pop(TOTAL_SESSION, None)
+            self._carrinho_id, self.carrinho = persistente.mesclar(
+                self.usuario, codificacao.decodificar(guardado)
+            )
+            chave_visitante = reservas.descartar_chave(self.session)
+            if chave_visitante or guardado:
+                self._transferir_reservas(chave_visitante)
+            # Ressincroniza a contagem da sessão com o banco (outro aparelho pode ter mudado o carrinho)
+            self._guardar_total()
+            return
+        guardado = self.session.get(settings.CARRINHO_SESSION_ID)
+        if not guardado:
+            guardado = self.session[settings.CARRINHO_SESSION_ID] = {}
+        # Os itens ficam decodificados na instância; salvar() grava o formato compacto
+        self.carrinho = codificacao.decodificar(guardado)
     
     def adicionar(self, produto, quantidade=1, override_quantidade=False):
         """
@@ -30,10 +74,119 @@ class Carrinho:
         else:
             self.carrinho[produto_id]['quantidade'] += quantidade
         
+        if self.usuario is not None:
+            self._carrinho_id = persistente.gravar(
+                self.usuario, self._carrinho_id, produto_id, self.carrinho[produto_id]
+            )
+        self.salvar()
+        return self.reservar(produto.id)
+    
+    def aplicar_lote(self, operacoes, produtos):
+        """
+        Aplica várias alterações de uma vez.
+
+        operacoes é uma lista já validada de (produto_id, quantidade,
+        override) e produtos o in_bulk dos ids. Um item que termina com
+        quantidade 0 sai do carrinho. As gravações no banco (carrinho do
+        usuário e reservas) rodam em uma transação e o carrinho só muda
+        depois dela: ou o lote entra inteiro, ou nada muda. A sessão (ou o
+        carrinho no banco) é gravada uma única vez. Retorna {produto_id:
+        unidades reservadas}.
+        """
+        itens = {produto_id: dict(item) for produto_id, item in self.carrinho.items()}
+        gravados = {}
+        removidos = set()
+        for produto_id, quantidade, override in operacoes:
+            chave = str(produto_id)
+            item = itens.get(chave) or {'quantidade': 0, 'preco': None}
+            item['quantidade'] = quantidade if override else item['quantidade'] + quantidade
+            if item['quantidade'] > 0:
+                if item['preco'] is None:
+                    item['preco'] = str(produtos[produto_id].preco)
+                itens[chave] = gravados[chave] = item
+                removidos.discard(produto_id)
+            else:
+                itens.pop(chave, None)
+                gravados.pop(chave, None)
+                removidos.add(produto_id)
+        
+        with transaction.atomic():
+            carrinho_id = getattr(self, '_carrinho_id', None)
+            if self.usuario is not None:
+                if gravados:
+                    carrinho_id = persistente.gravar_varios(self.usuario, carrinho_id, gravados)
+                if removidos:
+                    persistente.apagar(carrinho_id, sorted(removidos))
+                chave_reservas = reservas.chave_usuario(carrinho_id) if carrinho_id is not None else None
+            else:
+                chave_reservas = reservas.chave_carrinho(self.session, criar=bool(gravados))
+            if removidos and chave_reservas:
+                reservas.liberar(chave_reservas, sorted(removidos))
+            reservados = {
+                int(chave): reservas.reservar(chave_reservas, int(chave), item['quantidade'])
+                for chave, item in gravados.items()
+            }
+        
+        if self.usuario is not None:
+            self._carrinho_id = carrinho_id
+        self.carrinho = itens
         self.salvar()
+        return reservados
+    
+    @property
+    def chave(self):
+        """
+        Identificador das reservas deste carrinho (None se nunca reservou).
+
+        Usuários logados reservam pelo carrinho do banco, visto por todas as
+        suas sessões; visitantes, por um identificador guardado na sessão.
+        """
+        if self.usuario is not None:
+            carrinho_id = getattr(self, '_carrinho_id', None)
+            return reservas.chave_usuario(carrinho_id) if carrinho_id is not None else None
+        return reservas.chave_carrinho(self.session, criar=False)
+    
+    def reservar(self, produto_id):
+        """
+        Reserva no estoque a quantidade do item por RESERVA_MINUTOS.
+        Retorna quantas unidades ficaram reservadas.
+        """
+        chave = self.chave if self.usuario is not None else reservas.chave_carrinho(self.session)
+        return reservas.reservar(chave, int(produto_id), self.carrinho[str(produto_id)]['quantidade'])
+    
+    def _transferir_reservas(self, chave_visitante):
+        """
+        Passa para o carrinho do usuário as reservas feitas antes do login.
+
+        As reservas do visitante são desfeitas e as quantidades mescladas
+        reservadas de novo, na mesma transação, com a chave do carrinho do banco.
+        """
+        with transaction.atomic():
+            if chave_visitante:
+                reservas.liberar(chave_visitante)
+            if self.chave:
+                for produto_id, item in self.carrinho.items():
+                    reservas.reservar(self.chave, int(produto_id), item['quantidade'])
+    
+    def _guardar_total(self):
+        total = sum(item['quantidade'] for item in self.carrinho.values())
+        if self.session.get(TOTAL_SESSION) != total:
+            self.session[TOTAL_SESSION] = total
     
     def salvar(self):
-        """Marca a sessão como modificada"""
+        """Marca a sessão como modificada e atualiza a contagem de itens"""
+        self._itens = None
+        if PRECOS_SESSION in self.session:
+            del self.session[PRECOS_SESSION]
+        if self.usuario is not None:
+            # O carrinho do banco é gravado item a item; a sessão guarda só a contagem
+            self._guardar_total()
+            return
+        if self.carrinho:
+            self.session[settings.CARRINHO_SESSION_ID] = codificacao.codificar(self.carrinho)
+        else:
+            self.session.pop(settings.CARRINHO_SESSION_ID, None)
+        self.session[TOTAL_SESSION] = sum(item['quantidade'] for item in self.carrinho.values())
         self.session.modified = True
     
     def remover(self, produto):
@@ -41,34 +194,167 @@ class Carrinho:
         produto_id = str(produto.id)
         if produto_id in self.carrinho:
             del self.carrinho[produto_id]
+            if self.usuario is not None:
+                persistente.apagar(self._carrinho_id, [produto.id])
             self.salvar()
+            if self.chave:
+                reservas.liberar(self.chave, [produto.id])
     
-    def __iter__(self):
+    def itens(self):
         """
-        Itera sobre os itens do carrinho obtendo os produtos do banco
+        Itens do carrinho com os produtos, carregados uma vez por instância.
+
+        Uma consulta (com a categoria, mais uma para as rendições se houver
+        imagens) serve todas as iterações, totais e templates da requisição;
+        qualquer alteração do carrinho descarta a lista. Os itens são
+        dicionários novos: nada disso vai para a sessão.
         """
-        produto_ids = self.carrinho.keys()
-        if not produto_ids:
-            return iter([])
-            
-        produtos = Produto.objects.filter(id__in=produto_ids)
-        carrinho = self.carrinho.copy()
-        
-        for produto in produtos:
-            carrinho[str(produto.id)]['produto'] = produto
-        
-        for item in carrinho.values():
-            if 'produto' in item:
-                item['preco'] = Decimal(item['preco'])
-                item['preco_total'] = item['preco'] * item['quantidade']
-                yield item
+        if self._itens is None:
+            produtos = Produto.objects.select_related('categoria').in_bulk(
+                [int(produto_id) for produto_id in self.carrinho]
+            )
+            # Rendições de todas as imagens de uma vez, para o imagem_produto do template
+            prefetch_related_objects([p for p in produtos.values() if p.imagem], 'rendicoes')
+            # Produtos fatiados: revalidar() compara com a soma das fatias
+            estoque_real(produtos.values())
+            self._itens = []
+            for produto_id, item in self.carrinho.items():
+                produto = produtos.get(int(produto_id))
+                if produto is None:
+                    continue
+                preco = Decimal(item['preco'])
+                self._itens.append({
+                    'produto': produto,
+                    'quantidade': item['quantidade'],
+                    'preco': preco,
+                    'preco_total': preco * item['quantidade'],
+                })
+        return self._itens
+    
+    def __iter__(self):
+        """Itera sobre os itens do carrinho (ver itens())"""
+        return iter(self.itens())
     
     def __len__(self):
         """Retorna o número total de itens no carrinho"""
-        return sum(item['quantidade'] for item in self.carrinho.values())
+        total = None if self.usuario is not None else self.session.get(TOTAL_SESSION)
+        if total is None:
+            total = sum(item['quantidade'] for item in self.carrinho.values())
+        return total
+    
+    @staticmethod
+    def contar(session, usuario=None):
+        """
+        Número de itens guardado na sessão, sem montar o carrinho.
+
+        Vale também para usuários logados: cada alteração do carrinho no
+        banco atualiza a contagem na sessão. Sessões sem ela (anteriores à
+        contagem ou recém-logadas) somam o carrinho uma vez e a guardam.
+        """
+        total = session.get(TOTAL_SESSION)
+        if total is None:
+            if usuario is not None and usuario.is_authenticated and not session.get(settings.CARRINHO_SESSION_ID):
+                total = persistente.contar(usuario)
+            else:
+                total = codificacao.contar(session.get(settings.CARRINHO_SESSION_ID))
+            session[TOTAL_SESSION] = total
+        return total
+    
+    def _assinatura(self):
+        """
+        Resumo das linhas (produto, quantidade, preço) do carrinho.
+
+        O carrinho do banco é compartilhado entre os aparelhos do usuário:
+        a revalidação guardada na sessão de um deles só vale se as linhas
+        ainda forem as mesmas.
+        """
+        linhas = sorted(
+            (int(produto_id), item['quantidade'], str(item['preco']))
+            for produto_id, item in self.carrinho.items()
+        )
+        return hashlib.sha1(repr(linhas).encode()).hexdigest()
+    
+    def _precos_validos(self):
+        """Revalidação guardada na sessão, se nem o catálogo nem o carrinho mudaram desde ela"""
+        guardado = self.session.get(PRECOS_SESSION)
+        if (
+            guardado
+            and guardado['versao'] == ultima_alteracao_catalogo().isoformat()
+            and guardado.get('carrinho') == self._assinatura()
+        ):
+            return guardado
+        return None
+    
+    def revalidar(self):
+        """
+        Confere as linhas do carrinho com preço, disponibilidade e estoque atuais.
+
+        Usa a mesma consulta de itens(). Linhas com preço novo passam a usar
+        o preço atual; produtos excluídos saem do carrinho. O total e os
+        alertas de estado (indisponível, estoque) ficam na sessão com a
+        versão do catálogo e a assinatura das linhas: enquanto nada mudar,
+        a revalidação não consulta o banco. Retorna a lista de alertas;
+        mudanças de preço e remoções aparecem só na revalidação que as
+        encontrou.
+        """
+        guardado = self._precos_validos()
+        if guardado is not None:
+            return guardado['alertas']
+        versao = ultima_alteracao_catalogo().isoformat()
+        
+        itens = self.itens()
+        alertas = []
+        estados = []
+        alterados = {}
+        for item in itens:
+            produto = item['produto']
+            produto_id = str(produto.id)
+            if produto.preco != item['preco']:
+                alertas.append({
+                    'tipo': 'preco', 'produto_id': produto.id, 'nome': produto.nome,
+                    'preco_anterior': str(item['preco']), 'preco_atual': str(produto.preco),
+                })
+                self.carrinho[produto_id]['preco'] = str(produto.preco)
+                alterados[produto_id] = self.carrinho[produto_id]
+                item['preco'] = produto.preco
+                item['preco_total'] = produto.preco * item['quantidade']
+            if not produto.disponivel or produto.estoque == 0:
+                estados.append({'tipo': 'indisponivel', 'produto_id': produto.id, 'nome': produto.nome})
+            elif item['quantidade'] > produto.estoque:
+                estados.append({
+                    'tipo': 'estoque', 'produto_id': produto.id, 'nome': produto.nome,
+                    'disponivel': produto.estoque,
+                })
+        
+        encontrados = {str(item['produto'].id) for item in itens}
+        removidos = [produto_id for produto_id in self.carrinho if produto_id not in encontrados]
+        for produto_id in removidos:
+            del self.carrinho[produto_id]
+            alertas.append({'tipo': 'removido', 'produto_id': int(produto_id)})
+        
+        if alterados or removidos:
+            if self.usuario is not None:
+                if alterados:
+                    self._carrinho_id = persistente.gravar_varios(self.usuario, self._carrinho_id, alterados)
+                if removidos:
+                    persistente.apagar(self._carrinho_id, [int(produto_id) for produto_id in removidos])
+            self.salvar()
+            # Os itens já carregados foram corrigidos acima: não precisam de nova consulta
+            self._itens = itens
+        
+        self.session[PRECOS_SESSION] = {
+            'versao': versao,
+            'carrinho': self._assinatura(),
+            'total': str(sum(item['preco_total'] for item in itens)),
+            'alertas': estados,
+        }
+        return alertas + estados
     
     def get_total_price(self):
-        """Calcula o preço total do carrinho"""
+        """Calcula o preço total do carrinho (o da revalidação, se ainda valer)"""
+        guardado = self._precos_validos()
+        if guardado is not None:
+            return Decimal(guardado['total'])
         return sum(
             Decimal(item['preco']) * item['quantidade'] 
             for item in self.carrinho.values()
@@ -78,5 +364,9 @@ class Carrinho:
         """Remove todos os itens do carrinho"""
         if settings.CARRINHO_SESSION_ID in self.session:
             del self.session[settings.CARRINHO_SESSION_ID]
+        if self.usuario is not None:
+            persistente.apagar(self._carrinho_id)
+        if self.chave:
+            reservas.liberar(self.chave)
+        self.carrinho = {}
         self.salvar()
-        
\ No newline at end of file
@@ -0,0 +1,46 @@
+# carrinho/codificacao.py
+#
+# Formato compacto do carrinho na sessão.
+#
+# Versão 1 (anterior): {"<id>": {"quantidade": n, "preco": "123.45"}, ...}
+# Versão 2: {"v": 2, "i": [ids], "q": [quantidades], "c": [preços em centavos]}
+#
+# Listas paralelas de inteiros ocupam uma fração do JSON da versão 1 e são
+# serializadas muito mais depressa em carrinhos grandes. Sessões na
+# versão 1 são lidas normalmente e regravadas na versão 2 na próxima
+# alteração do carrinho.
+from decimal import Decimal
+
+VERSAO = 2
+
+
+def codificar(itens):
+    """Itens {produto_id: {'quantidade', 'preco'}} no formato compacto"""
+    ids, quantidades, centavos = [], [], []
+    for produto_id, item in itens.items():
+        ids.append(int(produto_id))
+        quantidades.append(item['quantidade'])
+        centavos.append(int(Decimal(item['preco']).scaleb(2)))
+    return {'v': VERSAO, 'i': ids, 'q': quantidades, 'c': centavos}
+
+
+def decodificar(valor):
+    """Itens {produto_id: {'quantidade', 'preco'}} a partir de qualquer versão"""
+    if not valor:
+        return {}
+    if valor.get('v') == VERSAO:
+        return {
+            str(produto_id): {'quantidade': quantidade, 'preco': str(Decimal(centavos).scaleb(-2))}
+            for produto_id, quantidade, centavos in zip(valor['i'], valor['q'], valor['c'])
+        }
+    # Versão 1: o próprio dicionário de itens
+    return {produto_id: dict(item) for produto_id, item in valor.items()}
+
+
+def contar(valor):
+    """Soma das quantidades sem montar os itens"""
+    if not valor:
+        return 0
+    if valor.get('v') == VERSAO:
+        return sum(valor['q'])
+    return sum(item['quantidade'] for item in valor.values())
@@ -1,8 +1,19 @@
 # carrinho/context_processors.py
-from .cart import Carrinho # Importa a sua classe Carrinho
+from django.utils.functional import SimpleLazyObject
+
+from .cart import Carrinho
+
 
 def carrinho_context(request):
     """
-    Torna o objeto Carrinho disponível globalmente nos templates.
+    Torna o carrinho disponível globalmente nos templates.
+
+    Nada é montado até o template usar a variável: páginas que não exibem
+    o carrinho não leem a sessão. carrinho_total vem da contagem guardada
+    na sessão (ou do carrinho no banco, para usuários logados) e é
+    calculado uma vez por requisição.
     """
-    return {'carrinho': Carrinho(request)}
\ No newline at end of file
+    return {
+        'carrinho': SimpleLazyObject(lambda: Carrinho(request)),
+        'carrinho_total': SimpleLazyObject(lambda: Carrinho.contar(request.session, getattr(request, 'user', None))),
+    }
@@ -0,0 +1,79 @@
+# carrinho/management/commands/benchmark_sessoes.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.test.utils import override_settings
+
+from carrinho.sessao import gravacao_adiada, persistir_sessoes
+
+MOTORES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'write-behind': 'carrinho.sessao',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede gravações de carrinho na sessão por segundo em cada SESSION_ENGINE. '
+        'Cada operação abre a sessão, soma um item ao carrinho e salva, como uma requisição de adicionar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--motores', nargs='+', choices=list(MOTORES), default=list(MOTORES))
+        parser.add_argument('--sessoes', type=int, default=50, help='Carrinhos simultâneos')
+        parser.add_argument('--operacoes', type=int, default=20, help='Itens adicionados por carrinho')
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **options):
+        for nome in options['motores']:
+            with override_settings(SESSION_ENGINE=MOTORES[nome]):
+                self.medir(nome, import_module(MOTORES[nome]).SessionStore, options)
+
+    def medir(self, nome, SessionStore, options):
+        chaves = []
+        for _ in range(options['sessoes']):
+            sessao = SessionStore()
+            sessao[settings.CARRINHO_SESSION_ID] = {}
+            sessao.save()
+            chaves.append(sessao.session_key)
+
+        def adicionar(chave):
+            erros = 0
+            for produto_id in range(1, options['operacoes'] + 1):
+                sessao = SessionStore(chave)
+                carrinho = sessao.setdefault(settings.CARRINHO_SESSION_ID, {})
+                item = carrinho.setdefault(str(produto_id), {'quantidade': 0, 'preco': '10.00'})
+                item['quantidade'] += 1
+                sessao.modified = True
+                try:
+                    sessao.save()
+                except Exception:
+                    # SQLite devolve "database is locked" quando a fila de escrita estoura o timeout
+                    erros += 1
+            close_old_connections()
+            return erros
+
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            erros = sum(executor.map(adicionar, chaves))
+        decorrido = time.monotonic() - inicio
+        total = options['sessoes'] * options['operacoes']
+        linha = f'{nome:>12}: {total / decorrido:10.0f} gravações/s ({total} em {decorrido:.2f}s, {erros} erros)'
+
+        if SessionStore.__module__ == 'carrinho.sessao' and not gravacao_adiada():
+            linha += '; cache sem add/incr atômicos, gravou direto no banco'
+        elif SessionStore.__module__ == 'carrinho.sessao':
+            inicio = time.monotonic()
+            persistir_sessoes()
+            linha += f'; persistir_sessoes {time.monotonic() - inicio:.2f}s'
+        self.stdout.write(linha)
+
+        for chave in chaves:
+            SessionStore(chave).delete()
+        connections.close_all()
@@ -0,0 +1,24 @@
+# carrinho/management/commands/liberar_reservas.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carrinho.reservas import liberar_expiradas, recalcular_reservado
+
+
+class Command(BaseCommand):
+    help = 'Devolve ao estoque as reservas de carrinho com prazo vencido'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Reservas liberadas por transação')
+        parser.add_argument('--recalcular', action='store_true',
+                            help='Reconstrói o contador de reservados dos produtos a partir das reservas')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        liberadas = liberar_expiradas(lote=options['lote'])
+        if options['recalcular']:
+            recalcular_reservado()
+        self.stdout.write(self.style.SUCCESS(
+            f'{liberadas} reservas expiradas liberadas em {time.monotonic() - inicio:.2f}s'
+        ))
@@ -0,0 +1,26 @@
+# carrinho/management/commands/persistir_sessoes.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from carrinho.sessao import persistir_sessoes
+
+
+class Command(BaseCommand):
+    help = 'Grava no banco as sessões alteradas no cache (SESSION_ENGINE = carrinho.sessao)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Entradas do diário lidas por vez')
+        parser.add_argument('--intervalo', type=float,
+                            help='Repete a cada N segundos em vez de rodar uma vez')
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.monotonic()
+            gravadas = persistir_sessoes(lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{gravadas} sessões gravadas em {time.monotonic() - inicio:.2f}s'
+            ))
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
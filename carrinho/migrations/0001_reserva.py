@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('produtos', '0007_produto_reservado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=32)),
+                ('quantidade', models.PositiveIntegerField()),
+                ('expira_em', models.DateTimeField(db_index=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='produtos.produto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('chave', 'produto'), name='reserva_unica')],
+            },
+        ),
+    ]
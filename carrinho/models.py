@@ -1,3 +1,49 @@
+# carrinho/models.py
+from django.conf import settings
 from django.db import models
+from produtos.models import Produto
 
-# Create your models here.
+
+class Reserva(models.Model):
+    """Unidades de um produto separadas para um carrinho até expira_em"""
+    # Identificador do carrinho: o da sessão (carrinho.reservas.chave_carrinho) ou,
+    # para usuários logados, o do carrinho no banco (carrinho.reservas.chave_usuario)
+    chave = models.CharField(max_length=32)
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='reservas')
+    quantidade = models.PositiveIntegerField()
+    expira_em = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chave', 'produto'], name='reserva_unica'),
+        ]
+    
+    def __str__(self):
+        return f'{self.chave}: {self.quantidade}x {self.produto_id}'
+
+
+class CarrinhoPersistente(models.Model):
+    """Carrinho de um usuário logado, guardado no banco e visto de qualquer aparelho"""
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='carrinho')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f'Carrinho de {self.usuario}'
+
+
+class ItemCarrinho(models.Model):
+    """Uma linha do carrinho persistente; cada alteração é um upsert desta linha"""
+    carrinho = models.ForeignKey(CarrinhoPersistente, on_delete=models.CASCADE, related_name='itens')
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    quantidade = models.PositiveIntegerField()
+    # Preço no momento em que o item entrou no carrinho
+    preco = models.DecimalField(max_digits=10, decimal_places=2)
+    atualizado_em = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['carrinho', 'produto'], name='item_carrinho_unico'),
+        ]
+    
+    def __str__(self):
+        return f'{self.quantidade}x {self.produto_id}'
@@ -0,0 +1,109 @@
+# carrinho/persistente.py
+#
+# Carrinho no banco para usuários logados.
+#
+# Os itens usam o mesmo formato do carrinho da sessão
+# ({produto_id: {'quantidade', 'preco'}}), então a classe Carrinho muda só
+# onde grava: cada alteração é um upsert (ou DELETE) da linha do item, sem
+# regravar a sessão inteira.
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from produtos.models import Produto
+
+from .models import CarrinhoPersistente, ItemCarrinho
+
+
+def carregar(usuario):
+    """(id do carrinho ou None, itens) do usuário, em uma consulta"""
+    carrinho_id = None
+    itens = {}
+    for carrinho_id, produto_id, quantidade, preco in ItemCarrinho.objects.filter(
+        carrinho__usuario=usuario
+    ).order_by('id').values_list('carrinho_id', 'produto_id', 'quantidade', 'preco'):
+        itens[str(produto_id)] = {'quantidade': quantidade, 'preco': str(preco)}
+    return carrinho_id, itens
+
+
+def _id_do_carrinho(usuario, carrinho_id):
+    if carrinho_id is None:
+        carrinho_id = CarrinhoPersistente.objects.get_or_create(usuario=usuario)[0].id
+    return carrinho_id
+
+
+def _upsert(carrinho_id, itens):
+    agora = timezone.now()
+    ItemCarrinho.objects.bulk_create(
+        [
+            ItemCarrinho(
+                carrinho_id=carrinho_id, produto_id=int(produto_id), quantidade=item['quantidade'],
+                preco=Decimal(item['preco']), atualizado_em=agora,
+            )
+            for produto_id, item in itens.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['carrinho', 'produto'],
+        update_fields=['quantidade', 'preco', 'atualizado_em'],
+    )
+
+
+def gravar(usuario, carrinho_id, produto_id, item):
+    """Grava um item com um único upsert; retorna o id do carrinho"""
+    return gravar_varios(usuario, carrinho_id, {produto_id: item})
+
+
+def gravar_varios(usuario, carrinho_id, itens):
+    """Grava os itens {produto_id: item} em um único upsert; retorna o id do carrinho"""
+    carrinho_id = _id_do_carrinho(usuario, carrinho_id)
+    _upsert(carrinho_id, itens)
+    return carrinho_id
+
+
+def apagar(carrinho_id, produto_ids=None):
+    """Apaga os itens informados (ou todos) do carrinho"""
+    if carrinho_id is None:
+        return
+    itens = ItemCarrinho.objects.filter(carrinho_id=carrinho_id)
+    if produto_ids is not None:
+        itens = itens.filter(produto_id__in=produto_ids)
+    itens.delete()
+
+
+def mesclar(usuario, itens_sessao):
+    """
+    Junta ao carrinho do usuário os itens do carrinho anônimo da sessão.
+
+    Produtos presentes nos dois somam as quantidades; produtos que não
+    existem mais são descartados. Retorna (id do carrinho, itens).
+    """
+    carrinho_id, itens = carregar(usuario)
+    if not itens_sessao:
+        return carrinho_id, itens
+    existentes = set(
+        str(produto_id) for produto_id in
+        Produto.objects.filter(id__in=[int(produto_id) for produto_id in itens_sessao]).values_list('id', flat=True)
+    )
+    novos = {}
+    for produto_id, item in itens_sessao.items():
+        if produto_id not in existentes:
+            continue
+        if produto_id in itens:
+            itens[produto_id]['quantidade'] += item['quantidade']
+        else:
+            itens[produto_id] = {'quantidade': item['quantidade'], 'preco': item['preco']}
+        novos[produto_id] = itens[produto_id]
+    if novos:
+        with transaction.atomic():
+            carrinho_id = _id_do_carrinho(usuario, carrinho_id)
+            _upsert(carrinho_id, novos)
+    return carrinho_id, itens
+
+
+def contar(usuario):
+    """Número de itens do carrinho do usuário (contador do cabeçalho)"""
+    return ItemCarrinho.objects.filter(carrinho__usuario=usuario).aggregate(
+        total=Sum('quantidade')
+    )['total'] or 0
@@ -0,0 +1,184 @@
+# carrinho/reservas.py
+#
+# Reservas de estoque com prazo para os itens do carrinho.
+#
+# Produto.reservado soma as reservas ativas de cada produto, então o
+# disponível para venda (estoque - reservado) sai da própria linha do
+# produto, sem somar a tabela de reservas. Toda operação trava primeiro as
+# reservas e depois os produtos, em ordem de id, como a baixa de estoque.
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from produtos.models import Produto
+
+from .models import Reserva
+
+
+def chave_carrinho(session, criar=True):
+    """Identificador do carrinho usado nas reservas, guardado na sessão"""
+    nome = getattr(settings, 'CARRINHO_CHAVE_SESSION', 'carrinho_chave')
+    chave = session.get(nome)
+    if chave is None and criar:
+        chave = session[nome] = uuid.uuid4().hex
+    return chave
+
+
+def chave_usuario(carrinho_id):
+    """Identificador das reservas do carrinho no banco, o mesmo em todas as sessões do usuário"""
+    return f'usuario-{carrinho_id}'
+
+
+def descartar_chave(session):
+    """Tira da sessão o identificador do carrinho anônimo; retorna-o (ou None)"""
+    return session.pop(getattr(settings, 'CARRINHO_CHAVE_SESSION', 'carrinho_chave'), None)
+
+
+def prazo_reserva():
+    return timezone.now() + timedelta(minutes=getattr(settings, 'RESERVA_MINUTOS', 15))
+
+
+def devolver(quantidades):
+    """
+    Devolve ao disponível as unidades {produto_id: quantidade} reservadas.
+
+    As linhas são travadas em ordem de id e atualizadas com um único UPDATE.
+    """
+    quantidades = {produto_id: q for produto_id, q in quantidades.items() if q > 0}
+    if not quantidades:
+        return
+    ids = sorted(quantidades)
+    list(Produto.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+    Produto.objects.filter(id__in=ids).update(reservado=F('reservado') - Case(
+        *[When(id=produto_id, then=Value(quantidades[produto_id])) for produto_id in ids],
+        output_field=IntegerField(),
+    ))
+
+
+def reservar(chave, produto_id, quantidade):
+    """
+    Ajusta a reserva do carrinho para a quantidade informada e renova o prazo.
+
+    Se não houver unidades livres para tudo, reserva o que sobrou.
+    Retorna a quantidade efetivamente reservada.
+    """
+    with transaction.atomic():
+        reserva = Reserva.objects.select_for_update().filter(chave=chave, produto_id=produto_id).first()
+        atual = reserva.quantidade if reserva else 0
+        diferenca = max(0, quantidade) - atual
+        if diferenca > 0:
+            # Caso comum: um UPDATE condicional lê e grava o contador sob o mesmo lock
+            separados = Produto.objects.filter(
+                id=produto_id, fatias_estoque=0, estoque__gte=F('reservado') + diferenca
+            ).update(reservado=F('reservado') + diferenca)
+            if not separados:
+                if Produto.objects.filter(id=produto_id, fatias_estoque__gt=0).exists():
+                    # Estoque fatiado não tem reserva: a disputa é resolvida na baixa
+                    return quantidade
+                produto = Produto.objects.select_for_update().only('estoque', 'reservado').get(id=produto_id)
+                diferenca = max(0, min(diferenca, produto.estoque - produto.reservado))
+                if diferenca:
+                    Produto.objects.filter(id=produto_id).update(reservado=F('reservado') + diferenca)
+        elif diferenca < 0:
+            devolver({produto_id: -diferenca})
+
+        nova = atual + diferenca
+        if nova == 0:
+            if reserva:
+                reserva.delete()
+        elif reserva:
+            reserva.quantidade = nova
+            reserva.expira_em = prazo_reserva()
+            reserva.save(update_fields=['quantidade', 'expira_em'])
+        else:
+            Reserva.objects.create(chave=chave, produto_id=produto_id, quantidade=nova, expira_em=prazo_reserva())
+    return nova
+
+
+def liberar(chave, produto_ids=None):
+    """Desfaz as reservas do carrinho (todas, ou só as dos produtos informados)"""
+    with transaction.atomic():
+        reservas = Reserva.objects.select_for_update().filter(chave=chave)
+        if produto_ids is not None:
+            reservas = reservas.filter(produto_id__in=produto_ids)
+        linhas = list(reservas.order_by('produto_id').values_list('id', 'produto_id', 'quantidade'))
+        if not linhas:
+            return 0
+        devolver({produto_id: quantidade for _, produto_id, quantidade in linhas})
+        Reserva.objects.filter(id__in=[id_ for id_, _, _ in linhas]).delete()
+    return len(linhas)
+
+
+def cortar_excedentes(produto_ids):
+    """
+    Encolhe as reservas de produtos cujo estoque ficou abaixo do reservado.
+
+    Usado depois de reposições para menos (importação): as reservas mais
+    recentes perdem unidades primeiro. Retorna o total de unidades devolvidas.
+    """
+    with transaction.atomic():
+        reservas = list(
+            Reserva.objects.select_for_update().filter(produto_id__in=produto_ids)
+            .order_by('produto_id', '-expira_em', '-id').values_list('id', 'produto_id', 'quantidade')
+        )
+        excedentes = {
+            produto_id: reservado - estoque
+            for produto_id, estoque, reservado in Produto.objects.select_for_update()
+            .filter(id__in=produto_ids, reservado__gt=F('estoque')).order_by('id')
+            .values_list('id', 'estoque', 'reservado')
+        }
+        cortes = defaultdict(int)
+        for id_, produto_id, quantidade in reservas:
+            corte = min(quantidade, excedentes.get(produto_id, 0) - cortes[produto_id])
+            if corte <= 0:
+                continue
+            cortes[produto_id] += corte
+            if corte == quantidade:
+                Reserva.objects.filter(id=id_).delete()
+            else:
+                Reserva.objects.filter(id=id_).update(quantidade=quantidade - corte)
+        devolver(cortes)
+    return sum(cortes.values())
+
+
+def liberar_expiradas(lote=1000):
+    """
+    Devolve ao estoque as reservas vencidas, em lotes.
+
+    Reservas travadas por um checkout em andamento são puladas
+    (skip_locked) e ficam para a próxima execução.
+    Retorna o número de reservas liberadas.
+    """
+    agora = timezone.now()
+    liberadas = 0
+    while True:
+        with transaction.atomic():
+            linhas = list(
+                Reserva.objects.select_for_update(skip_locked=True)
+                .filter(expira_em__lte=agora).order_by('id')
+                .values_list('id', 'produto_id', 'quantidade')[:lote]
+            )
+            if not linhas:
+                break
+            por_produto = defaultdict(int)
+            for _, produto_id, quantidade in linhas:
+                por_produto[produto_id] += quantidade
+            devolver(por_produto)
+            Reserva.objects.filter(id__in=[id_ for id_, _, _ in linhas]).delete()
+        liberadas += len(linhas)
+    return liberadas
+
+
+def recalcular_reservado():
+    """Reconstrói Produto.reservado a partir das reservas (correção de deriva)"""
+    totais = dict(Reserva.objects.values('produto_id').annotate(total=Sum('quantidade')).values_list('produto_id', 'total'))
+    with transaction.atomic():
+        Produto.objects.exclude(id__in=list(totais)).exclude(reservado=0).update(reservado=0)
+        for produto_id, total in totais.items():
+            Produto.objects.filter(id=produto_id).update(reservado=total)
+    return len(totais)
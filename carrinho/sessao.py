@@ -0,0 +1,117 @@
+# carrinho/sessao.py
+#
+# Sessões em cache com gravação adiada no banco (write-behind).
+#
+# Com SESSION_ENGINE = 'carrinho.sessao', cada save() grava só no cache
+# SESSION_CACHE_ALIAS e anota a chave em um diário numerado (cache.incr).
+# O comando persistir_sessoes lê o diário e grava as sessões alteradas em
+# django_session com um upsert por lote, fora do caminho da requisição.
+# A leitura é a do cached_db: cache primeiro, banco se a sessão saiu do cache.
+#
+# O diário tem no máximo uma entrada por sessão pendente: uma marca
+# 'sessoes:pendente:<chave>' (cache.add) impede novas entradas até o
+# comando gravar a sessão. Ele depende de add e incr atômicos e de um
+# cache compartilhado pelos processos, o que só Redis e Memcached
+# garantem. Com qualquer outro cache (local-memory, arquivo, banco) o
+# save() grava no banco na hora, como o cached_db: o diário em memória
+# local não seria visto pelo processo do persistir_sessoes.
+#
+# Sessões ainda não persistidas existem só no cache: ele precisa ter
+# espaço para todas e não pode descartá-las (sem política de despejo).
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+CHAVE_DIARIO = 'sessoes:diario'
+CHAVE_PERSISTIDO = 'sessoes:persistido'
+CHAVE_PENDENTE = 'sessoes:pendente:{}'
+# Backends compartilhados com add e incr atômicos, exigidos pelo diário
+CACHES_ATOMICOS = (RedisCache, BaseMemcachedCache)
+
+
+def _cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def gravacao_adiada():
+    """Indica se o cache das sessões permite adiar a gravação no banco"""
+    return isinstance(_cache(), CACHES_ATOMICOS)
+
+
+def anotar_alteracao(session_key):
+    """Registra no diário que a sessão precisa ser gravada no banco"""
+    cache = _cache()
+    if not cache.add(CHAVE_PENDENTE.format(session_key), 1, settings.SESSION_COOKIE_AGE):
+        # Já está no diário: o comando lerá a versão mais nova do cache
+        return
+    cache.add(CHAVE_DIARIO, 0, None)
+    try:
+        numero = cache.incr(CHAVE_DIARIO)
+    except ValueError:
+        # O diário saiu do cache: recomeça do início
+        cache.set(CHAVE_DIARIO, 1, None)
+        cache.set(CHAVE_PERSISTIDO, 0, None)
+        numero = 1
+    cache.set(f'{CHAVE_DIARIO}:{numero}', session_key, settings.SESSION_COOKIE_AGE)
+
+
+class SessionStore(CachedDBStore):
+    """Sessão gravada no cache; o banco é atualizado por persistir_sessoes()"""
+
+    def save(self, must_create=False):
+        if not gravacao_adiada():
+            return super().save(must_create=must_create)
+        if self.session_key is None:
+            return self.create()
+        dados = self._get_session(no_load=must_create)
+        if must_create:
+            # add é a garantia de chave única que o INSERT dava no banco
+            if not self._cache.add(self.cache_key, dados, self.get_expiry_age()):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, dados, self.get_expiry_age())
+        anotar_alteracao(self.session_key)
+
+
+def persistir_sessoes(lote=1000):
+    """
+    Grava no banco as sessões alteradas desde a última execução.
+
+    Sessões apagadas (logout) ou expiradas do cache são ignoradas.
+    Retorna o número de sessões gravadas.
+    """
+    cache = _cache()
+    ate = cache.get(CHAVE_DIARIO) or 0
+    de = cache.get(CHAVE_PERSISTIDO) or 0
+    if de > ate:
+        de = 0
+    gravadas = 0
+    for inicio in range(de + 1, ate + 1, lote):
+        entradas = [f'{CHAVE_DIARIO}:{numero}' for numero in range(inicio, min(inicio + lote, ate + 1))]
+        chaves = set(cache.get_many(entradas).values())
+        # A marca sai antes da leitura: um save() depois dela volta ao diário
+        cache.delete_many([CHAVE_PENDENTE.format(chave) for chave in chaves])
+        dados = cache.get_many([SessionStore.cache_key_prefix + chave for chave in chaves])
+        sessoes = []
+        for chave in chaves:
+            sessao = dados.get(SessionStore.cache_key_prefix + chave)
+            if sessao is None:
+                continue
+            store = SessionStore(chave)
+            sessoes.append(Session(
+                session_key=chave,
+                session_data=store.encode(sessao),
+                expire_date=store.get_expiry_date(expiry=sessao.get('_session_expiry')),
+            ))
+        Session.objects.bulk_create(
+            sessoes, batch_size=500, update_conflicts=True,
+            unique_fields=['session_key'], update_fields=['session_data', 'expire_date'],
+        )
+        gravadas += len(sessoes)
+        cache.delete_many(entradas)
+        cache.set(CHAVE_PERSISTIDO, inicio + len(entradas) - 1, None)
+    return gravadas
@@ -0,0 +1,17 @@
+# carrinho/signals.py
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .cart import TOTAL_SESSION, Carrinho
+
+
+@receiver(user_logged_in)
+def mesclar_carrinho_ao_entrar(sender, request, user, **kwargs):
+    """Leva para o carrinho do banco o que o visitante juntou antes do login"""
+    if request is None or not getattr(request, 'session', None):
+        return
+    # A contagem do visitante não vale para o carrinho do usuário
+    request.session.pop(TOTAL_SESSION, None)
+    if request.session.get(settings.CARRINHO_SESSION_ID):
+        Carrinho(request, usuario=user)
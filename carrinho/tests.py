@@ -1,10 +1,12 @@
 from decimal import Decimal
-from django.test import TestCase, Client, RequestFactory
+from io import StringIO
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.conf import settings
 from produtos.models import Produto, Categoria
 from .cart import Carrinho
+from .codificacao import decodificar
 from .forms import FormAdicionarProdutoCarrinho
 from .context_processors import carrinho_context
 
@@ -113,7 +115,7 @@ class CarrinhoViewsTest(BaseCarrinhoTestCase):
         self.assertRedirects(response, reverse('carrinho:detalhe'))
         
         # Verificar se produto foi adicionado
-        session_data = self.client.session.get(settings.CARRINHO_SESSION_ID, {})
+        session_data = decodificar(self.client.session.get(settings.CARRINHO_SESSION_ID))
         self.assertIn(str(self.produto1.id), session_data)
 
 
@@ -317,4 +319,714 @@ class CarrinhoViewsBranchesTest(TestCase):
     def test_remover_produto_inexistente(self):
         url = reverse('carrinho:remover', kwargs={'produto_id': 9999})
         response = self.client.post(url)
-        self.assertEqual(response.status_code, 404)
\ No newline at end of file
+        self.assertEqual(response.status_code, 404)
+
+class ReservaEstoqueTest(BaseCarrinhoTestCase):
+    """Testes para as reservas de estoque dos itens do carrinho"""
+    
+    def setUp(self):
+        super().setUp()
+        self.produto2.estoque = 3
+        self.produto2.save()
+    
+    def test_adicionar_reserva_e_remover_devolve(self):
+        """Testa se adicionar reserva as unidades e remover as devolve"""
+        carrinho = Carrinho(self.criar_request_com_sessao())
+        self.assertEqual(carrinho.adicionar(self.produto2, quantidade=2), 2)
+        self.produto2.refresh_from_db()
+        self.assertEqual((self.produto2.reservado, self.produto2.disponivel_venda), (2, 1))
+        
+        carrinho.adicionar(self.produto2, quantidade=1, override_quantidade=True)
+        self.produto2.refresh_from_db()
+        self.assertEqual(self.produto2.reservado, 1)
+        
+        carrinho.remover(self.produto2)
+        self.produto2.refresh_from_db()
+        self.assertEqual(self.produto2.reservado, 0)
+        self.assertFalse(self.produto2.reservas.exists())
+    
+    def test_reserva_parcial(self):
+        """Testa se só o que está livre é reservado quando outro carrinho já separou unidades"""
+        outro = Carrinho(self.criar_request_com_sessao())
+        outro.adicionar(self.produto2, quantidade=2)
+        carrinho = Carrinho(self.criar_request_com_sessao())
+        self.assertEqual(carrinho.adicionar(self.produto2, quantidade=5), 1)
+        self.produto2.refresh_from_db()
+        self.assertEqual((self.produto2.reservado, self.produto2.disponivel_venda), (3, 0))
+        # O item continua no carrinho com a quantidade pedida
+        self.assertEqual(carrinho.carrinho[str(self.produto2.id)]['quantidade'], 5)
+    
+    def test_limpar_libera_reservas(self):
+        """Testa se limpar o carrinho devolve todas as reservas"""
+        carrinho = Carrinho(self.criar_request_com_sessao())
+        carrinho.adicionar(self.produto1, quantidade=4)
+        carrinho.adicionar(self.produto2, quantidade=1)
+        carrinho.limpar()
+        self.assertEqual(
+            list(Produto.objects.order_by('id').values_list('reservado', flat=True)), [0, 0]
+        )
+    
+    def test_liberar_expiradas(self):
+        """Testa se o varredor devolve só as reservas vencidas"""
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import Reserva
+        vencido = Carrinho(self.criar_request_com_sessao())
+        vencido.adicionar(self.produto1, quantidade=4)
+        vencido.adicionar(self.produto2, quantidade=2)
+        ativo = Carrinho(self.criar_request_com_sessao())
+        ativo.adicionar(self.produto2, quantidade=1)
+        Reserva.objects.filter(chave=vencido.chave).update(expira_em=timezone.now() - timedelta(minutes=1))
+        
+        call_command('liberar_reservas', stdout=StringIO())
+        self.assertEqual(
+            list(Produto.objects.order_by('id').values_list('reservado', flat=True)), [0, 1]
+        )
+        self.assertEqual(list(Reserva.objects.values_list('chave', flat=True)), [ativo.chave])
+    
+    def test_recalcular_reservado(self):
+        """Testa se o contador é reconstruído a partir das reservas"""
+        from .reservas import recalcular_reservado
+        Carrinho(self.criar_request_com_sessao()).adicionar(self.produto2, quantidade=2)
+        Produto.objects.update(reservado=7)
+        recalcular_reservado()
+        self.assertEqual(
+            list(Produto.objects.order_by('id').values_list('reservado', flat=True)), [0, 2]
+        )
+    
+    def test_view_avisa_reserva_parcial(self):
+        """Testa se a view avisa quando não há estoque livre para tudo"""
+        from django.contrib.messages import get_messages
+        response = self.client.post(
+            reverse('carrinho:adicionar', args=[self.produto2.id]), {'quantidade': 5}
+        )
+        mensagens = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertIn('Produto 2: só conseguimos reservar 3 de 5 unidade(s).', mensagens)
+
+
+class CarrinhoContextoPreguicosoTest(BaseCarrinhoTestCase):
+    """Testes para o context processor preguiçoso e a contagem na sessão"""
+    
+    def test_contexto_nao_le_a_sessao(self):
+        """Testa se o context processor não monta o carrinho enquanto ninguém o usa"""
+        request = self.criar_request_com_sessao()
+        request.session.accessed = False
+        contexto = carrinho_context(request)
+        self.assertFalse(request.session.accessed)
+        self.assertEqual(contexto['carrinho_total'], 0)
+        self.assertTrue(request.session.accessed)
+    
+    def test_contagem_mantida_na_sessao(self):
+        """Testa se cada alteração do carrinho atualiza a contagem guardada"""
+        request = self.criar_request_com_sessao()
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto1, quantidade=2)
+        carrinho.adicionar(self.produto2, quantidade=3)
+        self.assertEqual(request.session['carrinho_total'], 5)
+        carrinho.remover(self.produto1)
+        self.assertEqual(Carrinho.contar(request.session), 3)
+        carrinho.limpar()
+        self.assertEqual(Carrinho.contar(request.session), 0)
+    
+    def test_contagem_de_sessao_antiga(self):
+        """Testa se sessões sem a contagem somam os itens do dicionário"""
+        request = self.criar_request_com_sessao({
+            settings.CARRINHO_SESSION_ID: {str(self.produto1.id): {'quantidade': 4, 'preco': '10.50'}},
+        })
+        self.assertEqual(Carrinho.contar(request.session), 4)
+    
+    def test_cabecalho_exibe_contagem(self):
+        """Testa se o cabeçalho mostra a contagem do carrinho"""
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 3})
+        response = self.client.get(reverse('carrinho:detalhe'))
+        self.assertContains(response, '<span class="carrinho-count">3</span>')
+
+
+class CarrinhoItensMemorizadosTest(BaseCarrinhoTestCase):
+    """Testes para a carga única dos produtos do carrinho"""
+    
+    def test_uma_consulta_por_instancia(self):
+        """Testa se iterar várias vezes e ler a categoria custa uma consulta"""
+        carrinho = Carrinho(self.criar_request_com_sessao())
+        carrinho.adicionar(self.produto1, quantidade=2)
+        carrinho.adicionar(self.produto2, quantidade=1)
+        with self.assertNumQueries(1):
+            list(carrinho)
+            itens = list(carrinho)
+            self.assertEqual([item['produto'].categoria.nome for item in itens], ['Categoria Teste'] * 2)
+        self.assertEqual(itens[0]['preco_total'], Decimal('21.00'))
+    
+    def test_alteracao_descarta_itens(self):
+        """Testa se alterar o carrinho recarrega os itens na próxima iteração"""
+        carrinho = Carrinho(self.criar_request_com_sessao())
+        carrinho.adicionar(self.produto1)
+        self.assertEqual(len(list(carrinho)), 1)
+        carrinho.adicionar(self.produto2)
+        self.assertEqual(len(list(carrinho)), 2)
+    
+    def test_sessao_sem_produtos(self):
+        """Testa se a iteração não grava Produto nem Decimal na sessão"""
+        request = self.criar_request_com_sessao()
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto1, quantidade=2)
+        list(carrinho)
+        self.assertEqual(
+            request.session[settings.CARRINHO_SESSION_ID],
+            {'v': 2, 'i': [self.produto1.id], 'q': [2], 'c': [1050]},
+        )
+    
+    def test_pagina_do_carrinho_consulta_produtos_uma_vez(self):
+        """Testa se a view e o template do carrinho compartilham a mesma carga"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('carrinho:detalhe'))
+        cargas = [q for q in consultas.captured_queries if 'FROM "produtos_produto"' in q['sql']]
+        self.assertEqual(len(cargas), 1)
+    
+    def test_pagina_do_carrinho_sem_consulta_por_linha(self):
+        """Testa se as rendições das imagens vêm em uma consulta, qualquer que seja o número de linhas"""
+        from produtos.models import Rendicao
+        produtos = [
+            Produto.objects.create(
+                nome=f'Foto {numero}', slug=f'foto-{numero}', descricao='d',
+                preco=Decimal('1.00'), estoque=10, categoria=self.categoria,
+            )
+            for numero in range(10)
+        ]
+        Produto.objects.filter(id__in=[p.id for p in produtos]).update(imagem='produtos/foto.jpg')
+        Rendicao.objects.bulk_create([
+            Rendicao(produto=produto, largura=320, altura=240, formato=formato,
+                     arquivo=f'produtos/rendicoes/{produto.id}-320.{formato}')
+            for produto in produtos for formato in ('webp', 'jpeg')
+        ])
+        for produto in produtos:
+            self.client.post(reverse('carrinho:adicionar', args=[produto.id]))
+        
+        self.client.get(reverse('carrinho:detalhe'))
+        # Sessão, produtos e rendições; a revalidação já está guardada na sessão
+        with self.assertNumQueries(3) as consultas:
+            response = self.client.get(reverse('carrinho:detalhe'))
+        self.assertContains(response, 'srcset=', count=20)
+        rendicoes = [q for q in consultas.captured_queries if 'FROM "produtos_rendicao"' in q['sql']]
+        self.assertEqual(len(rendicoes), 1)
+
+
+class CarrinhoPersistenteTest(BaseCarrinhoTestCase):
+    """Testes para o carrinho no banco dos usuários logados"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth.models import User
+        self.usuario = User.objects.create_user(username='cliente', password='testpass123')
+    
+    def criar_request_logado(self, dados_sessao=None):
+        request = self.criar_request_com_sessao(dados_sessao)
+        request.user = self.usuario
+        return request
+    
+    def test_adicionar_grava_linha_e_so_a_contagem_na_sessao(self):
+        """Testa se adicionar é um upsert da linha do item e a sessão guarda só a contagem"""
+        from .models import ItemCarrinho
+        request = self.criar_request_logado()
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto1, quantidade=2)
+        request.session.modified = False
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as consultas:
+            carrinho.adicionar(self.produto1, quantidade=3, override_quantidade=True)
+        gravacoes = [q for q in consultas.captured_queries if '"carrinho_itemcarrinho"' in q['sql']]
+        self.assertEqual(len(gravacoes), 1)
+        self.assertNotIn(settings.CARRINHO_SESSION_ID, request.session)
+        self.assertEqual(request.session['carrinho_total'], 3)
+        self.assertEqual(
+            list(ItemCarrinho.objects.values_list('produto_id', 'quantidade', 'preco')),
+            [(self.produto1.id, 3, Decimal('10.50'))],
+        )
+    
+    def test_carrinho_visto_de_outro_aparelho(self):
+        """Testa se outra sessão do mesmo usuário vê os mesmos itens"""
+        carrinho = Carrinho(self.criar_request_logado())
+        carrinho.adicionar(self.produto1, quantidade=2)
+        carrinho.adicionar(self.produto2, quantidade=1)
+        outro = Carrinho(self.criar_request_logado())
+        self.assertEqual(len(outro), 3)
+        self.assertEqual(outro.get_total_price(), Decimal('46.00'))
+        outro.remover(self.produto1)
+        self.assertEqual(len(Carrinho(self.criar_request_logado())), 1)
+    
+    def test_contagem_do_cabecalho_sem_consulta(self):
+        """Testa se a contagem de um usuário logado vem da sessão e acompanha as alterações"""
+        from .models import ItemCarrinho
+        request = self.criar_request_logado()
+        Carrinho(request).adicionar(self.produto1, quantidade=2)
+        with self.assertNumQueries(0):
+            self.assertEqual(Carrinho.contar(request.session, self.usuario), 2)
+        
+        # Outro aparelho mexe no carrinho; esta sessão se acerta ao montar o carrinho
+        Carrinho(self.criar_request_logado()).adicionar(self.produto2, quantidade=1)
+        Carrinho(request)
+        self.assertEqual(Carrinho.contar(request.session, self.usuario), 3)
+        
+        # Sessão sem contagem (ex.: anterior a ela) soma o banco uma vez e guarda
+        outra = self.criar_request_logado()
+        with self.assertNumQueries(1):
+            self.assertEqual(Carrinho.contar(outra.session, self.usuario), 3)
+            self.assertEqual(Carrinho.contar(outra.session, self.usuario), 3)
+        self.assertEqual(ItemCarrinho.objects.count(), 2)
+    
+    def test_login_descarta_contagem_do_visitante(self):
+        """Testa se a contagem do carrinho anônimo vazio não esconde o carrinho do usuário"""
+        Carrinho(self.criar_request_logado()).adicionar(self.produto1, quantidade=4)
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto2.id]))
+        self.client.post(reverse('carrinho:remover', args=[self.produto2.id]))
+        self.assertEqual(self.client.session['carrinho_total'], 0)
+        self.client.force_login(self.usuario)
+        self.assertEqual(Carrinho.contar(self.client.session, self.usuario), 4)
+    
+    def test_limpar_apaga_os_itens(self):
+        """Testa se limpar apaga as linhas do carrinho"""
+        from .models import ItemCarrinho
+        carrinho = Carrinho(self.criar_request_logado())
+        carrinho.adicionar(self.produto1)
+        carrinho.limpar()
+        self.assertFalse(ItemCarrinho.objects.exists())
+        self.assertEqual(len(carrinho), 0)
+    
+    def test_login_mescla_carrinho_anonimo(self):
+        """Testa se o login leva os itens da sessão para o carrinho do banco"""
+        Carrinho(self.criar_request_logado()).adicionar(self.produto1, quantidade=1)
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 2})
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto2.id]), {'quantidade': 1})
+        self.client.login(username='cliente', password='testpass123')
+        self.assertNotIn(settings.CARRINHO_SESSION_ID, self.client.session)
+        carrinho = Carrinho(self.criar_request_logado())
+        self.assertEqual(
+            {produto_id: item['quantidade'] for produto_id, item in carrinho.carrinho.items()},
+            {str(self.produto1.id): 3, str(self.produto2.id): 1},
+        )
+    
+    def test_reservas_pelo_carrinho_do_banco(self):
+        """Testa se as sessões de um usuário reservam com a mesma chave, a do carrinho no banco"""
+        from .models import CarrinhoPersistente, Reserva
+        from .reservas import chave_usuario
+        Carrinho(self.criar_request_logado()).adicionar(self.produto1, quantidade=2)
+        outro = Carrinho(self.criar_request_logado())
+        outro.adicionar(self.produto1, quantidade=3, override_quantidade=True)
+        chave = chave_usuario(CarrinhoPersistente.objects.get(usuario=self.usuario).id)
+        self.assertEqual(outro.chave, chave)
+        self.assertEqual(list(Reserva.objects.values_list('chave', 'quantidade')), [(chave, 3)])
+        self.produto1.refresh_from_db()
+        self.assertEqual(self.produto1.reservado, 3)
+    
+    def test_login_transfere_as_reservas(self):
+        """Testa se o login reserva os totais mesclados com a chave do usuário e solta as do visitante"""
+        from .models import Reserva
+        Carrinho(self.criar_request_logado()).adicionar(self.produto1, quantidade=1)
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 2})
+        self.client.login(username='cliente', password='testpass123')
+        self.assertNotIn('carrinho_chave', self.client.session)
+        chave = Carrinho(self.criar_request_logado()).chave
+        self.assertEqual(list(Reserva.objects.values_list('chave', 'quantidade')), [(chave, 3)])
+        self.produto1.refresh_from_db()
+        self.assertEqual(self.produto1.reservado, 3)
+    
+    def test_contador_do_cabecalho(self):
+        """Testa se o contador do cabeçalho soma o carrinho do banco"""
+        Carrinho(self.criar_request_logado()).adicionar(self.produto2, quantidade=4)
+        request = self.criar_request_logado()
+        self.assertEqual(carrinho_context(request)['carrinho_total'], 4)
+
+
+class RevalidacaoPrecosTest(BaseCarrinhoTestCase):
+    """Testes para a revalidação do carrinho com os preços atuais"""
+    
+    def test_preco_alterado_e_total_em_cache(self):
+        """Testa se o preço novo é adotado e a revalidação seguinte não consulta o banco"""
+        request = self.criar_request_com_sessao()
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto1, quantidade=2)
+        self.produto1.preco = Decimal('12.00')
+        self.produto1.save()
+        
+        carrinho = Carrinho(request)
+        alertas = carrinho.revalidar()
+        self.assertEqual([(a['tipo'], a['preco_anterior'], a['preco_atual']) for a in alertas],
+                         [('preco', '10.50', '12.00')])
+        itens = decodificar(request.session[settings.CARRINHO_SESSION_ID])
+        self.assertEqual(itens[str(self.produto1.id)]['preco'], '12.00')
+        
+        carrinho = Carrinho(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(carrinho.revalidar(), [])
+            self.assertEqual(carrinho.get_total_price(), Decimal('24.00'))
+    
+    def test_alteracao_do_catalogo_invalida_o_cache(self):
+        """Testa se uma nova marca do catálogo força outra revalidação"""
+        request = self.criar_request_com_sessao()
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto2, quantidade=1)
+        self.assertEqual(carrinho.revalidar(), [])
+        self.produto2.disponivel = False
+        self.produto2.save()
+        alertas = Carrinho(request).revalidar()
+        self.assertEqual([a['tipo'] for a in alertas], ['indisponivel'])
+    
+    def test_estoque_e_produto_excluido(self):
+        """Testa os alertas de estoque insuficiente e de produto que não existe mais"""
+        request = self.criar_request_com_sessao()
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto1, quantidade=2)
+        carrinho.adicionar(self.produto2, quantidade=1)
+        Produto.objects.filter(id=self.produto1.id).update(estoque=1)
+        self.produto2.delete()
+        alertas = Carrinho(request).revalidar()
+        self.assertEqual(sorted(a['tipo'] for a in alertas), ['estoque', 'removido'])
+        self.assertEqual(list(decodificar(request.session[settings.CARRINHO_SESSION_ID])), [str(self.produto1.id)])
+    
+    def test_carrinho_do_banco_grava_preco_novo(self):
+        """Testa se o carrinho persistente guarda o preço revalidado"""
+        from django.contrib.auth.models import User
+        from .models import ItemCarrinho
+        request = self.criar_request_com_sessao()
+        request.user = User.objects.create_user(username='cliente', password='testpass123')
+        Carrinho(request).adicionar(self.produto1)
+        self.produto1.preco = Decimal('9.90')
+        self.produto1.save()
+        Carrinho(request).revalidar()
+        self.assertEqual(ItemCarrinho.objects.get().preco, Decimal('9.90'))
+    
+    def test_carrinho_do_banco_alterado_em_outro_aparelho(self):
+        """Testa se o total guardado na sessão de um aparelho não sobrevive a mudanças feitas em outro"""
+        from django.contrib.auth.models import User
+        usuario = User.objects.create_user(username='cliente', password='testpass123')
+        aparelho_a = self.criar_request_com_sessao()
+        aparelho_a.user = usuario
+        Carrinho(aparelho_a).adicionar(self.produto1)
+        Carrinho(aparelho_a).revalidar()
+        self.assertEqual(Carrinho(aparelho_a).get_total_price(), Decimal('10.50'))
+        
+        aparelho_b = self.criar_request_com_sessao()
+        aparelho_b.user = usuario
+        Carrinho(aparelho_b).adicionar(self.produto2, quantidade=2)
+        self.assertEqual(Carrinho(aparelho_a).get_total_price(), Decimal('60.50'))
+    
+    def test_pagina_do_carrinho_avisa(self):
+        """Testa se a página do carrinho exibe a mudança de preço"""
+        from django.contrib.messages import get_messages
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]))
+        self.produto1.preco = Decimal('11.00')
+        self.produto1.save()
+        response = self.client.get(reverse('carrinho:detalhe'))
+        self.assertIn('O preço de Produto 1 mudou de R$ 10.50 para R$ 11.00.',
+                      [str(m) for m in get_messages(response.wsgi_request)])
+
+
+class CarrinhoLoteTest(BaseCarrinhoTestCase):
+    """Testes para o endpoint de alterações em lote do carrinho"""
+    
+    def enviar(self, itens):
+        import json
+        return self.client.post(
+            reverse('carrinho:lote_ajax'), data=json.dumps({'itens': itens}), content_type='application/json'
+        ).json()
+    
+    def test_aplica_lote_e_retorna_totais(self):
+        """Testa se o lote soma, substitui e remove itens de uma vez"""
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 1})
+        resposta = self.enviar([
+            {'produto_id': self.produto1.id, 'quantidade': 2},
+            {'produto_id': self.produto2.id, 'quantidade': 3, 'override': True},
+        ])
+        self.assertTrue(resposta['success'])
+        self.assertEqual((resposta['total_items'], resposta['total_price']), (6, '106.50'))
+        self.assertEqual(resposta['reservados'], {str(self.produto1.id): 3, str(self.produto2.id): 3})
+        
+        resposta = self.enviar([{'produto_id': self.produto2.id, 'quantidade': 0, 'override': True}])
+        self.assertEqual(resposta['total_items'], 3)
+        self.produto2.refresh_from_db()
+        self.assertEqual(self.produto2.reservado, 0)
+    
+    def test_lote_invalido_nao_altera_nada(self):
+        """Testa se um item inválido recusa o lote inteiro"""
+        resposta = self.enviar([
+            {'produto_id': self.produto1.id, 'quantidade': 2},
+            {'produto_id': 9999, 'quantidade': 1},
+            {'produto_id': self.produto2.id, 'quantidade': 50},
+        ])
+        self.assertFalse(resposta['success'])
+        self.assertEqual(len(resposta['errors']), 2)
+        self.assertNotIn(settings.CARRINHO_SESSION_ID, self.client.session)
+    
+    def test_remove_produto_indisponivel(self):
+        """Testa se o lote remove a linha de um produto que ficou indisponível ou foi excluído"""
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 2})
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto2.id]), {'quantidade': 1})
+        Produto.objects.filter(id=self.produto1.id).update(disponivel=False)
+        resposta = self.enviar([
+            {'produto_id': self.produto1.id, 'quantidade': 0, 'override': True},
+            {'produto_id': 9999, 'quantidade': 0, 'override': True},
+        ])
+        self.assertTrue(resposta['success'])
+        self.assertEqual(resposta['total_items'], 1)
+        resposta = self.enviar([{'produto_id': self.produto1.id, 'quantidade': 1}])
+        self.assertFalse(resposta['success'])
+    
+    def test_falha_no_meio_nao_aplica_nada(self):
+        """Testa se uma falha durante o lote do carrinho no banco desfaz todas as gravações"""
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from . import reservas
+        from .models import ItemCarrinho
+        usuario = User.objects.create_user(username='cliente', password='testpass123')
+        request = self.criar_request_com_sessao()
+        request.user = usuario
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto1, quantidade=1)
+        produtos = Produto.objects.in_bulk([self.produto1.id, self.produto2.id])
+        reservar = reservas.reservar
+        chamadas = []
+        
+        def reservar_e_falhar(*args):
+            chamadas.append(args)
+            if len(chamadas) == 2:
+                raise RuntimeError('falha no banco')
+            return reservar(*args)
+        
+        with mock.patch.object(reservas, 'reservar', reservar_e_falhar):
+            with self.assertRaises(RuntimeError):
+                carrinho.aplicar_lote([(self.produto1.id, 3, True), (self.produto2.id, 2, False)], produtos)
+        self.assertEqual(list(ItemCarrinho.objects.values_list('produto_id', 'quantidade')), [(self.produto1.id, 1)])
+        self.assertEqual(carrinho.carrinho[str(self.produto1.id)]['quantidade'], 1)
+        self.assertNotIn(str(self.produto2.id), carrinho.carrinho)
+        self.produto1.refresh_from_db()
+        self.assertEqual(self.produto1.reservado, 1)
+    
+    def test_uma_consulta_de_produtos(self):
+        """Testa se os produtos do lote são validados com uma única consulta"""
+        import json
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        outros = [
+            Produto.objects.create(
+                nome=f'Extra {numero}', slug=f'extra-{numero}', descricao='d',
+                preco=Decimal('1.00'), estoque=10, categoria=self.categoria,
+            )
+            for numero in range(5)
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(
+                reverse('carrinho:lote_ajax'),
+                data=json.dumps([{'produto_id': produto.id, 'quantidade': 1} for produto in outros]),
+                content_type='application/json',
+            )
+        leituras = [q for q in consultas.captured_queries if q['sql'].startswith('SELECT') and 'FROM "produtos_produto"' in q['sql']]
+        self.assertEqual(len(leituras), 1)
+        self.assertEqual(Carrinho.contar(self.client.session), 5)
+    
+    def test_carrinho_do_banco_um_upsert(self):
+        """Testa se o lote do usuário logado grava todas as linhas em um único upsert"""
+        import json
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import ItemCarrinho
+        self.client.force_login(User.objects.create_user(username='cliente', password='testpass123'))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('carrinho:lote_ajax'), data=json.dumps([
+                {'produto_id': self.produto1.id, 'quantidade': 2},
+                {'produto_id': self.produto2.id, 'quantidade': 1},
+            ]), content_type='application/json')
+        upserts = [q for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "carrinho_itemcarrinho"')]
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(ItemCarrinho.objects.count(), 2)
+
+
+@override_settings(
+    SESSION_ENGINE='carrinho.sessao',
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'sessoes': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessoes-teste',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    },
+)
+class SessaoWriteBehindTest(BaseCarrinhoTestCase):
+    """Testes para as sessões em cache com gravação adiada no banco"""
+    
+    def setUp(self):
+        super().setUp()
+        from unittest import mock
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+        caches['sessoes'].clear()
+        # Nos testes tudo roda em um processo: o local-memory faz as vezes do Redis
+        self.atomicos = mock.patch('carrinho.sessao.CACHES_ATOMICOS', (LocMemCache,))
+        self.atomicos.start()
+        self.addCleanup(self.atomicos.stop)
+    
+    def test_locmem_grava_no_banco_na_hora(self):
+        """Testa se, fora dos testes, o local-memory (visto só pelo próprio processo) não adia a gravação"""
+        from django.contrib.sessions.models import Session
+        self.atomicos.stop()
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 2})
+        self.assertEqual(Session.objects.get().get_decoded()['carrinho_total'], 2)
+    
+    def test_adicionar_nao_grava_no_banco(self):
+        """Testa se o carrinho vai para o cache e só o comando grava o banco"""
+        from django.contrib.sessions.models import Session
+        from django.core.management import call_command
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 2})
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto2.id]), {'quantidade': 1})
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(Carrinho.contar(self.client.session), 3)
+        
+        call_command('persistir_sessoes', stdout=StringIO())
+        sessao = Session.objects.get()
+        self.assertEqual(sessao.get_decoded()['carrinho_total'], 3)
+    
+    def test_sessao_fora_do_cache_volta_do_banco(self):
+        """Testa se a sessão persistida é lida do banco quando sai do cache"""
+        from django.core.cache import caches
+        from .sessao import persistir_sessoes
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 4})
+        self.assertEqual(persistir_sessoes(), 1)
+        caches['sessoes'].clear()
+        self.assertEqual(Carrinho.contar(self.client.session), 4)
+    
+    def test_persistir_so_o_que_mudou(self):
+        """Testa se cada execução grava apenas as sessões alteradas desde a anterior"""
+        from .sessao import persistir_sessoes
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]))
+        self.assertEqual(persistir_sessoes(), 1)
+        self.assertEqual(persistir_sessoes(), 0)
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]))
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto2.id]))
+        self.assertEqual(persistir_sessoes(), 1)
+    
+    def test_diario_uma_entrada_por_sessao(self):
+        """Testa se salvar a mesma sessão várias vezes não cresce o diário e nada se perde"""
+        from django.contrib.sessions.models import Session
+        from django.core.cache import caches
+        from .sessao import CHAVE_DIARIO, SessionStore, persistir_sessoes
+        chaves = []
+        for _ in range(250):
+            sessao = SessionStore()
+            sessao['n'] = 1
+            sessao.save()
+            chaves.append(sessao.session_key)
+        for chave in chaves:
+            sessao = SessionStore(chave)
+            sessao['n'] = 2
+            sessao.save()
+        self.assertEqual(caches['sessoes'].get(CHAVE_DIARIO), 250)
+        self.assertEqual(persistir_sessoes(), 250)
+        self.assertEqual({s.get_decoded()['n'] for s in Session.objects.all()}, {2})
+    
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'sessoes': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    })
+    def test_cache_sem_atomicidade_grava_no_banco(self):
+        """Testa se, sem cache atômico, a sessão é gravada no banco na hora"""
+        from django.contrib.sessions.models import Session
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 2})
+        self.assertEqual(Session.objects.get().get_decoded()['carrinho_total'], 2)
+
+
+class CodificacaoCarrinhoTest(BaseCarrinhoTestCase):
+    """Testes do formato compacto do carrinho na sessão"""
+    
+    def test_ida_e_volta(self):
+        """Testa se codificar e decodificar preservam ids, quantidades e preços"""
+        from .codificacao import codificar, contar
+        itens = {
+            '7': {'quantidade': 3, 'preco': '10.50'},
+            '12': {'quantidade': 1, 'preco': '0.99'},
+            '40': {'quantidade': 2, 'preco': '1999.00'},
+        }
+        codificado = codificar(itens)
+        self.assertEqual(codificado, {'v': 2, 'i': [7, 12, 40], 'q': [3, 1, 2], 'c': [1050, 99, 199900]})
+        self.assertEqual(decodificar(codificado), itens)
+        self.assertEqual(contar(codificado), 6)
+        self.assertEqual(decodificar(None), {})
+    
+    def test_migracao_do_formato_anterior(self):
+        """Testa se a sessão no formato antigo é lida e regravada no novo após uma alteração"""
+        request = self.criar_request_com_sessao()
+        request.session[settings.CARRINHO_SESSION_ID] = {
+            str(self.produto1.id): {'quantidade': 2, 'preco': '10.50'},
+        }
+        self.assertEqual(Carrinho.contar(request.session), 2)
+        carrinho = Carrinho(request)
+        self.assertEqual(len(carrinho), 2)
+        self.assertEqual(carrinho.get_total_price(), Decimal('21.00'))
+        
+        carrinho.adicionar(self.produto2)
+        self.assertEqual(
+            request.session[settings.CARRINHO_SESSION_ID],
+            {'v': 2, 'i': [self.produto1.id, self.produto2.id], 'q': [2, 1], 'c': [1050, 2500]},
+        )
+    
+    def test_carrinho_grande_ocupa_menos(self):
+        """Testa se o formato compacto reduz o tamanho serializado de um carrinho grande"""
+        from django.core.signing import JSONSerializer
+        from .codificacao import codificar
+        itens = {str(produto_id): {'quantidade': 2, 'preco': '149.90'} for produto_id in range(1, 501)}
+        serializador = JSONSerializer()
+        anterior = len(serializador.dumps({settings.CARRINHO_SESSION_ID: itens}))
+        compacto = len(serializador.dumps({settings.CARRINHO_SESSION_ID: codificar(itens)}))
+        self.assertLess(compacto * 3, anterior)
+
+
+class CarrinhoParcialTest(BaseCarrinhoTestCase):
+    """Testes para as respostas parciais (contador e linha) do carrinho"""
+    
+    def test_adicionar_ajax_retorna_fragmentos(self):
+        """Testa se adicionar via AJAX devolve o contador e a linha já renderizados"""
+        resposta = self.client.post(
+            reverse('carrinho:adicionar_ajax', args=[self.produto1.id]), {'quantidade': 2}
+        ).json()
+        self.assertTrue(resposta['success'])
+        self.assertEqual(resposta['total_items'], 2)
+        self.assertIn('<span class="carrinho-count">2</span>', resposta['contador'])
+        self.assertIn(f'data-carrinho-linha="{self.produto1.id}"', resposta['linha'])
+        self.assertIn('csrfmiddlewaretoken', resposta['linha'])
+        self.assertEqual(resposta['aviso'], '')
+    
+    def test_atualizar_e_remover_ajax(self):
+        """Testa se a atualização troca a linha e a remoção a apaga"""
+        self.client.post(reverse('carrinho:adicionar_ajax', args=[self.produto1.id]), {'quantidade': 2})
+        self.client.post(reverse('carrinho:adicionar_ajax', args=[self.produto2.id]), {'quantidade': 1})
+        resposta = self.client.post(
+            reverse('carrinho:adicionar_ajax', args=[self.produto1.id]), {'quantidade': 5, 'override': 'True'}
+        ).json()
+        self.assertEqual(resposta['total_items'], 6)
+        self.assertIn('<option value="5" selected>', resposta['linha'])
+        
+        resposta = self.client.post(reverse('carrinho:remover_ajax', args=[self.produto1.id])).json()
+        self.assertTrue(resposta['success'])
+        self.assertEqual(resposta['linha'], '')
+        self.assertEqual((resposta['total_items'], resposta['total_price']), (1, '25.00'))
+    
+    def test_contador_sem_consultas(self):
+        """Testa se o contador do cabeçalho usa só a contagem da sessão"""
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]), {'quantidade': 3})
+        with self.assertNumQueries(1):
+            # Só a leitura da sessão
+            resposta = self.client.get(reverse('carrinho:contador'))
+        self.assertContains(resposta, '<span class="carrinho-count">3</span>')
+        self.assertNotContains(resposta, '<html')
+    
+    def test_linha_do_carrinho(self):
+        """Testa se a linha é renderizada sozinha e dá 404 para produto fora do carrinho"""
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto1.id]))
+        resposta = self.client.get(reverse('carrinho:linha', args=[self.produto1.id]))
+        self.assertContains(resposta, self.produto1.nome)
+        self.assertNotContains(resposta, '<html')
+        resposta = self.client.get(reverse('carrinho:linha', args=[self.produto2.id]))
+        self.assertEqual(resposta.status_code, 404)
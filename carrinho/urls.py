@@ -11,4 +11,8 @@ urlpatterns = [
     
     # URLs AJAX (opcionais)
     path('ajax/adicionar/<int:produto_id>/', views.adicionar_carrinho_ajax, name='adicionar_ajax'),
+    path('ajax/remover/<int:produto_id>/', views.remover_carrinho_ajax, name='remover_ajax'),
+    path('ajax/lote/', views.atualizar_carrinho_lote, name='lote_ajax'),
+    path('ajax/contador/', views.contador_carrinho, name='contador'),
+    path('ajax/linha/<int:produto_id>/', views.linha_carrinho, name='linha'),
 ]
@@ -1,8 +1,15 @@
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.defaultfilters import floatformat
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET
 from produtos.models import Produto
-from .cart import Carrinho
+from .cart import Carrinho, descrever_alerta
 from .forms import FormAdicionarProdutoCarrinho
 
 
@@ -21,11 +28,17 @@ def adicionar_carrinho(request, produto_id):
         quantidade = 1
         override = False
     
-    carrinho.adicionar(
+    reservado = carrinho.adicionar(
         produto=produto, 
         quantidade=quantidade, 
         override_quantidade=override
     )
+    pedido = carrinho.carrinho[str(produto.id)]['quantidade']
+    if reservado < pedido:
+        messages.warning(
+            request,
+            f'{produto.nome}: só conseguimos reservar {reservado} de {pedido} unidade(s).'
+        )
     
     return redirect('carrinho:detalhe')
 
@@ -40,15 +53,55 @@ def remover_carrinho(request, produto_id):
     return redirect('carrinho:detalhe')
 
 
+def _preparar_item(item):
+    """Acrescenta ao item o formulário de atualização da quantidade"""
+    item['form_atualizacao'] = FormAdicionarProdutoCarrinho(initial={
+        'quantidade': item['quantidade'],
+        'override': True
+    })
+    return item
+
+
+def _renderizar_contador(total):
+    return render_to_string('carrinho/contador.html', {'carrinho_total': total})
+
+
+def _renderizar_linha(request, carrinho, produto_id):
+    """HTML da linha do produto na página do carrinho ('' se ele saiu do carrinho)"""
+    for item in carrinho:
+        if item['produto'].id == produto_id:
+            return render_to_string('carrinho/linha.html', {'item': _preparar_item(item)}, request=request)
+    return ''
+
+
+def _resposta_parcial(request, carrinho, produto_id, **dados):
+    """
+    Resposta das views AJAX: totais e os trechos de HTML que mudaram.
+
+    O script.js troca o contador do cabeçalho e a linha do produto sem
+    recarregar a página nem renderizar o base.html.
+    """
+    total_items = len(carrinho)
+    total_price = carrinho.get_total_price()
+    return JsonResponse({
+        'success': True,
+        'total_items': total_items,
+        'total_price': str(total_price),
+        'total_formatado': floatformat(total_price, 2),
+        'contador': _renderizar_contador(total_items),
+        'linha': _renderizar_linha(request, carrinho, produto_id),
+        **dados,
+    })
+
+
 def detalhe_carrinho(request):
     """View para exibir detalhes do carrinho"""
     carrinho = Carrinho(request)
+    for alerta in carrinho.revalidar():
+        messages.warning(request, descrever_alerta(alerta))
     
     for item in carrinho:
-        item['form_atualizacao'] = FormAdicionarProdutoCarrinho(initial={
-            'quantidade': item['quantidade'],
-            'override': True
-        })
+        _preparar_item(item)
     
     return render(request, 'carrinho/detalhe.html', {'carrinho': carrinho})
 
@@ -78,21 +131,120 @@ def adicionar_carrinho_ajax(request, produto_id):
                 'error': 'Quantidade deve estar entre 1 e 20'
             })
         
-        carrinho.adicionar(
+        reservado = carrinho.adicionar(
             produto=produto, 
             quantidade=quantidade, 
             override_quantidade=override
         )
+        pedido = carrinho.carrinho[str(produto.id)]['quantidade']
         
-        return JsonResponse({
-            'success': True,
-            'total_items': len(carrinho),
-            'total_price': str(carrinho.get_total_price()),
-            'message': f'{produto.nome} adicionado ao carrinho'
-        })
+        return _resposta_parcial(
+            request, carrinho, produto.id,
+            reservado=reservado,
+            message=f'{produto.nome} adicionado ao carrinho',
+            aviso=(
+                f'{produto.nome}: só conseguimos reservar {reservado} de {pedido} unidade(s).'
+                if reservado < pedido else ''
+            ),
+        )
         
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
-        })
\ No newline at end of file
+        })
+
+
+@require_POST
+def remover_carrinho_ajax(request, produto_id):
+    """View AJAX para remover produto do carrinho"""
+    carrinho = Carrinho(request)
+    produto = get_object_or_404(Produto, id=produto_id)
+    carrinho.remover(produto)
+    return _resposta_parcial(request, carrinho, produto.id, message=f'{produto.nome} removido do carrinho')
+
+
+@require_GET
+def contador_carrinho(request):
+    """Só o contador do cabeçalho, com a contagem guardada na sessão"""
+    total = Carrinho.contar(request.session, getattr(request, 'user', None))
+    return HttpResponse(_renderizar_contador(total))
+
+
+@require_GET
+def linha_carrinho(request, produto_id):
+    """Só a linha do produto na página do carrinho (404 se ele não está no carrinho)"""
+    carrinho = Carrinho(request)
+    if str(produto_id) not in carrinho.carrinho:
+        raise Http404
+    linha = _renderizar_linha(request, carrinho, produto_id)
+    if not linha:
+        raise Http404
+    return HttpResponse(linha)
+
+
+def _ler_operacoes(dados):
+    """
+    Valida as operações do lote: [{produto_id, quantidade, override}, ...].
+    Retorna (operações, erros); com qualquer erro, nada deve ser aplicado.
+    """
+    if isinstance(dados, dict):
+        dados = dados.get('itens')
+    limite = getattr(settings, 'CARRINHO_LOTE_MAX', 100)
+    if not isinstance(dados, list) or not dados:
+        return [], ['Envie uma lista de itens.']
+    if len(dados) > limite:
+        return [], [f'No máximo {limite} itens por lote.']
+    
+    operacoes, erros = [], []
+    for indice, operacao in enumerate(dados):
+        try:
+            produto_id = int(operacao['produto_id'])
+            quantidade = int(operacao.get('quantidade', 1))
+            override = bool(operacao.get('override', False))
+        except (TypeError, KeyError, ValueError, AttributeError):
+            erros.append(f'Item {indice}: produto_id e quantidade devem ser números.')
+            continue
+        minimo = 0 if override else 1
+        if not minimo <= quantidade <= 20:
+            erros.append(f'Item {indice}: quantidade deve estar entre {minimo} e 20.')
+            continue
+        operacoes.append((produto_id, quantidade, override))
+    return operacoes, erros
+
+
+@require_POST
+def atualizar_carrinho_lote(request):
+    """
+    View AJAX que aplica várias alterações ao carrinho de uma vez.
+
+    Os produtos são validados com uma única consulta e o lote é aplicado
+    inteiro ou recusado inteiro. override com quantidade 0 remove o item,
+    mesmo que o produto tenha ficado indisponível.
+    """
+    try:
+        dados = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'error': 'JSON inválido'})
+    
+    operacoes, erros = _ler_operacoes(dados)
+    produtos = Produto.objects.in_bulk({produto_id for produto_id, _, _ in operacoes})
+    # Remoções (override com quantidade 0) valem mesmo para produtos indisponíveis ou excluídos
+    erros += [
+        f'Produto {produto_id} não encontrado.'
+        for produto_id in dict.fromkeys(
+            produto_id for produto_id, quantidade, override in operacoes if not (override and quantidade == 0)
+        )
+        if produto_id not in produtos or not produtos[produto_id].disponivel
+    ]
+    if erros:
+        return JsonResponse({'success': False, 'errors': erros})
+    
+    carrinho = Carrinho(request)
+    reservados = carrinho.aplicar_lote(operacoes, produtos)
+    return JsonResponse({
+        'success': True,
+        'total_items': len(carrinho),
+        'total_price': str(carrinho.get_total_price()),
+        'reservados': reservados,
+    })
@@ -1,4 +1,2 @@
-from django.contrib import admin
-from .models import Categoria
-
-admin.site.register(Categoria)
\ No newline at end of file
+# categorias/admin.py
+# Categoria é registrada em produtos/admin.py, junto do modelo
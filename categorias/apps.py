@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class CategoriasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'categorias'
+
+    def ready(self):
+        from .signals import categoria_alterada
+        post_save.connect(categoria_alterada, sender='produtos.Categoria')
+        post_delete.connect(categoria_alterada, sender='produtos.Categoria')
@@ -0,0 +1,77 @@
+# categorias/cache.py
+import threading
+
+from django.apps import apps
+from django.db import transaction
+
+from produtos import marcas
+
+# Cópia local (por processo) das categorias: rótulo do modelo -> (versão, lista)
+_categorias_locais = {}
+_lock = threading.Lock()
+
+
+class ListaCategorias(list):
+    """Lista de categorias em cache com a parte da API de QuerySet usada nas views"""
+
+    def __init__(self, model, categorias):
+        super().__init__(categorias)
+        self.model = model
+
+    def count(self):
+        """Equivalente ao QuerySet.count(), sem consulta"""
+        return len(self)
+
+
+def chave_versao(modelo):
+    """Chave da versão das categorias do modelo (produtos.marcas)"""
+    return f'categorias:versao:{modelo._meta.label_lower}'
+
+
+def versao_atual(modelo):
+    """Versão publicada no banco, criada na primeira leitura"""
+    return marcas.atual(chave_versao(modelo))
+
+
+def invalidar_categorias(modelo):
+    """Publica uma nova versão; cada processo recarrega na próxima leitura"""
+    def publicar():
+        marcas.avancar(chave_versao(modelo))
+
+    publicar()
+    # Publica de novo após o commit para descartar o que for lido antes dele
+    transaction.on_commit(publicar)
+
+
+def obter_categorias(modelo=None):
+    """
+    Retorna todas as categorias sem ir ao banco enquanto a versão não mudar.
+
+    A lista fica em memória no processo e só é recarregada quando a versão
+    guardada no banco é trocada por um save/delete de categoria (outros
+    processos notam em até MARCAS_TTL segundos).
+    """
+    modelo = modelo or apps.get_model('produtos', 'Categoria')
+    rotulo = modelo._meta.label_lower
+    versao = versao_atual(modelo)
+    guardado = _categorias_locais.get(rotulo)
+    if guardado is None or guardado[0] != versao:
+        with _lock:
+            guardado = _categorias_locais.get(rotulo)
+            if guardado is None or guardado[0] != versao:
+                guardado = (versao, list(modelo.objects.all()))
+                _categorias_locais[rotulo] = guardado
+    return ListaCategorias(modelo, guardado[1])
+
+
+def obter_categoria_por_slug(slug, modelo=None):
+    """Procura a categoria pelo slug na lista em cache"""
+    for categoria in obter_categorias(modelo):
+        if categoria.slug == slug:
+            return categoria
+    return None
+
+
+def ids_da_subarvore(categoria, modelo=None):
+    """Ids da categoria e das descendentes, pelo prefixo do caminho na lista em cache"""
+    return {c.id for c in obter_categorias(modelo) if c.caminho.startswith(categoria.caminho)}
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 02:40
+
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def copiar_categorias(apps, schema_editor):
+    # Leva para a árvore única as categorias que só existiam neste app
+    Antiga = apps.get_model('categorias', 'Categoria')
+    Categoria = apps.get_model('produtos', 'Categoria')
+    nomes = {nome.lower() for nome in Categoria.objects.values_list('nome', flat=True)}
+    usados = set(Categoria.objects.values_list('slug', flat=True))
+    novas = []
+    for antiga in Antiga.objects.order_by('id'):
+        if antiga.nome.lower() in nomes:
+            continue
+        base = slugify(antiga.nome)[:40] or 'categoria'
+        slug, sufixo = base, 2
+        while slug in usados:
+            slug, sufixo = f'{base}-{sufixo}', sufixo + 1
+        usados.add(slug)
+        nomes.add(antiga.nome.lower())
+        novas.append(Categoria(nome=antiga.nome, slug=slug, caminho=f'{slug}/'))
+    Categoria.objects.bulk_create(novas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categorias', '0002_remove_categoria_slug'),
+        ('produtos', '0006_categoria_arvore'),
+    ]
+
+    operations = [
+        migrations.RunPython(copiar_categorias, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='Categoria',
+        ),
+    ]
@@ -1,16 +1,4 @@
 # categorias/models.py
-from django.db import models
-
-class Categoria(models.Model):
-    nome = models.CharField(max_length=100)
-
-class Categoria(models.Model):
-    nome = models.CharField(max_length=100)
-    
-    def __str__(self):
-        return self.nome
-    
-    class Meta:
-        ordering = ['nome']  # Ordena por nome
-        verbose_name = 'Categoria'
-        verbose_name_plural = 'Categorias'
\ No newline at end of file
+# A árvore de categorias é uma só, definida em produtos.models; o app
+# categorias cuida do cache e da página com a árvore.
+from produtos.models import Categoria  # noqa: F401
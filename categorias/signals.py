@@ -0,0 +1,7 @@
+# categorias/signals.py
+from .cache import invalidar_categorias
+
+
+def categoria_alterada(sender, **kwargs):
+    """Invalida o cache de categorias do modelo alterado"""
+    invalidar_categorias(sender)
@@ -187,3 +187,163 @@ class CategoriaPerformanceTest(TestCase):
         
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['categorias']), 100)
+
+
+class CategoriaCacheTest(TestCase):
+    """Testes para o cache de categorias compartilhado entre as views"""
+    
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome="Eletrônicos")
+        self.categoria_produto = Categoria.objects.create(nome="Doces", slug="doces")
+    
+    def test_segunda_leitura_sem_consulta(self):
+        """Testa se a lista em cache é reaproveitada sem ir ao banco"""
+        from .cache import obter_categorias
+        obter_categorias(Categoria)
+        with self.assertNumQueries(0):
+            categorias = obter_categorias(Categoria)
+        self.assertEqual(list(categorias), [self.categoria_produto, self.categoria])
+        self.assertEqual(categorias.count(), 2)
+        self.assertEqual(categorias.model, Categoria)
+    
+    def test_save_invalida_cache(self):
+        """Testa se criar ou alterar uma categoria invalida o cache"""
+        from .cache import obter_categorias
+        obter_categorias(Categoria)
+        Categoria.objects.create(nome="Roupas")
+        self.assertEqual(len(obter_categorias(Categoria)), 3)
+        
+        self.categoria.nome = "Informática"
+        self.categoria.save()
+        nomes = [c.nome for c in obter_categorias(Categoria)]
+        self.assertIn("Informática", nomes)
+    
+    def test_delete_invalida_cache(self):
+        """Testa se excluir uma categoria invalida o cache"""
+        from .cache import obter_categorias
+        obter_categorias(Categoria)
+        self.categoria_produto.delete()
+        self.assertEqual(list(obter_categorias(Categoria)), [self.categoria])
+    
+    def test_versao_publicada_por_outro_processo(self):
+        """Testa se uma categoria gravada por outro processo aparece quando a marca local expira"""
+        from django.core.cache import cache
+        from django.utils import timezone
+        from produtos.models import MarcaAlteracao
+        from .cache import chave_versao, obter_categorias
+        obter_categorias(Categoria)
+        # Outro processo: grava no banco e publica a versão sem passar pelo cache deste
+        Categoria.objects.bulk_create([Categoria(nome="Roupas", slug="roupas", caminho="9999/")])
+        MarcaAlteracao.objects.filter(chave=chave_versao(Categoria)).update(versao=timezone.now())
+        self.assertEqual(len(obter_categorias(Categoria)), 2)
+        cache.delete(f'marca:{chave_versao(Categoria)}')
+        self.assertEqual(len(obter_categorias(Categoria)), 3)
+    
+    def test_modelo_unico_de_categoria(self):
+        """Testa se os dois apps compartilham a mesma árvore de categorias"""
+        from produtos.models import Categoria as CategoriaProduto
+        from .cache import obter_categorias
+        self.assertIs(Categoria, CategoriaProduto)
+        self.assertEqual(list(obter_categorias(Categoria)), list(obter_categorias()))
+    
+    def test_busca_por_slug(self):
+        """Testa a busca de categoria por slug na lista em cache"""
+        from .cache import obter_categoria_por_slug
+        self.assertEqual(obter_categoria_por_slug("doces"), self.categoria_produto)
+        self.assertIsNone(obter_categoria_por_slug("inexistente"))
+    
+    def test_views_sem_consultas_de_categoria(self):
+        """Testa se as páginas do catálogo não consultam categorias"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        urls = [
+            reverse('categorias:lista'),
+            reverse('produtos:lista'),
+            reverse('produtos:lista_por_categoria', args=['doces']),
+        ]
+        for url in urls:
+            self.client.get(url)
+        for url in urls:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            tabelas = ' '.join(q['sql'] for q in consultas.captured_queries)
+            self.assertNotIn('"categorias_categoria"', tabelas)
+            self.assertNotIn('FROM "produtos_categoria"', tabelas)
+
+
+class CategoriaArvoreTest(TestCase):
+    """Testes para a árvore de categorias com caminho materializado"""
+    
+    def setUp(self):
+        self.casa = Categoria.objects.create(nome="Casa")
+        self.cozinha = Categoria.objects.create(nome="Cozinha", pai=self.casa)
+        self.panelas = Categoria.objects.create(nome="Panelas", pai=self.cozinha)
+        self.jardim = Categoria.objects.create(nome="Jardim")
+    
+    def test_caminho_e_slug(self):
+        """Testa o slug gerado pelo nome e o caminho desde a raiz"""
+        self.assertEqual(self.panelas.slug, 'panelas')
+        self.assertEqual(self.panelas.caminho, 'casa/cozinha/panelas/')
+        self.assertEqual(self.panelas.nivel, 2)
+        self.assertEqual(Categoria.objects.create(nome="Casa").slug, 'casa-2')
+    
+    def test_subarvore_por_prefixo(self):
+        """Testa se a subárvore sai de uma consulta por prefixo"""
+        with self.assertNumQueries(1):
+            subarvore = list(self.casa.subarvore())
+        self.assertEqual(subarvore, [self.casa, self.cozinha, self.panelas])
+    
+    def test_mover_categoria_leva_descendentes(self):
+        """Testa se mover ou renomear uma categoria atualiza a subárvore"""
+        self.cozinha.pai = self.jardim
+        self.cozinha.save()
+        self.panelas.refresh_from_db()
+        self.assertEqual(self.panelas.caminho, 'jardim/cozinha/panelas/')
+        
+        self.jardim.slug = 'area-externa'
+        self.jardim.save()
+        self.panelas.refresh_from_db()
+        self.assertEqual(self.panelas.caminho, 'area-externa/cozinha/panelas/')
+    
+    def test_ciclo_recusado(self):
+        """Testa se uma categoria não pode ir para dentro da própria subárvore"""
+        self.casa.pai = self.panelas
+        with self.assertRaises(ValueError):
+            self.casa.save()
+    
+    def test_bulk_create_monta_caminho(self):
+        """Testa se bulk_create também preenche slug e caminho"""
+        Categoria.objects.bulk_create([
+            Categoria(nome="Talheres", pai=self.cozinha),
+            Categoria(nome="Talheres"),
+        ])
+        caminhos = set(Categoria.objects.filter(nome="Talheres").values_list('caminho', flat=True))
+        self.assertEqual(caminhos, {'casa/cozinha/talheres/', 'talheres-2/'})
+    
+    def test_lista_renderiza_arvore(self):
+        """Testa se a página de categorias mostra a árvore em ordem de caminho"""
+        response = self.client.get(reverse('categorias:lista'))
+        nomes = [c.nome for c in response.context['categorias']]
+        self.assertEqual(nomes, ['Casa', 'Cozinha', 'Panelas', 'Jardim'])
+        self.assertContains(response, 'margin-left: 48px')
+        self.assertContains(response, self.panelas.get_absolute_url())
+    
+    def test_produtos_da_subarvore(self):
+        """Testa se a listagem da categoria inclui os produtos das descendentes"""
+        from decimal import Decimal
+        from produtos.models import Produto
+        panela = Produto.objects.create(
+            nome='Panela', slug='panela', descricao='Inox',
+            preco=Decimal('80.00'), estoque=2, categoria=self.panelas
+        )
+        Produto.objects.create(
+            nome='Mangueira', slug='mangueira', descricao='10m',
+            preco=Decimal('40.00'), estoque=2, categoria=self.jardim
+        )
+        response = self.client.get(self.casa.get_absolute_url())
+        self.assertEqual(list(response.context['produtos']), [panela])
+        totais = dict(response.context['facetas']['categorias'])
+        self.assertEqual(totais[self.casa], 1)
+        self.assertEqual(totais[self.cozinha], 1)
+        self.assertEqual(totais[self.jardim], 1)
@@ -1,7 +1,9 @@
 # categorias/views.py
 from django.shortcuts import render
-from .models import Categoria  # Certifique-se de criar um modelo Categoria
+from .cache import obter_categorias
+from .models import Categoria
 
 def lista(request):
-    categorias = Categoria.objects.all()  # Pegando todas as categorias
+    # Árvore inteira em cache, já na ordem do caminho (no máximo uma consulta)
+    categorias = obter_categorias(Categoria)
     return render(request, 'categorias/lista.html', {'categorias': categorias})
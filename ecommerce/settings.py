@@ -120,6 +120,85 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 # ===== CONFIGURAÇÕES DO CARRINHO =====
 # ID da sessão do carrinho
 CARRINHO_SESSION_ID = 'carrinho'
+# Número de itens do carrinho guardado na sessão (contador do cabeçalho)
+CARRINHO_TOTAL_SESSION = 'carrinho_total'
+# Total e alertas da última revalidação de preços, com a versão do catálogo
+CARRINHO_PRECOS_SESSION = 'carrinho_precos'
+# Operações aceitas por requisição no endpoint de lote do carrinho
+CARRINHO_LOTE_MAX = 100
+# Identificador do carrinho nas reservas de estoque
+CARRINHO_CHAVE_SESSION = 'carrinho_chave'
+# Minutos que um item fica reservado sem o carrinho ser mexido
+RESERVA_MINUTOS = 15
+
+
+# ===== CONFIGURAÇÕES DE SESSÃO =====
+# Banco por padrão. Para tráfego pesado de carrinho use 'carrinho.sessao': grava no
+# cache e persiste no banco depois, com manage.py persistir_sessoes --intervalo 5
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_CACHE_ALIAS = 'sessoes'
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    # Com arquivo, 'carrinho.sessao' lê do cache mas grava no banco na hora (como
+    # cached_db). A gravação adiada exige Redis ou Memcached, sem despejo de chaves:
+    # 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://...'
+    'sessoes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'sessoes',
+        # Uma entrada por sessão ativa; acima disso o cache descarta parte dos arquivos
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+
+# ===== CONFIGURAÇÕES DO CATÁLOGO =====
+# Segundos que cada processo reaproveita as marcas d'água do catálogo e das
+# categorias lidas do banco; alterações de outros processos aparecem nesse prazo
+MARCAS_TTL = 2
+
+# Paginação por cursor da listagem de produtos
+PRODUTOS_POR_PAGINA = 24
+PRODUTOS_POR_PAGINA_MAX = 96
+
+# Quantidade máxima de resultados da busca textual
+BUSCA_MAX_RESULTADOS = 48
+
+# Tempo de vida dos fragmentos de card de produto em cache (segundos)
+CARD_PRODUTO_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Rendições das imagens de produto (larguras em pixels, WebP e JPEG)
+RENDICOES_LARGURAS = [320, 640, 1024]
+RENDICOES_QUALIDADE = 80
+RENDICOES_PROCESSOS = None  # None = um processo por CPU
+RENDICOES_AUTOMATICAS = True  # Gera ao salvar um produto com imagem nova
+
+# API JSON do catálogo
+API_MAX_IDS = 100  # Ids aceitos por requisição em ?ids=
+API_CACHE_TIMEOUT = 300  # Respostas em cache; a marca d'água do catálogo invalida antes
+
+# Importação em lote (manage.py import_produtos)
+IMPORTACAO_LOTE = 1000  # Linhas gravadas por transação
+EXPORTACAO_BLOCO = 2000  # Linhas lidas do banco por vez nas exportações
+
+# "Comprados juntos" (manage.py atualizar_recomendacoes)
+RECOMENDACOES_POR_PRODUTO = 8  # K produtos guardados e exibidos por produto
+RECOMENDACOES_BLOCO = 1000  # Pedidos somados à matriz por transação
+RECOMENDACOES_ATRASO = 60  # Segundos até um pedido novo entrar no índice
+
+# Mais vendidos (manage.py atualizar_mais_vendidos)
+RANKING_LOTE = 1000  # Pedidos pagos somados ao ranking por transação
+RANKING_TAMANHO = 5  # Produtos exibidos no ranking da listagem
+
+
+# ===== SALA DE ESPERA DO CHECKOUT (pedidos.admissao) =====
+# O estado fica no cache padrão: use um cache compartilhado entre processos em produção
+ADMISSAO_CONCORRENCIA = 20  # Requisições simultâneas no checkout (0 desativa)
+ADMISSAO_FILA_MAX = 500  # Com a fila nesse tamanho, novos visitantes recebem 503
+ADMISSAO_INTERVALO = 5  # Segundos entre as atualizações da página da fila
+ADMISSAO_VAGA_TIMEOUT = 30  # Uma vaga não devolvida expira sozinha
+ADMISSAO_RETRY_AFTER = 30  # Retry-After das respostas 503
+ADMISSAO_PASSE = 600  # Segundos em que um cliente admitido volta ao checkout sem fila
+ADMISSAO_ESPERA_PASSE = 3  # Segundos que um cliente admitido espera por uma vaga antes do 503
 
 
 # ===== CONFIGURAÇÕES DE LOGIN =====
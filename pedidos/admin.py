@@ -1,7 +1,17 @@
 # pedidos/admin.py
 from django.contrib import admin
+from produtos.exportacao import resposta_exportacao
+from .exportacao import COLUNAS_PEDIDOS, linhas_pedidos
 from .models import Pedido, ItemPedido
 
+@admin.action(description='Exportar pedidos selecionados com itens (CSV)')
+def exportar_csv(modeladmin, request, queryset):
+    return resposta_exportacao('pedidos', 'csv', COLUNAS_PEDIDOS, linhas_pedidos(queryset))
+
+@admin.action(description='Exportar pedidos selecionados com itens (JSONL)')
+def exportar_jsonl(modeladmin, request, queryset):
+    return resposta_exportacao('pedidos', 'jsonl', COLUNAS_PEDIDOS, linhas_pedidos(queryset))
+
 class ItemPedidoInline(admin.TabularInline):
     model = ItemPedido
     extra = 0
@@ -20,6 +30,7 @@ class PedidoAdmin(admin.ModelAdmin):
     search_fields = ['nome', 'email', 'usuario__username']
     readonly_fields = ['data_criacao', 'get_total_cost_display']
     inlines = [ItemPedidoInline]
+    actions = [exportar_csv, exportar_jsonl]
     
     def get_total_cost_display(self, obj):
         return f"R$ {obj.get_total_cost():.2f}"
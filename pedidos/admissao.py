@@ -0,0 +1,194 @@
+# pedidos/admissao.py
+#
+# Sala de espera do checkout.
+#
+# No máximo ADMISSAO_CONCORRENCIA requisições rodam o checkout ao mesmo
+# tempo; cada uma ocupa uma vaga no cache (cache.add, atômico em todos os
+# backends) e a devolve ao terminar. Uma vaga presa por um processo que
+# morreu expira sozinha após ADMISSAO_VAGA_TIMEOUT segundos.
+#
+# Quem não consegue vaga recebe uma senha numerada e uma página que se
+# atualiza a cada ADMISSAO_INTERVALO segundos. Só as senhas na frente da
+# fila disputam as vagas liberadas; senhas que deixam de atualizar a
+# página expiram e a fila anda. Com ADMISSAO_FILA_MAX pessoas esperando,
+# novos visitantes recebem 503 com Retry-After na hora, sem tocar no banco.
+#
+# Quem é atendido ganha um passe na sessão por ADMISSAO_PASSE segundos:
+# o envio do formulário (e recarregamentos) dentro desse prazo não volta
+# para a fila, mas ainda precisa de uma vaga. Sem vaga livre, o portador
+# espera até ADMISSAO_ESPERA_PASSE segundos por uma antes de receber 503.
+# O passe acaba com o pedido criado.
+#
+# O estado fica no cache padrão: para o limite valer entre processos, ele
+# precisa ser compartilhado (Memcached, Redis ou banco).
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+CHAVE_VAGA = 'admissao:vaga:{}'
+CHAVE_EMITIDAS = 'admissao:emitidas'
+CHAVE_FRENTE = 'admissao:frente'
+CHAVE_SENHA = 'admissao:senha:{}'
+CHAVE_TRAVA_FRENTE = 'admissao:frente:trava'
+SESSAO_SENHA = 'admissao_senha'
+SESSAO_PASSE = 'admissao_passe'
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def ocupar_vaga():
+    """Tenta ocupar uma das vagas do checkout; retorna a chave dela ou None"""
+    vagas = list(range(_config('ADMISSAO_CONCORRENCIA', 20)))
+    random.shuffle(vagas)
+    for numero in vagas:
+        chave = CHAVE_VAGA.format(numero)
+        if cache.add(chave, 1, _config('ADMISSAO_VAGA_TIMEOUT', 30)):
+            return chave
+    return None
+
+
+def liberar_vaga(chave):
+    cache.delete(chave)
+
+
+def _contador(chave):
+    return cache.get(chave) or 0
+
+
+def emitir_senha():
+    """Próximo número da fila"""
+    cache.add(CHAVE_EMITIDAS, 0, None)
+    try:
+        senha = cache.incr(CHAVE_EMITIDAS)
+    except ValueError:
+        # O contador saiu do cache entre o add e o incr: a fila recomeça
+        cache.set(CHAVE_EMITIDAS, 1, None)
+        senha = 1
+    manter_senha(senha)
+    return senha
+
+
+def manter_senha(senha):
+    """Renova a senha; quem para de atualizar a página perde o lugar"""
+    cache.set(CHAVE_SENHA.format(senha), 1, 3 * _config('ADMISSAO_INTERVALO', 5))
+
+
+def avancar_fila():
+    """
+    Anda com a frente da fila sobre as senhas que já saíram (atendidas ou
+    expiradas) e retorna o número da última senha que passou.
+    """
+    frente = _contador(CHAVE_FRENTE)
+    emitidas = _contador(CHAVE_EMITIDAS)
+    if frente >= emitidas or not cache.add(CHAVE_TRAVA_FRENTE, 1, 5):
+        return min(frente, emitidas)
+    try:
+        limite = frente + _config('ADMISSAO_FILA_MAX', 500)
+        while frente < min(emitidas, limite) and cache.get(CHAVE_SENHA.format(frente + 1)) is None:
+            frente += 1
+        cache.set(CHAVE_FRENTE, frente, None)
+    finally:
+        cache.delete(CHAVE_TRAVA_FRENTE)
+    return frente
+
+
+def tamanho_fila():
+    return max(0, _contador(CHAVE_EMITIDAS) - avancar_fila())
+
+
+def conceder_passe(request):
+    """Guarda na sessão até quando o visitante admitido pode voltar sem fila"""
+    request.session[SESSAO_PASSE] = int(time.time()) + _config('ADMISSAO_PASSE', 600)
+
+
+def tem_passe(request):
+    return request.session.get(SESSAO_PASSE, 0) > time.time()
+
+
+def encerrar_passe(request):
+    """Pedido concluído: o próximo checkout volta a passar pela fila"""
+    request.session.pop(SESSAO_PASSE, None)
+
+
+def esperar_vaga():
+    """Tenta ocupar uma vaga por até ADMISSAO_ESPERA_PASSE segundos"""
+    limite = time.monotonic() + _config('ADMISSAO_ESPERA_PASSE', 3)
+    while True:
+        vaga = ocupar_vaga()
+        if vaga is not None or time.monotonic() >= limite:
+            return vaga
+        time.sleep(0.1)
+
+
+def _resposta_fila(request, senha=None, status=200):
+    intervalo = _config('ADMISSAO_INTERVALO', 5)
+    posicao = max(1, senha - avancar_fila()) if senha else None
+    resposta = render(request, 'pedidos/fila.html', {
+        'posicao': posicao,
+        'intervalo': intervalo,
+        'lotado': status == 503,
+    }, status=status)
+    resposta['Retry-After'] = str(intervalo if status == 200 else _config('ADMISSAO_RETRY_AFTER', 30))
+    resposta['Cache-Control'] = 'no-store'
+    return resposta
+
+
+def controle_admissao(view):
+    """
+    Limita as requisições simultâneas da view e enfileira o excedente.
+
+    GETs sem vaga entram na fila. Quem foi admitido recebe um passe que,
+    até expirar, dispensa a fila (inclusive no envio do formulário), mas
+    não o limite: o portador espera um pouco por uma vaga. Um POST que
+    fica sem vaga não pode esperar em uma página que se atualiza: recebe
+    503 com Retry-After e a página pede ao cliente que tente de novo (o
+    navegador não reenvia o formulário sozinho).
+    """
+    @wraps(view)
+    def envoltorio(request, *args, **kwargs):
+        if not _config('ADMISSAO_CONCORRENCIA', 20):
+            return view(request, *args, **kwargs)
+
+        if tem_passe(request):
+            # Já admitido: não volta para a fila, mas só entra com uma vaga
+            vaga = esperar_vaga()
+            if vaga is None:
+                return _resposta_fila(request, status=503)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                liberar_vaga(vaga)
+
+        senha = request.session.get(SESSAO_SENHA)
+        if senha is not None:
+            manter_senha(senha)
+            # Só a frente da fila disputa as vagas que forem liberadas
+            na_frente = senha - avancar_fila() <= _config('ADMISSAO_CONCORRENCIA', 20)
+        else:
+            na_frente = request.method == 'POST' or tamanho_fila() == 0
+
+        vaga = ocupar_vaga() if na_frente else None
+        if vaga is None:
+            if senha is not None:
+                return _resposta_fila(request, senha)
+            if request.method == 'POST' or tamanho_fila() >= _config('ADMISSAO_FILA_MAX', 500):
+                return _resposta_fila(request, status=503)
+            senha = request.session[SESSAO_SENHA] = emitir_senha()
+            return _resposta_fila(request, senha)
+
+        if senha is not None:
+            # Atendido: a senha sai da fila
+            del request.session[SESSAO_SENHA]
+            cache.delete(CHAVE_SENHA.format(senha))
+        conceder_passe(request)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            liberar_vaga(vaga)
+    return envoltorio
@@ -0,0 +1,104 @@
+# pedidos/estoque.py
+from django.db import transaction
+from django.db.models import F
+
+from carrinho.models import Reserva
+from carrinho.reservas import devolver
+from produtos import facetas, fatias
+from produtos.condicional import marcar_alteracao_catalogo
+from produtos.models import Produto
+
+
+class EstoqueInsuficiente(Exception):
+    """Um ou mais itens do pedido não têm estoque suficiente"""
+
+    def __init__(self, faltas):
+        # Lista de (produto, quantidade pedida, quantidade disponível)
+        self.faltas = faltas
+        super().__init__(', '.join(f'{produto.nome}: {pedida} > {disponivel}' for produto, pedida, disponivel in faltas))
+
+    def mensagens(self):
+        """Uma mensagem por item, para exibir no carrinho"""
+        for produto, pedida, disponivel in self.faltas:
+            if not produto.disponivel or disponivel == 0:
+                yield f'{produto.nome} esgotou e foi mantido no carrinho.'
+            else:
+                yield f'{produto.nome}: restam apenas {disponivel} unidade(s), você pediu {pedida}.'
+
+
+def baixar_estoque(quantidades, chave=None):
+    """
+    Desconta do estoque as quantidades {produto_id: quantidade} de uma vez.
+
+    Cada produto recebe um UPDATE condicional (estoque >= quantidade), que
+    lê e grava a linha sob o mesmo lock: duas compras simultâneas nunca
+    vendem a mesma unidade. Os produtos são atualizados em ordem de id,
+    então transações concorrentes travam as linhas na mesma ordem e não
+    entram em deadlock. Se algum item faltar, nada é descontado e
+    EstoqueInsuficiente lista todos os itens com problema.
+
+    Com a chave do carrinho, as reservas dele viram a venda: as unidades
+    reservadas contam como disponíveis para este pedido e as reservas são
+    apagadas junto com a baixa.
+
+    Produtos com estoque fatiado são descontados de uma das fatias
+    (produtos.fatias.retirar), sem travar a linha do produto.
+    """
+    quantidades = {produto_id: quantidade for produto_id, quantidade in quantidades.items() if quantidade > 0}
+    with transaction.atomic():
+        reservas = {}
+        if chave:
+            reservas = dict(
+                Reserva.objects.select_for_update().filter(chave=chave)
+                .order_by('produto_id').values_list('produto_id', 'quantidade')
+            )
+
+        fatiados = set(Produto.objects.filter(id__in=list(quantidades), fatias_estoque__gt=0).values_list('id', flat=True))
+        faltando = []
+        for produto_id in sorted(quantidades):
+            if produto_id in fatiados:
+                # Estoque dividido em fatias: a disputa fica nas linhas de FatiaEstoque
+                if not (Produto.objects.filter(id=produto_id, disponivel=True).exists()
+                        and fatias.retirar(produto_id, quantidades[produto_id])):
+                    faltando.append(produto_id)
+                continue
+            reservada = reservas.get(produto_id, 0)
+            atualizados = Produto.objects.filter(
+                id=produto_id, disponivel=True,
+                estoque__gte=F('reservado') - reservada + quantidades[produto_id],
+            ).update(
+                estoque=F('estoque') - quantidades[produto_id],
+                reservado=F('reservado') - reservada,
+            )
+            if not atualizados:
+                faltando.append(produto_id)
+
+        if faltando:
+            produtos = Produto.objects.in_bulk(faltando)
+            for produto_id, total in fatias.estoque_fatiado(fatiados.intersection(faltando)).items():
+                produtos[produto_id].estoque = total
+            raise EstoqueInsuficiente([
+                (
+                    produtos[produto_id], quantidades[produto_id],
+                    max(0, produtos[produto_id].estoque - produtos[produto_id].reservado + reservas.get(produto_id, 0)),
+                )
+                for produto_id in faltando if produto_id in produtos
+            ])
+
+        if reservas:
+            # Reservas de itens que saíram do pedido voltam ao disponível
+            devolver({produto_id: q for produto_id, q in reservas.items() if produto_id not in quantidades})
+            Reserva.objects.filter(chave=chave).delete()
+
+        # update() não dispara sinais: quem esgotou muda de linha no resumo de facetas
+        esgotados = list(Produto.objects.filter(id__in=list(quantidades), estoque=0).values_list(
+            'categoria_id', 'preco', 'disponivel'
+        ))
+        for categoria_id, preco, disponivel in esgotados:
+            facetas.registrar_alteracao(
+                facetas.chave_faceta(categoria_id, preco, 1, disponivel),
+                facetas.chave_faceta(categoria_id, preco, 0, disponivel),
+            )
+        if quantidades:
+            # Qualquer baixa muda o estoque exibido (API, ETags, alertas do carrinho)
+            transaction.on_commit(marcar_alteracao_catalogo)
@@ -0,0 +1,34 @@
+# pedidos/exportacao.py
+from produtos.exportacao import tamanho_bloco
+
+from .models import Pedido
+
+# Uma linha por item; pedidos sem itens aparecem uma vez com as colunas do item vazias
+COLUNAS_PEDIDOS = (
+    'pedido', 'data', 'status', 'metodo_pagamento', 'usuario', 'nome', 'email',
+    'endereco', 'cep', 'cidade', 'item', 'produto_id', 'produto', 'quantidade',
+    'preco', 'subtotal',
+)
+CONSULTA_PEDIDOS = (
+    'id', 'data_criacao', 'status', 'metodo_pagamento', 'usuario__username', 'nome', 'email',
+    'endereco', 'cep', 'cidade', 'items__id', 'items__produto_id', 'items__produto__nome',
+    'items__quantidade', 'items__preco',
+)
+
+
+def linhas_pedidos(queryset=None):
+    """
+    Linhas da exportação de pedidos com seus itens.
+
+    Uma única consulta com JOIN lida em blocos pelo iterator(); o subtotal
+    é calculado aqui para não depender de get_cost() por item.
+    """
+    queryset = Pedido.objects.all() if queryset is None else queryset
+    linhas = (
+        queryset.order_by('id', 'items__id')
+        .values_list(*CONSULTA_PEDIDOS)
+        .iterator(chunk_size=tamanho_bloco())
+    )
+    for linha in linhas:
+        quantidade, preco = linha[-2], linha[-1]
+        yield linha + (preco * quantidade if preco is not None else None,)
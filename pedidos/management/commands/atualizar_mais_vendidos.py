@@ -0,0 +1,21 @@
+# pedidos/management/commands/atualizar_mais_vendidos.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from pedidos.ranking import atualizar_ranking
+
+
+class Command(BaseCommand):
+    help = 'Soma ao ranking de mais vendidos os pedidos pagos ainda não contabilizados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Zera o ranking e reprocessa todos os pedidos pagos (carga inicial)')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        pedidos = atualizar_ranking(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{pedidos} pedidos pagos somados ao ranking em {time.monotonic() - inicio:.2f}s'
+        ))
@@ -0,0 +1,22 @@
+# pedidos/management/commands/atualizar_recomendacoes.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from pedidos.recomendacoes import atualizar_recomendacoes
+
+
+class Command(BaseCommand):
+    help = 'Atualiza o índice "comprados juntos" com os pedidos feitos desde a última execução'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Descarta a matriz e reprocessa todo o histórico de pedidos')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        pedidos, produtos = atualizar_recomendacoes(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{pedidos} pedidos processados, {produtos} produtos com recomendações '
+            f'atualizadas em {time.monotonic() - inicio:.2f}s'
+        ))
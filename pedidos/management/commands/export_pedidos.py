@@ -0,0 +1,31 @@
+# pedidos/management/commands/export_pedidos.py
+from django.core.management.base import BaseCommand
+
+from pedidos.exportacao import COLUNAS_PEDIDOS, linhas_pedidos
+from pedidos.models import Pedido
+from produtos.exportacao import FORMATOS, gerar_exportacao
+
+
+class Command(BaseCommand):
+    help = 'Exporta pedidos e itens em CSV ou JSONL, lendo o banco em blocos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--saida', help='Arquivo de destino (padrão: saída padrão)')
+        parser.add_argument('--status', choices=[valor for valor, _ in Pedido.STATUS_CHOICES],
+                            help='Exporta apenas pedidos neste status')
+
+    def handle(self, *args, **options):
+        pedidos = Pedido.objects.all()
+        if options['status']:
+            pedidos = pedidos.filter(status=options['status'])
+
+        pedacos = gerar_exportacao(options['formato'], COLUNAS_PEDIDOS, linhas_pedidos(pedidos))
+        if not options['saida']:
+            # self.stdout respeita o stdout= do call_command; os pedaços já trazem as quebras de linha
+            for pedaco in pedacos:
+                self.stdout.write(pedaco, ending='')
+            return
+        with open(options['saida'], 'w', encoding='utf-8', newline='') as arquivo:
+            arquivo.writelines(pedacos)
+        self.stderr.write(self.style.SUCCESS(f"Pedidos exportados para {options['saida']}"))
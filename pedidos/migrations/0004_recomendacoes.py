@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 00:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_alter_pedido_metodo_pagamento'),
+        ('produtos', '0005_rendicao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaProcessamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarefa', models.CharField(max_length=50, unique=True)),
+                ('ultimo_pedido', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CompradoJunto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('outro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.produto')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.produto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('produto', 'outro'), name='comprado_junto_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Recomendacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField()),
+                ('total', models.PositiveIntegerField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recomendacoes', to='produtos.produto')),
+                ('recomendado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.produto')),
+            ],
+            options={
+                'ordering': ['posicao'],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'posicao'), name='recomendacao_posicao_unica')],
+            },
+        ),
+    ]
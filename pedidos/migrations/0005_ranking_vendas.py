@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-17 00:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_recomendacoes'),
+        ('produtos', '0005_rendicao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingVendas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('janela', models.CharField(choices=[('24h', 'Últimas 24 horas'), ('7d', 'Últimos 7 dias'), ('30d', 'Últimos 30 dias')], max_length=3)),
+                ('pontuacao', models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='data_pagamento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='vendas_contabilizadas',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('status__in', ('pago', 'enviado', 'entregue')), ('vendas_contabilizadas', False)), fields=['id'], name='pedido_vendas_pendentes_idx'),
+        ),
+        migrations.AddField(
+            model_name='rankingvendas',
+            name='categoria',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.categoria'),
+        ),
+        migrations.AddField(
+            model_name='rankingvendas',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='produtos.produto'),
+        ),
+        migrations.AddIndex(
+            model_name='rankingvendas',
+            index=models.Index(fields=['janela', '-pontuacao'], name='ranking_janela_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rankingvendas',
+            index=models.Index(fields=['janela', 'categoria', '-pontuacao'], name='ranking_categoria_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rankingvendas',
+            constraint=models.UniqueConstraint(fields=('produto', 'janela'), name='ranking_vendas_unico'),
+        ),
+    ]
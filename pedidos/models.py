@@ -1,7 +1,7 @@
 # pedidos/models.py
 from django.db import models
 from django.contrib.auth.models import User
-from produtos.models import Produto
+from produtos.models import Categoria, Produto
 
 class Pedido(models.Model):
     STATUS_CHOICES = (
@@ -25,6 +25,9 @@ class Pedido(models.Model):
     cidade = models.CharField(max_length=100) #
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='pendente') #
     data_criacao = models.DateTimeField(auto_now_add=True) #
+    data_pagamento = models.DateTimeField(null=True, blank=True)
+    # Já somado ao ranking de mais vendidos (pedidos.ranking)
+    vendas_contabilizadas = models.BooleanField(default=False)
     
     metodo_pagamento = models.CharField(
         max_length=50,
@@ -32,6 +35,18 @@ class Pedido(models.Model):
         default='pix' # Pix como padrão
     )
     
+    # Status em que o pedido conta como venda
+    STATUS_PAGOS = ('pago', 'enviado', 'entregue')
+    
+    class Meta:
+        indexes = [
+            # Fila de pedidos pagos ainda fora do ranking
+            models.Index(
+                fields=['id'], name='pedido_vendas_pendentes_idx',
+                condition=models.Q(vendas_contabilizadas=False, status__in=('pago', 'enviado', 'entregue')),
+            ),
+        ]
+    
     def __str__(self):
         return f'Pedido {self.id}'
     
@@ -48,4 +63,72 @@ class ItemPedido(models.Model):
         return str(self.id)
     
     def get_cost(self):
-        return self.preco * self.quantidade
\ No newline at end of file
+        return self.preco * self.quantidade
+
+class CompradoJunto(models.Model):
+    """Célula da matriz esparsa de coocorrência: pedidos com os dois produtos"""
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    outro = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    total = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'outro'], name='comprado_junto_unico'),
+        ]
+    
+    def __str__(self):
+        return f'{self.produto_id} + {self.outro_id}: {self.total}'
+
+
+class Recomendacao(models.Model):
+    """Os K produtos mais comprados junto com cada produto, já ordenados"""
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='recomendacoes')
+    recomendado = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    posicao = models.PositiveSmallIntegerField()
+    total = models.PositiveIntegerField()
+    
+    class Meta:
+        ordering = ['posicao']
+        constraints = [
+            # Também serve de índice para a leitura por produto
+            models.UniqueConstraint(fields=['produto', 'posicao'], name='recomendacao_posicao_unica'),
+        ]
+    
+    def __str__(self):
+        return f'{self.produto_id} -> {self.recomendado_id} ({self.posicao})'
+
+
+class MarcaProcessamento(models.Model):
+    """Último pedido já processado por uma tarefa incremental"""
+    tarefa = models.CharField(max_length=50, unique=True)
+    ultimo_pedido = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f'{self.tarefa}: {self.ultimo_pedido}'
+
+
+class RankingVendas(models.Model):
+    """Vendas com decaimento exponencial por produto e janela de tempo"""
+    JANELA_CHOICES = (
+        ('24h', 'Últimas 24 horas'),
+        ('7d', 'Últimos 7 dias'),
+        ('30d', 'Últimos 30 dias'),
+    )
+    
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='+')
+    janela = models.CharField(max_length=3, choices=JANELA_CHOICES)
+    # log da soma das vendas com peso exp((t - época) / janela); ver pedidos.ranking
+    pontuacao = models.FloatField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'janela'], name='ranking_vendas_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['janela', '-pontuacao'], name='ranking_janela_idx'),
+            models.Index(fields=['janela', 'categoria', '-pontuacao'], name='ranking_categoria_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.produto_id} {self.janela}: {self.pontuacao:.3f}'
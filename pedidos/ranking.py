@@ -0,0 +1,180 @@
+# pedidos/ranking.py
+#
+# Ranking de mais vendidos com decaimento exponencial.
+#
+# Cada venda de q unidades no instante t vale q * exp(-(agora - t) / janela).
+# Como o fator de decaimento é o mesmo para todos os produtos, a ordem do
+# ranking não muda com o passar do tempo: basta guardar, por produto,
+#
+#     pontuacao = log(soma de q * exp((t - EPOCA) / janela))
+#
+# que só muda quando há venda nova. A ordenação vira uma leitura dos K
+# primeiros do índice (janela, -pontuacao), sem GROUP BY em ItemPedido.
+import math
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from categorias.cache import ids_da_subarvore
+from produtos.condicional import marcar_alteracao_catalogo
+
+from .models import ItemPedido, Pedido, RankingVendas
+
+EPOCA = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# Constante de tempo de cada janela, em segundos
+JANELAS = {
+    '24h': 24 * 3600,
+    '7d': 7 * 24 * 3600,
+    '30d': 30 * 24 * 3600,
+}
+
+# Vendas decaídas abaixo disso não aparecem no ranking da janela
+VENDAS_MINIMAS = 0.1
+
+
+def _segundos(instante):
+    return (instante - EPOCA).total_seconds()
+
+
+def pontuacoes(produto_ids, quantidades, instantes):
+    """
+    Soma as vendas por produto em cada janela, no domínio logarítmico.
+
+    Recebe arrays paralelos (produto, quantidade, segundos desde a época) e
+    retorna (produtos únicos, {janela: array de pontuações}).
+    """
+    ordem = np.argsort(produto_ids, kind='stable')
+    produto_ids = produto_ids[ordem]
+    logs = np.log(quantidades[ordem].astype(np.float64))
+    instantes = instantes[ordem]
+    produtos, inicios = np.unique(produto_ids, return_index=True)
+    return produtos, {
+        janela: np.logaddexp.reduceat(logs + instantes / segundos, inicios)
+        for janela, segundos in JANELAS.items()
+    }
+
+
+def _linhas_vendas(pedidos):
+    """Arrays (produto, categoria, quantidade, segundos) dos itens dos pedidos"""
+    linhas = list(
+        ItemPedido.objects.filter(pedido__in=pedidos)
+        .annotate(pago_em=Coalesce('pedido__data_pagamento', 'pedido__data_criacao'))
+        .values_list('produto_id', 'produto__categoria_id', 'quantidade', 'pago_em')
+    )
+    if not linhas:
+        return None
+    produto_ids, categoria_ids, quantidades, instantes = zip(*linhas)
+    return (
+        np.array(produto_ids, dtype=np.int64),
+        dict(zip(produto_ids, categoria_ids)),
+        np.array(quantidades, dtype=np.int64),
+        np.array([_segundos(instante) for instante in instantes]),
+    )
+
+
+def somar_vendas(pedidos):
+    """Incorpora ao ranking os itens dos pedidos informados"""
+    vendas = _linhas_vendas(pedidos)
+    if vendas is None:
+        return 0
+    produto_ids, categorias, quantidades, instantes = vendas
+    produtos, novas = pontuacoes(produto_ids, quantidades, instantes)
+
+    atuais = {
+        (produto_id, janela): pontuacao
+        for produto_id, janela, pontuacao in RankingVendas.objects.filter(
+            produto_id__in=produtos.tolist()
+        ).values_list('produto_id', 'janela', 'pontuacao')
+    }
+    linhas = []
+    for janela, valores in novas.items():
+        for produto_id, valor in zip(produtos.tolist(), valores.tolist()):
+            anterior = atuais.get((produto_id, janela))
+            if anterior is not None:
+                valor = float(np.logaddexp(anterior, valor))
+            linhas.append(RankingVendas(
+                produto_id=produto_id, categoria_id=categorias[produto_id],
+                janela=janela, pontuacao=valor,
+            ))
+    RankingVendas.objects.bulk_create(
+        linhas, batch_size=1000, update_conflicts=True,
+        unique_fields=['produto', 'janela'], update_fields=['pontuacao', 'categoria'],
+    )
+    return len(produtos)
+
+
+def pedidos_pendentes():
+    """Pedidos pagos que ainda não entraram no ranking"""
+    return Pedido.objects.filter(status__in=Pedido.STATUS_PAGOS, vendas_contabilizadas=False)
+
+
+def atualizar_ranking(completo=False):
+    """
+    Processa a fila de pedidos pagos em lotes de RANKING_LOTE pedidos.
+
+    Cada lote soma as vendas e marca os pedidos na mesma transação.
+    Com completo=True, zera o ranking e reprocessa todos os pedidos pagos.
+    Retorna o número de pedidos processados.
+    """
+    if completo:
+        with transaction.atomic():
+            RankingVendas.objects.all().delete()
+            Pedido.objects.filter(vendas_contabilizadas=True).update(vendas_contabilizadas=False)
+
+    lote = getattr(settings, 'RANKING_LOTE', 1000)
+    processados = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                pedidos_pendentes().order_by('id')
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            somar_vendas(ids)
+            Pedido.objects.filter(id__in=ids).update(vendas_contabilizadas=True)
+        processados += len(ids)
+
+    if processados:
+        # A listagem exibe os mais vendidos e usa a marca no ETag
+        marcar_alteracao_catalogo()
+    return processados
+
+
+def mais_vendidos(janela='7d', categoria=None, limite=None):
+    """
+    Os produtos disponíveis mais vendidos na janela, lidos do índice.
+    Com categoria, entram também as vendas das subcategorias.
+
+    Cada produto vem com o atributo vendas_recentes: as unidades vendidas
+    com o decaimento aplicado até agora.
+    """
+    limite = limite or getattr(settings, 'RANKING_TAMANHO', 10)
+    segundos = JANELAS[janela]
+    agora = _segundos(timezone.now()) / segundos
+    ranking = RankingVendas.objects.filter(
+        janela=janela,
+        pontuacao__gte=agora + math.log(VENDAS_MINIMAS),
+        produto__disponivel=True,
+    )
+    if categoria is not None:
+        ranking = ranking.filter(categoria_id__in=ids_da_subarvore(categoria))
+
+    produtos = []
+    for linha in ranking.select_related('produto').order_by('-pontuacao')[:limite]:
+        linha.produto.vendas_recentes = math.exp(linha.pontuacao - agora)
+        produtos.append(linha.produto)
+    return produtos
+
+
+def atualizar_categoria(produto):
+    """Acompanha a troca de categoria do produto nas linhas do ranking"""
+    RankingVendas.objects.filter(produto=produto).exclude(
+        categoria_id=produto.categoria_id
+    ).update(categoria_id=produto.categoria_id)
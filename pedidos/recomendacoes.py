@@ -0,0 +1,162 @@
+# pedidos/recomendacoes.py
+from datetime import timedelta
+from itertools import groupby, islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from produtos.condicional import marcar_alteracao_catalogo
+
+from .models import CompradoJunto, ItemPedido, MarcaProcessamento, Pedido, Recomendacao
+
+TAREFA = 'comprado_junto'
+
+
+def contar_pares(pedidos):
+    """
+    Conta os pares de produtos de um bloco de pedidos.
+
+    pedidos é uma lista de listas de ids de produto. Cada par (a, b) é
+    codificado em um inteiro de 64 bits e contado com np.unique, sem montar
+    a matriz densa. Retorna os arrays (produto, outro, total), nos dois sentidos.
+    """
+    codigos = []
+    for produtos in pedidos:
+        produtos = np.unique(np.asarray(produtos, dtype=np.int64))
+        if len(produtos) < 2:
+            continue
+        a, b = np.triu_indices(len(produtos), k=1)
+        codigos.append((produtos[a] << 32) | produtos[b])
+    if not codigos:
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio, vazio
+
+    pares, totais = np.unique(np.concatenate(codigos), return_counts=True)
+    a, b = pares >> 32, pares & 0xFFFFFFFF
+    return np.concatenate([a, b]), np.concatenate([b, a]), np.concatenate([totais, totais])
+
+
+def somar_pares(produto, outro, total):
+    """Soma as contagens do bloco às células já gravadas da matriz"""
+    if not len(total):
+        return
+    novos = {(int(p), int(o)): int(t) for p, o, t in zip(produto, outro, total)}
+    existentes = CompradoJunto.objects.filter(
+        produto_id__in=set(int(p) for p in produto)
+    ).values_list('produto_id', 'outro_id', 'total')
+    for p, o, t in existentes.iterator(chunk_size=5000):
+        if (p, o) in novos:
+            novos[(p, o)] += t
+
+    CompradoJunto.objects.bulk_create(
+        [CompradoJunto(produto_id=p, outro_id=o, total=t) for (p, o), t in novos.items()],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['produto', 'outro'],
+        update_fields=['total'],
+    )
+
+
+def atualizar_top_k(produto_ids, k=None):
+    """Regrava a tabela de recomendações dos produtos informados"""
+    k = k or getattr(settings, 'RECOMENDACOES_POR_PRODUTO', 8)
+    produto_ids = sorted(produto_ids)
+    for inicio in range(0, len(produto_ids), 500):
+        grupo = produto_ids[inicio:inicio + 500]
+        linhas = np.array(
+            list(CompradoJunto.objects.filter(produto_id__in=grupo, total__gt=0)
+                 .values_list('produto_id', 'outro_id', 'total')),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+
+        recomendacoes = []
+        if len(linhas):
+            # Ordena por produto, total decrescente e id do outro como desempate
+            linhas = linhas[np.lexsort((linhas[:, 1], -linhas[:, 2], linhas[:, 0]))]
+            produtos, inicios = np.unique(linhas[:, 0], return_index=True)
+            fins = np.append(inicios[1:], len(linhas))
+            for produto_id, de, ate in zip(produtos, inicios, fins):
+                for posicao, (_, outro, total) in enumerate(linhas[de:min(ate, de + k)], start=1):
+                    recomendacoes.append(Recomendacao(
+                        produto_id=int(produto_id), recomendado_id=int(outro),
+                        posicao=posicao, total=int(total),
+                    ))
+
+        with transaction.atomic():
+            Recomendacao.objects.filter(produto_id__in=grupo).delete()
+            Recomendacao.objects.bulk_create(recomendacoes, batch_size=1000)
+
+
+def _itens_por_pedido(de, ate):
+    """(pedido, produtos) de cada pedido no intervalo de ids, em ordem de pedido"""
+    itens = (
+        ItemPedido.objects.filter(pedido_id__gt=de, pedido_id__lte=ate)
+        .exclude(pedido__status='cancelado')
+        .order_by('pedido_id')
+        .values_list('pedido_id', 'produto_id')
+        .iterator(chunk_size=5000)
+    )
+    for pedido_id, grupo in groupby(itens, key=lambda item: item[0]):
+        yield pedido_id, [produto_id for _, produto_id in grupo]
+
+
+def atualizar_recomendacoes(completo=False):
+    """
+    Incorpora à matriz os pedidos feitos desde a última execução.
+
+    Só os produtos presentes nos pedidos novos têm o top-K recalculado.
+    Pedidos mais novos que RECOMENDACOES_ATRASO segundos ficam para a
+    próxima execução, para não pegar um pedido com os itens ainda sendo
+    gravados. Retorna (pedidos processados, produtos atualizados).
+    """
+    marca, _ = MarcaProcessamento.objects.get_or_create(tarefa=TAREFA)
+    if completo:
+        CompradoJunto.objects.all().delete()
+        Recomendacao.objects.all().delete()
+        marca.ultimo_pedido = 0
+
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'RECOMENDACOES_ATRASO', 60))
+    ate = (
+        Pedido.objects.filter(id__gt=marca.ultimo_pedido, data_criacao__lte=limite)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    if ate is None:
+        return 0, 0
+
+    bloco = getattr(settings, 'RECOMENDACOES_BLOCO', 1000)
+    pedidos = _itens_por_pedido(marca.ultimo_pedido, ate)
+    afetados = set()
+    processados = 0
+    while True:
+        lote = list(islice(pedidos, bloco))
+        if not lote:
+            break
+        processados += len(lote)
+        produto, outro, total = contar_pares([produtos for _, produtos in lote])
+        # A marca avança junto com as somas: uma execução interrompida não conta duas vezes
+        with transaction.atomic():
+            somar_pares(produto, outro, total)
+            marca.ultimo_pedido = lote[-1][0]
+            marca.save(update_fields=['ultimo_pedido'])
+        afetados.update(int(p) for p in np.unique(produto))
+
+    atualizar_top_k(afetados)
+    marca.ultimo_pedido = ate
+    marca.save(update_fields=['ultimo_pedido'])
+    if afetados:
+        # O detalhe do produto exibe as recomendações e usa a marca no ETag
+        marcar_alteracao_catalogo()
+    return processados, len(afetados)
+
+
+def comprados_junto(produto, limite=None):
+    """Recomendações do produto: uma consulta no índice (produto, posicao)"""
+    limite = limite or getattr(settings, 'RECOMENDACOES_POR_PRODUTO', 8)
+    return [
+        recomendacao.recomendado
+        for recomendacao in Recomendacao.objects.filter(
+            produto=produto, recomendado__disponivel=True
+        ).select_related('recomendado')[:limite]
+    ]
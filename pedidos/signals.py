@@ -0,0 +1,26 @@
+# pedidos/signals.py
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from produtos.models import Produto
+
+from .models import Pedido
+from .ranking import atualizar_categoria
+
+
+@receiver(pre_save, sender=Pedido)
+def registrar_pagamento(sender, instance, raw=False, **kwargs):
+    """Guarda o momento em que o pedido passou a contar como venda"""
+    if raw:
+        return
+    if instance.status in Pedido.STATUS_PAGOS and instance.data_pagamento is None:
+        instance.data_pagamento = timezone.now()
+
+
+@receiver(post_save, sender=Produto)
+def acompanhar_categoria_ranking(sender, instance, created=False, raw=False, **kwargs):
+    """Mantém o ranking por categoria certo quando o produto muda de categoria"""
+    if raw or created:
+        return
+    atualizar_categoria(instance)
@@ -1,5 +1,5 @@
 # pedidos/tests.py
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.messages import get_messages
@@ -725,4 +725,486 @@ class PedidoAdminCoverageTest(TestCase):
         self.admin.nome_usuario(self.pedido)
         self.admin.total_itens(self.pedido)
         self.admin.valor_total(self.pedido)
-        self.admin.status_display(self.pedido)
\ No newline at end of file
+        self.admin.status_display(self.pedido)
+
+class ExportacaoPedidosTest(TestCase):
+    """Testes para a exportação de pedidos com itens"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='contador', password='testpass123')
+        categoria = Categoria.objects.create(nome='Papelaria', slug='papelaria')
+        self.caneta = Produto.objects.create(
+            nome='Caneta', slug='caneta', descricao='Azul',
+            preco=Decimal('2.50'), estoque=10, categoria=categoria
+        )
+        self.pedido = Pedido.objects.create(
+            usuario=self.user, nome='Ana', email='ana@example.com',
+            endereco='Rua A, 1', cep='00000-000', cidade='Recife', status='pago'
+        )
+        ItemPedido.objects.create(pedido=self.pedido, produto=self.caneta, preco=Decimal('2.50'), quantidade=4)
+        self.vazio = Pedido.objects.create(
+            usuario=self.user, nome='Bia', email='bia@example.com',
+            endereco='Rua B, 2', cep='11111-111', cidade='Natal'
+        )
+    
+    def test_linhas_em_uma_consulta(self):
+        """Testa se pedidos e itens saem de uma única consulta"""
+        from .exportacao import linhas_pedidos
+        with self.assertNumQueries(1):
+            linhas = list(linhas_pedidos())
+        self.assertEqual(len(linhas), 2)
+        self.assertEqual(linhas[0][-1], Decimal('10.00'))
+        # Pedido sem itens aparece com as colunas do item vazias
+        self.assertIsNone(linhas[1][-1])
+    
+    def test_acao_admin_csv(self):
+        """Testa a ação do admin que exporta os pedidos em streaming"""
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass123')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:pedidos_pedido_changelist'), {
+            'action': 'exportar_csv',
+            '_selected_action': [self.pedido.id],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        conteudo = b''.join(response.streaming_content).decode()
+        linhas = conteudo.strip().splitlines()
+        self.assertTrue(linhas[0].startswith('pedido,data,status'))
+        self.assertEqual(len(linhas), 2)
+        self.assertIn('Caneta', linhas[1])
+        self.assertTrue(linhas[1].endswith(',10.00'))
+    
+    def test_comando_jsonl(self):
+        """Testa o comando export_pedidos com filtro de status"""
+        from io import StringIO
+        from django.core.management import call_command
+        saida = StringIO()
+        call_command('export_pedidos', formato='jsonl', status='pago', stdout=saida)
+        linhas = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+        self.assertEqual(len(linhas), 1)
+        self.assertEqual(linhas[0]['pedido'], self.pedido.id)
+        self.assertEqual(linhas[0]['quantidade'], 4)
+        self.assertEqual(linhas[0]['subtotal'], '10.00')
+
+
+class RecomendacoesTest(TestCase):
+    """Testes para o índice de produtos comprados juntos"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente', password='testpass123')
+        categoria = Categoria.objects.create(nome='Café', slug='cafe')
+        self.cafe, self.filtro, self.caneca, self.acucar = [
+            Produto.objects.create(
+                nome=nome, slug=nome.lower(), descricao='Item',
+                preco=Decimal('10.00'), estoque=5, categoria=categoria
+            )
+            for nome in ('Cafe', 'Filtro', 'Caneca', 'Acucar')
+        ]
+    
+    def pedido(self, *produtos, status='pago'):
+        pedido = Pedido.objects.create(
+            usuario=self.user, nome='Cliente', email='c@example.com',
+            endereco='Rua', cep='00000-000', cidade='Cidade', status=status
+        )
+        for produto in produtos:
+            ItemPedido.objects.create(pedido=pedido, produto=produto, preco=produto.preco)
+        return pedido
+    
+    def atualizar(self, **opcoes):
+        from .recomendacoes import atualizar_recomendacoes
+        with self.settings(RECOMENDACOES_ATRASO=0):
+            return atualizar_recomendacoes(**opcoes)
+    
+    def test_contar_pares(self):
+        """Testa a contagem vetorizada de pares nos dois sentidos"""
+        from .recomendacoes import contar_pares
+        produto, outro, total = contar_pares([[1, 2, 3], [2, 1], [4]])
+        pares = {(int(p), int(o)): int(t) for p, o, t in zip(produto, outro, total)}
+        self.assertEqual(pares[(1, 2)], 2)
+        self.assertEqual(pares[(2, 1)], 2)
+        self.assertEqual(pares[(3, 1)], 1)
+        self.assertNotIn((4, 4), pares)
+    
+    def test_top_k_ordenado(self):
+        """Testa se as recomendações seguem a frequência de compra conjunta"""
+        from .recomendacoes import comprados_junto
+        self.pedido(self.cafe, self.filtro, self.caneca)
+        self.pedido(self.cafe, self.filtro)
+        self.pedido(self.cafe, self.acucar, status='cancelado')
+        self.assertEqual(self.atualizar(), (2, 3))
+        self.assertEqual(comprados_junto(self.cafe), [self.filtro, self.caneca])
+        with self.settings(RECOMENDACOES_POR_PRODUTO=1):
+            self.assertEqual(comprados_junto(self.cafe), [self.filtro])
+    
+    def test_atualizacao_incremental(self):
+        """Testa se só os pedidos novos são somados à matriz"""
+        from .models import CompradoJunto
+        self.pedido(self.cafe, self.caneca)
+        self.atualizar()
+        self.pedido(self.cafe, self.caneca)
+        self.pedido(self.acucar, self.filtro)
+        self.assertEqual(self.atualizar(), (2, 4))
+        self.assertEqual(self.atualizar(), (0, 0))
+        self.assertEqual(CompradoJunto.objects.get(produto=self.cafe, outro=self.caneca).total, 2)
+        
+        # A reconstrução completa chega ao mesmo resultado
+        self.atualizar(completo=True)
+        self.assertEqual(CompradoJunto.objects.get(produto=self.caneca, outro=self.cafe).total, 2)
+    
+    def test_pedido_recente_aguarda(self):
+        """Testa se pedidos mais novos que o atraso ficam para a próxima execução"""
+        from .recomendacoes import atualizar_recomendacoes
+        self.pedido(self.cafe, self.caneca)
+        with self.settings(RECOMENDACOES_ATRASO=3600):
+            self.assertEqual(atualizar_recomendacoes(), (0, 0))
+    
+    def test_detalhe_exibe_recomendacoes(self):
+        """Testa a seção de recomendações no detalhe do produto"""
+        self.pedido(self.cafe, self.filtro)
+        self.atualizar()
+        response = self.client.get(self.cafe.get_absolute_url())
+        self.assertContains(response, 'Comprados junto')
+        self.assertEqual(response.context['comprados_junto'], [self.filtro])
+        
+        # Produtos indisponíveis não são sugeridos
+        self.filtro.disponivel = False
+        self.filtro.save()
+        response = self.client.get(self.cafe.get_absolute_url())
+        self.assertNotContains(response, 'Comprados junto')
+
+
+class RankingVendasTest(TestCase):
+    """Testes para o ranking de mais vendidos"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente', password='testpass123')
+        self.bebidas = Categoria.objects.create(nome='Bebidas', slug='bebidas')
+        self.lanches = Categoria.objects.create(nome='Lanches', slug='lanches')
+        self.suco = self.produto('Suco', self.bebidas)
+        self.agua = self.produto('Agua', self.bebidas)
+        self.pao = self.produto('Pao', self.lanches)
+    
+    def produto(self, nome, categoria):
+        return Produto.objects.create(
+            nome=nome, slug=nome.lower(), descricao='Item',
+            preco=Decimal('5.00'), estoque=10, categoria=categoria
+        )
+    
+    def pedido(self, itens, status='pago'):
+        pedido = Pedido.objects.create(
+            usuario=self.user, nome='Cliente', email='c@example.com',
+            endereco='Rua', cep='00000-000', cidade='Cidade', status=status
+        )
+        for produto, quantidade in itens:
+            ItemPedido.objects.create(pedido=pedido, produto=produto, preco=produto.preco, quantidade=quantidade)
+        return pedido
+    
+    def test_pagamento_registrado(self):
+        """Testa se a data de pagamento é gravada na mudança para pago"""
+        pedido = self.pedido([(self.suco, 1)], status='aguardando_pagamento')
+        self.assertIsNone(pedido.data_pagamento)
+        pedido.status = 'pago'
+        pedido.save()
+        self.assertIsNotNone(pedido.data_pagamento)
+    
+    def test_ranking_geral_e_por_categoria(self):
+        """Testa a ordem do ranking geral e por categoria"""
+        from .ranking import atualizar_ranking, mais_vendidos
+        self.pedido([(self.suco, 2), (self.pao, 5)])
+        self.pedido([(self.agua, 3)])
+        self.pedido([(self.suco, 2)])
+        self.pedido([(self.agua, 50)], status='aguardando_pagamento')
+        self.assertEqual(atualizar_ranking(), 3)
+        
+        self.assertEqual(mais_vendidos('24h'), [self.pao, self.suco, self.agua])
+        self.assertEqual(mais_vendidos('30d', categoria=self.bebidas), [self.suco, self.agua])
+        self.assertAlmostEqual(mais_vendidos('7d')[0].vendas_recentes, 5, places=2)
+    
+    def test_incremental_e_reconstrucao(self):
+        """Testa se cada pedido pago é contado uma única vez"""
+        from .ranking import atualizar_ranking, mais_vendidos
+        self.pedido([(self.agua, 4)])
+        atualizar_ranking()
+        self.pedido([(self.agua, 1)])
+        self.assertEqual(atualizar_ranking(), 1)
+        self.assertEqual(atualizar_ranking(), 0)
+        self.assertAlmostEqual(mais_vendidos('7d')[0].vendas_recentes, 5, places=2)
+        
+        self.assertEqual(atualizar_ranking(completo=True), 2)
+        self.assertAlmostEqual(mais_vendidos('7d')[0].vendas_recentes, 5, places=2)
+    
+    def test_decaimento(self):
+        """Testa se vendas antigas somem da janela curta mas ficam na longa"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .ranking import atualizar_ranking, mais_vendidos
+        pedido = self.pedido([(self.pao, 10)])
+        Pedido.objects.filter(id=pedido.id).update(data_pagamento=timezone.now() - timedelta(days=10))
+        self.pedido([(self.suco, 1)])
+        atualizar_ranking()
+        self.assertEqual(mais_vendidos('24h'), [self.suco])
+        self.assertEqual(mais_vendidos('30d'), [self.pao, self.suco])
+    
+    def test_leitura_em_uma_consulta(self):
+        """Testa se o ranking é lido com uma consulta, sem agregar itens"""
+        from .ranking import atualizar_ranking, mais_vendidos
+        self.pedido([(self.suco, 1), (self.agua, 2)])
+        atualizar_ranking()
+        # A subárvore da categoria sai da lista de categorias em cache
+        from categorias.cache import obter_categorias
+        obter_categorias()
+        with self.assertNumQueries(1):
+            mais_vendidos('7d', categoria=self.bebidas)
+    
+    def test_troca_de_categoria(self):
+        """Testa se o ranking por categoria acompanha a troca de categoria"""
+        from .ranking import atualizar_ranking, mais_vendidos
+        self.pedido([(self.suco, 1)])
+        atualizar_ranking()
+        self.suco.categoria = self.lanches
+        self.suco.save()
+        self.assertEqual(mais_vendidos('7d', categoria=self.lanches), [self.suco])
+        self.assertEqual(mais_vendidos('7d', categoria=self.bebidas), [])
+    
+    def test_listagem_exibe_mais_vendidos(self):
+        """Testa a seção de mais vendidos na listagem"""
+        from .ranking import atualizar_ranking
+        self.pedido([(self.pao, 1)])
+        atualizar_ranking()
+        response = self.client.get(reverse('produtos:lista'))
+        self.assertContains(response, 'Mais vendidos')
+        self.assertEqual(response.context['mais_vendidos'], [self.pao])
+
+
+class BaixaEstoqueTest(TestCase):
+    """Testes para a baixa de estoque atômica no checkout"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='comprador', password='testpass123')
+        categoria = Categoria.objects.create(nome='Games', slug='games')
+        self.console = Produto.objects.create(
+            nome='Console', slug='console', descricao='Novo',
+            preco=Decimal('2000.00'), estoque=2, categoria=categoria
+        )
+        self.controle = Produto.objects.create(
+            nome='Controle', slug='controle', descricao='Sem fio',
+            preco=Decimal('300.00'), estoque=5, categoria=categoria
+        )
+        self.dados_pedido = {
+            'nome': 'Comprador', 'email': 'c@example.com',
+            'endereco': 'Rua 1', 'cep': '00000-000', 'cidade': 'Cidade',
+        }
+    
+    def test_venda_avanca_marca_do_catalogo(self):
+        """Testa se uma venda que não esgota o produto também invalida API, ETags e alertas"""
+        from produtos.condicional import ultima_alteracao_catalogo
+        from .estoque import baixar_estoque
+        antes = ultima_alteracao_catalogo()
+        with self.captureOnCommitCallbacks(execute=True):
+            baixar_estoque({self.controle.id: 1})
+        self.assertGreater(ultima_alteracao_catalogo(), antes)
+    
+    def test_baixa_condicional(self):
+        """Testa se a baixa desconta tudo ou nada"""
+        from .estoque import EstoqueInsuficiente, baixar_estoque
+        baixar_estoque({self.console.id: 2, self.controle.id: 1})
+        self.console.refresh_from_db()
+        self.controle.refresh_from_db()
+        self.assertEqual((self.console.estoque, self.controle.estoque), (0, 4))
+        
+        with self.assertRaises(EstoqueInsuficiente) as erro:
+            baixar_estoque({self.controle.id: 1, self.console.id: 1})
+        self.assertEqual([falta[0] for falta in erro.exception.faltas], [self.console])
+        # O controle não foi descontado: a transação inteira voltou
+        self.controle.refresh_from_db()
+        self.assertEqual(self.controle.estoque, 4)
+    
+    def test_produtos_em_ordem_de_id(self):
+        """Testa se as linhas são travadas sempre na mesma ordem"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .estoque import baixar_estoque
+        with CaptureQueriesContext(connection) as consultas:
+            baixar_estoque({self.controle.id: 1, self.console.id: 1})
+        updates = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertIn(f'"id" = {self.console.id}', updates[0])
+        self.assertIn(f'"id" = {self.controle.id}', updates[1])
+    
+    def test_esgotar_atualiza_facetas(self):
+        """Testa se o produto esgotado sai da contagem de itens em estoque"""
+        from produtos.facetas import contar_facetas, ler_filtros
+        from categorias.cache import obter_categorias
+        from .estoque import baixar_estoque
+        baixar_estoque({self.console.id: 2})
+        facetas = contar_facetas(obter_categorias(), ler_filtros({}))
+        self.assertEqual(facetas['em_estoque'], 1)
+    
+    def test_checkout_sem_estoque_volta_ao_carrinho(self):
+        """Testa se o checkout sem estoque volta ao carrinho com a mensagem do item"""
+        self.client.force_login(self.user)
+        self.client.post(reverse('carrinho:adicionar', args=[self.console.id]), {'quantidade': 3})
+        response = self.client.post(reverse('pedidos:criar'), self.dados_pedido)
+        self.assertRedirects(response, reverse('carrinho:detalhe'), fetch_redirect_response=False)
+        mensagens = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertIn('Console: restam apenas 2 unidade(s), você pediu 3.', mensagens)
+        self.assertFalse(Pedido.objects.exists())
+        self.console.refresh_from_db()
+        self.assertEqual(self.console.estoque, 2)
+    
+    @patch('pedidos.views.PIX_AVAILABLE', False)
+    def test_checkout_desconta_estoque(self):
+        """Testa se o pedido criado desconta o estoque dos itens"""
+        self.client.force_login(self.user)
+        self.client.post(reverse('carrinho:adicionar', args=[self.controle.id]), {'quantidade': 2})
+        self.client.post(reverse('pedidos:criar'), self.dados_pedido)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.controle.refresh_from_db()
+        self.assertEqual(self.controle.estoque, 3)
+    
+    @patch('pedidos.views.PIX_AVAILABLE', False)
+    def test_checkout_converte_reservas(self):
+        """Testa se o checkout usa as unidades reservadas pelo carrinho e apaga as reservas"""
+        from carrinho.models import Reserva
+        self.client.force_login(self.user)
+        self.client.post(reverse('carrinho:adicionar', args=[self.console.id]), {'quantidade': 2})
+        self.client.post(reverse('carrinho:adicionar', args=[self.controle.id]), {'quantidade': 1})
+        self.console.refresh_from_db()
+        self.assertEqual((self.console.reservado, self.console.disponivel_venda), (2, 0))
+        
+        self.client.post(reverse('pedidos:criar'), self.dados_pedido)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.console.refresh_from_db()
+        self.controle.refresh_from_db()
+        self.assertEqual((self.console.estoque, self.console.reservado), (0, 0))
+        self.assertEqual((self.controle.estoque, self.controle.reservado), (4, 0))
+        self.assertFalse(Reserva.objects.exists())
+    
+    def test_checkout_com_preco_alterado_volta_ao_carrinho(self):
+        """Testa se o checkout não fecha com preço desatualizado"""
+        self.client.force_login(self.user)
+        self.client.post(reverse('carrinho:adicionar', args=[self.controle.id]), {'quantidade': 1})
+        self.controle.preco = Decimal('350.00')
+        self.controle.save()
+        response = self.client.post(reverse('pedidos:criar'), self.dados_pedido)
+        self.assertRedirects(response, reverse('carrinho:detalhe'), fetch_redirect_response=False)
+        self.assertFalse(Pedido.objects.exists())
+        mensagens = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertIn('O preço de Controle mudou de R$ 300.00 para R$ 350.00.', mensagens)
+    
+    def test_reserva_alheia_bloqueia_baixa(self):
+        """Testa se unidades reservadas por outro carrinho não são vendidas"""
+        from carrinho.reservas import reservar
+        from .estoque import EstoqueInsuficiente, baixar_estoque
+        reservar('outro-carrinho', self.console.id, 2)
+        with self.assertRaises(EstoqueInsuficiente) as erro:
+            baixar_estoque({self.console.id: 1}, chave='meu-carrinho')
+        self.assertEqual(erro.exception.faltas[0][2], 0)
+
+
+@override_settings(ADMISSAO_CONCORRENCIA=1, ADMISSAO_FILA_MAX=2)
+class AdmissaoCheckoutTest(TestCase):
+    """Testes para a sala de espera do checkout"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        categoria = Categoria.objects.create(nome='Games', slug='games')
+        self.produto = Produto.objects.create(
+            nome='Console', slug='console', descricao='Novo',
+            preco=Decimal('2000.00'), estoque=5, categoria=categoria
+        )
+        self.clientes = []
+        for numero in range(4):
+            user = User.objects.create_user(username=f'cliente{numero}', password='testpass123')
+            cliente = Client()
+            cliente.force_login(user)
+            cliente.post(reverse('carrinho:adicionar', args=[self.produto.id]), {'quantidade': 1})
+            self.clientes.append(cliente)
+    
+    def test_vaga_livre_entra_direto(self):
+        """Testa se o checkout abre normalmente e devolve a vaga ao terminar"""
+        from .admissao import ocupar_vaga
+        response = self.clientes[0].get(reverse('pedidos:criar'))
+        self.assertTemplateUsed(response, 'pedidos/criar.html')
+        self.assertIsNotNone(ocupar_vaga())
+    
+    def test_fila_e_atendimento_em_ordem(self):
+        """Testa se quem chega sem vaga recebe senha e é atendido na ordem da fila"""
+        from .admissao import liberar_vaga, ocupar_vaga
+        vaga = ocupar_vaga()
+        primeiro = self.clientes[0].get(reverse('pedidos:criar'))
+        segundo = self.clientes[1].get(reverse('pedidos:criar'))
+        self.assertTemplateUsed(primeiro, 'pedidos/fila.html')
+        self.assertEqual((primeiro.context['posicao'], segundo.context['posicao']), (1, 2))
+        self.assertEqual(primeiro['Retry-After'], '5')
+        self.assertContains(primeiro, 'http-equiv="refresh"')
+        
+        liberar_vaga(vaga)
+        # O segundo da fila não passa na frente do primeiro
+        self.assertTemplateUsed(self.clientes[1].get(reverse('pedidos:criar')), 'pedidos/fila.html')
+        self.assertTemplateUsed(self.clientes[0].get(reverse('pedidos:criar')), 'pedidos/criar.html')
+        self.assertTemplateUsed(self.clientes[1].get(reverse('pedidos:criar')), 'pedidos/criar.html')
+    
+    def test_fila_cheia_recebe_503(self):
+        """Testa se, com a fila cheia, o visitante recebe 503 com Retry-After"""
+        from .admissao import ocupar_vaga
+        ocupar_vaga()
+        self.clientes[0].get(reverse('pedidos:criar'))
+        self.clientes[1].get(reverse('pedidos:criar'))
+        response = self.clientes[2].get(reverse('pedidos:criar'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertNotIn('admissao_senha', self.clientes[2].session)
+    
+    def test_post_sem_vaga_recebe_503(self):
+        """Testa se o envio do formulário sem vaga é recusado sem criar pedido"""
+        from .admissao import ocupar_vaga
+        ocupar_vaga()
+        response = self.clientes[0].post(reverse('pedidos:criar'), {
+            'nome': 'Cliente', 'email': 'c@example.com',
+            'endereco': 'Rua 1', 'cep': '00000-000', 'cidade': 'Cidade',
+        })
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Pedido.objects.exists())
+    
+    @override_settings(ADMISSAO_ESPERA_PASSE=0)
+    def test_passe_dispensa_a_fila_mas_nao_o_limite(self):
+        """Testa se o admitido passa à frente da fila, respeita as vagas e perde o passe com o pedido"""
+        from .admissao import SESSAO_PASSE, liberar_vaga, ocupar_vaga
+        dados = {
+            'nome': 'Cliente', 'email': 'c@example.com',
+            'endereco': 'Rua 1', 'cep': '00000-000', 'cidade': 'Cidade',
+        }
+        self.assertTemplateUsed(self.clientes[0].get(reverse('pedidos:criar')), 'pedidos/criar.html')
+        vaga = ocupar_vaga()
+        # Sem vaga, o passe não basta
+        response = self.clientes[0].post(reverse('pedidos:criar'), dados)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Pedido.objects.exists())
+        
+        # Com alguém na fila, o portador do passe entra assim que abre uma vaga
+        self.assertTemplateUsed(self.clientes[1].get(reverse('pedidos:criar')), 'pedidos/fila.html')
+        liberar_vaga(vaga)
+        response = self.clientes[0].post(reverse('pedidos:criar'), dados)
+        self.assertNotEqual(response.status_code, 503)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertNotIn(SESSAO_PASSE, self.clientes[0].session)
+        
+        # Passe vencido: volta a disputar vaga
+        sessao = self.clientes[2].session
+        sessao[SESSAO_PASSE] = 0
+        sessao.save()
+        ocupar_vaga()
+        self.assertEqual(self.clientes[2].post(reverse('pedidos:criar'), dados).status_code, 503)
+    
+    def test_senha_abandonada_expira(self):
+        """Testa se a fila anda quando a senha da frente deixa de ser renovada"""
+        from django.core.cache import cache
+        from .admissao import CHAVE_SENHA, ocupar_vaga
+        ocupar_vaga()
+        self.clientes[0].get(reverse('pedidos:criar'))
+        self.clientes[1].get(reverse('pedidos:criar'))
+        cache.delete(CHAVE_SENHA.format(self.clientes[0].session['admissao_senha']))
+        response = self.clientes[1].get(reverse('pedidos:criar'))
+        self.assertEqual(response.context['posicao'], 1)
@@ -5,11 +5,14 @@ from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from .admissao import controle_admissao, encerrar_passe
+from .estoque import EstoqueInsuficiente, baixar_estoque
 from .models import Pedido, ItemPedido
 from .forms import FormCriarPedido
-from carrinho.cart import Carrinho
+from carrinho.cart import Carrinho, descrever_alerta
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login as auth_login
 import logging
@@ -30,6 +33,7 @@ except ImportError as e:
     Payload = None
 
 @login_required
+@controle_admissao
 def criar_pedido(request):
     carrinho = Carrinho(request)
     
@@ -40,25 +44,40 @@ def criar_pedido(request):
     if request.method == 'POST':
         form = FormCriarPedido(request.POST)
         if form.is_valid():
+            # Preços e itens mudaram desde que o cliente viu o carrinho: ele confirma antes
+            mudancas = [alerta for alerta in carrinho.revalidar() if alerta['tipo'] in ('preco', 'removido')]
+            if mudancas:
+                for alerta in mudancas:
+                    messages.warning(request, descrever_alerta(alerta))
+                return redirect('carrinho:detalhe')
             try:
-                # Criar o pedido
-                pedido = form.save(commit=False)
-                pedido.usuario = request.user
-                pedido.metodo_pagamento = 'pix'
-                pedido.status = 'aguardando_pagamento'
-                pedido.save()
-
-                # Criar itens do pedido
-                for item_data in carrinho:
-                    ItemPedido.objects.create(
-                        pedido=pedido,
-                        produto=item_data['produto'],
-                        preco=item_data['preco'],
-                        quantidade=item_data['quantidade']
+                itens = list(carrinho)
+                with transaction.atomic():
+                    # Baixar o estoque primeiro: se faltar algum item, nada é gravado
+                    baixar_estoque(
+                        {item['produto'].id: item['quantidade'] for item in itens},
+                        chave=carrinho.chave,
                     )
+
+                    # Criar o pedido
+                    pedido = form.save(commit=False)
+                    pedido.usuario = request.user
+                    pedido.metodo_pagamento = 'pix'
+                    pedido.status = 'aguardando_pagamento'
+                    pedido.save()
+
+                    # Criar itens do pedido
+                    for item_data in itens:
+                        ItemPedido.objects.create(
+                            pedido=pedido,
+                            produto=item_data['produto'],
+                            preco=item_data['preco'],
+                            quantidade=item_data['quantidade']
+                        )
                 
                 # Limpar carrinho após criar pedido
                 carrinho.limpar()
+                encerrar_passe(request)
 
                 # Gerar PIX se disponível
                 if PIX_AVAILABLE:
@@ -78,6 +97,12 @@ def criar_pedido(request):
                     messages.error(request, "Sistema PIX indisponível. Entre em contato conosco.")
                     return redirect('pedidos:lista_meus_pedidos')
                     
+            except EstoqueInsuficiente as e:
+                for mensagem in e.mensagens():
+                    messages.error(request, mensagem)
+                if not e.faltas:
+                    messages.error(request, "Alguns itens do carrinho não estão mais disponíveis.")
+                return redirect('carrinho:detalhe')
             except Exception as e:
                 logger.error(f"Erro ao criar pedido: {e}")
                 messages.error(request, "Erro interno. Tente novamente ou entre em contato conosco.")
@@ -1,10 +1,42 @@
 from django.contrib import admin
+from .fatias import fatiar
+from .exportacao import COLUNAS_PRODUTOS, linhas_produtos, resposta_exportacao
 from .models import Produto, Categoria
 
+@admin.action(description='Exportar produtos selecionados (CSV)')
+def exportar_csv(modeladmin, request, queryset):
+    return resposta_exportacao('produtos', 'csv', COLUNAS_PRODUTOS, linhas_produtos(queryset))
+
+@admin.action(description='Exportar produtos selecionados (JSONL)')
+def exportar_jsonl(modeladmin, request, queryset):
+    return resposta_exportacao('produtos', 'jsonl', COLUNAS_PRODUTOS, linhas_produtos(queryset))
+
+@admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
     list_display = ('nome', 'preco', 'categoria')
     list_filter = ('categoria',)
     search_fields = ('nome',)
+    actions = [exportar_csv, exportar_jsonl]
+    # Mantido pelas reservas dos carrinhos (carrinho.reservas)
+    readonly_fields = ('reservado',)
 
-admin.site.register(Categoria)
+    def save_model(self, request, obj, form, change):
+        """Estoque de produto fatiado muda pelas fatias, não direto na cópia"""
+        fatias_antes = form.initial.get('fatias_estoque', 0) if change else 0
+        mudou = {'estoque', 'fatias_estoque'} & set(form.changed_data)
+        if not (obj.fatias_estoque or fatias_antes) or not mudou:
+            return super().save_model(request, obj, form, change)
+        estoque = obj.estoque if 'estoque' in form.changed_data or not change else None
+        fatias = obj.fatias_estoque
+        if change:
+            # Grava o resto do formulário sem tocar no estoque; fatiar() redistribui
+            obj.estoque, obj.fatias_estoque = form.initial['estoque'], fatias_antes
+        super().save_model(request, obj, form, change)
+        fatiado = fatiar(obj, fatias, estoque=estoque)
+        obj.estoque, obj.fatias_estoque = fatiado.estoque, fatiado.fatias_estoque
 
+@admin.register(Categoria)
+class CategoriaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'slug', 'pai', 'caminho')
+    search_fields = ('nome', 'slug')
+    prepopulated_fields = {'slug': ('nome',)}
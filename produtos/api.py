@@ -0,0 +1,194 @@
+# produtos/api.py
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET
+
+from categorias.cache import ids_da_subarvore, obter_categoria_por_slug
+from .condicional import ultima_alteracao_catalogo
+from .fatias import estoque_real_linhas
+from .models import Produto
+from .paginacao import paginar_keyset
+
+# Campo público -> coluna consultada com values()
+CAMPOS = {
+    'id': 'id',
+    'nome': 'nome',
+    'slug': 'slug',
+    'descricao': 'descricao',
+    'preco': 'preco',
+    'estoque': 'estoque',
+    'disponivel': 'disponivel',
+    'categoria': 'categoria_id',
+    'imagem': 'imagem',
+    'url': 'slug',
+    'data_criacao': 'data_criacao',
+    'data_atualizacao': 'data_atualizacao',
+}
+CAMPOS_PADRAO = ('id', 'nome', 'slug', 'preco', 'categoria', 'url', 'imagem')
+
+_codificador = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+class ErroApi(Exception):
+    """Parâmetro inválido na requisição da API"""
+
+
+def ler_campos(request):
+    """Lista de campos pedida em ?fields=, validada contra os campos públicos"""
+    pedido = request.GET.get('fields')
+    if not pedido:
+        return list(CAMPOS_PADRAO)
+    campos = [campo.strip() for campo in pedido.split(',') if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in CAMPOS]
+    if invalidos:
+        raise ErroApi(f"Campos desconhecidos: {', '.join(invalidos)}")
+    return campos
+
+
+def ler_ids(request):
+    """Ids pedidos em ?ids=, respeitando o limite por requisição"""
+    limite = getattr(settings, 'API_MAX_IDS', 100)
+    try:
+        ids = [int(valor) for valor in request.GET['ids'].split(',') if valor.strip()]
+    except ValueError:
+        raise ErroApi('ids deve ser uma lista de números separados por vírgula')
+    if len(ids) > limite:
+        raise ErroApi(f'No máximo {limite} ids por requisição')
+    return list(dict.fromkeys(ids))
+
+
+def colunas(campos):
+    """Colunas do values(): os campos pedidos mais a chave do cursor"""
+    extras = ['id', 'data_criacao']
+    if 'estoque' in campos:
+        # Produtos fatiados: o estoque exibido é a soma das fatias
+        extras.append('fatias_estoque')
+    return list(dict.fromkeys([CAMPOS[campo] for campo in campos] + extras))
+
+
+def serializador(campos):
+    """Transforma uma linha de values() no objeto JSON com os campos pedidos"""
+    prefixo_url = reverse('produtos:detalhe', args=[0, 'slug']).replace('/0/slug/', '/')
+    media_url = settings.MEDIA_URL
+
+    def serializar(linha):
+        item = {}
+        for campo in campos:
+            if campo == 'url':
+                item['url'] = f"{prefixo_url}{linha['id']}/{linha['slug']}/"
+            elif campo == 'imagem':
+                item['imagem'] = f"{media_url}{linha['imagem']}" if linha['imagem'] else None
+            else:
+                item[campo] = linha[CAMPOS[campo]]
+        return _codificador.encode(item)
+
+    return serializar
+
+
+def etag_api(request, *args, **kwargs):
+    """ETag das respostas da API: endereço completo e marca d'água do catálogo"""
+    marca = ultima_alteracao_catalogo().isoformat()
+    return hashlib.md5(f'{request.get_full_path()}|{marca}'.encode()).hexdigest()
+
+
+def _chave_cache(request):
+    """Chave do corpo da resposta no cache; muda junto com o catálogo"""
+    return f'api:produtos:{etag_api(request)}'
+
+
+def _resposta_em_cache(request, montar):
+    """
+    Devolve o corpo guardado em cache ou gera a resposta em streaming.
+
+    Os pedaços são enviados conforme serializados e, ao fim, o corpo
+    completo é guardado para as próximas requisições iguais.
+    """
+    chave = _chave_cache(request)
+    corpo = cache.get(chave)
+    if corpo is not None:
+        return HttpResponse(corpo, content_type='application/json')
+
+    try:
+        pedacos = montar()
+    except ErroApi as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+
+    def transmitir():
+        enviados = []
+        for pedaco in pedacos:
+            enviados.append(pedaco)
+            yield pedaco
+        cache.set(chave, ''.join(enviados).encode(), getattr(settings, 'API_CACHE_TIMEOUT', 300))
+
+    return StreamingHttpResponse(transmitir(), content_type='application/json')
+
+
+def _envelope(linhas, serializar, proximo=None, anterior=None):
+    """Gera o JSON da resposta pedaço a pedaço, uma linha por vez"""
+    yield '{"resultados":['
+    for indice, linha in enumerate(linhas):
+        yield (',' if indice else '') + serializar(linha)
+    yield '],"proximo":' + _codificador.encode(proximo)
+    yield ',"anterior":' + _codificador.encode(anterior) + '}'
+
+
+@require_GET
+@condition(etag_func=etag_api)
+def produtos_api(request):
+    """
+    Lista de produtos disponíveis em JSON.
+
+    Aceita ?ids=1,2,3 (lote em uma consulta), ?fields= (campos esparsos),
+    ?categoria=<slug> e os cursores apos/antes/tamanho da listagem.
+    """
+    def montar():
+        campos = ler_campos(request)
+        serializar = serializador(campos)
+        produtos = Produto.objects.filter(disponivel=True)
+
+        if 'ids' in request.GET:
+            ids = ler_ids(request)
+            linhas = {
+                linha['id']: linha
+                for linha in estoque_real_linhas(list(produtos.filter(id__in=ids).values(*colunas(campos))))
+            }
+            return _envelope((linhas[i] for i in ids if i in linhas), serializar)
+
+        slug = request.GET.get('categoria')
+        if slug:
+            categoria = obter_categoria_por_slug(slug)
+            if categoria is None:
+                raise ErroApi('Categoria não encontrada')
+            produtos = produtos.filter(categoria_id__in=ids_da_subarvore(categoria))
+
+        pagina = paginar_keyset(
+            produtos.values(*colunas(campos)),
+            apos=request.GET.get('apos'),
+            antes=request.GET.get('antes'),
+            tamanho=request.GET.get('tamanho')
+        )
+        return _envelope(
+            estoque_real_linhas(list(pagina.produtos)), serializar, pagina.proximo_cursor, pagina.cursor_anterior
+        )
+
+    return _resposta_em_cache(request, montar)
+
+
+@require_GET
+@condition(etag_func=etag_api)
+def produto_api(request, id):
+    """Um produto disponível em JSON, com os mesmos ?fields= da lista"""
+    try:
+        campos = ler_campos(request)
+    except ErroApi as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    linha = Produto.objects.filter(id=id, disponivel=True).values(*colunas(campos)).first()
+    if linha is None:
+        return JsonResponse({'erro': 'Produto não encontrado'}, status=404)
+    estoque_real_linhas([linha])
+    return HttpResponse(serializador(campos)(linha), content_type='application/json')
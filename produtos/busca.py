@@ -0,0 +1,132 @@
+# produtos/busca.py
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Produto
+
+TABELA_FTS = 'produtos_produto_fts'
+INDICE_GIN = 'produto_busca_gin_idx'
+
+# Documento pesquisável do PostgreSQL: o nome pesa mais que a descrição.
+# Precisa ser idêntico à expressão do índice GIN criado na migração.
+DOCUMENTO_POSTGRES = (
+    "(setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') || "
+    "setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B'))"
+)
+
+
+def extrair_termos(texto):
+    """Quebra o texto digitado em palavras, descartando a sintaxe de consulta"""
+    return re.findall(r'\w+', texto or '')[:10]
+
+
+class BuscaSQLite:
+    """Busca com a tabela virtual FTS5, mantida pelos sinais de Produto"""
+
+    def consulta(self, termos):
+        # Cada termo entre aspas; o último vira prefixo para buscar enquanto digita
+        partes = [f'"{termo}"' for termo in termos]
+        partes[-1] += '*'
+        return ' '.join(partes)
+
+    def buscar_ids(self, termos, limite):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT p.id FROM {TABELA_FTS} '
+                f'JOIN produtos_produto p ON p.id = {TABELA_FTS}.rowid '
+                f'WHERE {TABELA_FTS} MATCH %s AND p.disponivel '
+                f'ORDER BY bm25({TABELA_FTS}, 10.0, 1.0) LIMIT %s',
+                [self.consulta(termos), limite]
+            )
+            return [linha[0] for linha in cursor.fetchall()]
+
+    def indexar(self, produto):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABELA_FTS} WHERE rowid = %s', [produto.id])
+            cursor.execute(
+                f'INSERT INTO {TABELA_FTS} (rowid, nome, descricao) VALUES (%s, %s, %s)',
+                [produto.id, produto.nome, produto.descricao]
+            )
+
+    def remover(self, produto_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABELA_FTS} WHERE rowid = %s', [produto_id])
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABELA_FTS}')
+            cursor.execute(
+                f'INSERT INTO {TABELA_FTS} (rowid, nome, descricao) '
+                f'SELECT id, nome, descricao FROM produtos_produto'
+            )
+            cursor.execute(f"INSERT INTO {TABELA_FTS} ({TABELA_FTS}) VALUES ('optimize')")
+
+
+class BuscaPostgres:
+    """Busca com tsvector e índice GIN de expressão, atualizado pelo próprio banco"""
+
+    def consulta(self, termos):
+        return ' & '.join(f"'{termo}':*" for termo in termos)
+
+    def buscar_ids(self, termos, limite):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM produtos_produto, to_tsquery('portuguese', %s) consulta "
+                f"WHERE disponivel AND {DOCUMENTO_POSTGRES} @@ consulta "
+                f"ORDER BY ts_rank({DOCUMENTO_POSTGRES}, consulta) DESC LIMIT %s",
+                [self.consulta(termos), limite]
+            )
+            return [linha[0] for linha in cursor.fetchall()]
+
+    def indexar(self, produto):
+        pass
+
+    def remover(self, produto_id):
+        pass
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {INDICE_GIN}')
+
+
+class BuscaSimples:
+    """Alternativa para bancos sem busca textual suportada"""
+
+    def buscar_ids(self, termos, limite):
+        produtos = Produto.objects.filter(disponivel=True)
+        for termo in termos:
+            produtos = produtos.filter(nome__icontains=termo)
+        return list(produtos.values_list('id', flat=True)[:limite])
+
+    def indexar(self, produto):
+        pass
+
+    def remover(self, produto_id):
+        pass
+
+    def reconstruir(self):
+        pass
+
+
+BACKENDS = {
+    'sqlite': BuscaSQLite,
+    'postgresql': BuscaPostgres,
+}
+
+
+def backend_busca():
+    """Escolhe a implementação de busca de acordo com o banco em uso"""
+    return BACKENDS.get(connection.vendor, BuscaSimples)()
+
+
+def buscar_produtos(texto, limite=None):
+    """Retorna os produtos disponíveis que casam com o texto, em ordem de relevância"""
+    termos = extrair_termos(texto)
+    if not termos:
+        return []
+    limite = limite or getattr(settings, 'BUSCA_MAX_RESULTADOS', 48)
+    ids = backend_busca().buscar_ids(termos, limite)
+    produtos = Produto.objects.in_bulk(ids)
+    return [produtos[produto_id] for produto_id in ids if produto_id in produtos]
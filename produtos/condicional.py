@@ -0,0 +1,93 @@
+# produtos/condicional.py
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+
+from . import marcas
+from .models import Produto
+
+CHAVE_MARCA_CATALOGO = 'catalogo:ultima_alteracao'
+
+
+def marcar_alteracao_catalogo():
+    """Avança a marca d'água do catálogo (qualquer produto/categoria alterado)"""
+    return marcas.avancar(CHAVE_MARCA_CATALOGO)
+
+
+def ultima_alteracao_catalogo():
+    """
+    Momento da última alteração do catálogo.
+
+    A marca fica no banco para valer também para os comandos de
+    gerenciamento; cada processo reaproveita a leitura por MARCAS_TTL
+    segundos (produtos.marcas).
+    """
+    return marcas.atual(CHAVE_MARCA_CATALOGO)
+
+
+def _estado_visitante(request):
+    """
+    Parte da página que depende de quem pede: usuário e carrinho no cabeçalho.
+
+    Retorna None quando há mensagens pendentes, que precisam ser exibidas.
+    """
+    if len(get_messages(request)):
+        return None
+    from carrinho.cart import Carrinho
+    # O cabeçalho só exibe a contagem; carrinhos de usuários logados ficam no banco
+    return [request.user.pk, Carrinho.contar(request.session, request.user)]
+
+
+def _visitante_anonimo(request):
+    """Visitante sem login e sem carrinho: a página não depende da sessão"""
+    return not request.user.is_authenticated and not request.session.get(settings.CARRINHO_SESSION_ID)
+
+
+def _etag(*partes):
+    """Resumo estável das partes que definem o conteúdo da página"""
+    return hashlib.md5(json.dumps(partes, default=str).encode()).hexdigest()
+
+
+def _modificacao_produto(request, id, slug):
+    """data_atualizacao do produto, consultada uma única vez por requisição"""
+    if not hasattr(request, '_modificacao_produto'):
+        request._modificacao_produto = (
+            Produto.objects.filter(id=id, slug=slug, disponivel=True)
+            .values_list('data_atualizacao', flat=True)
+            .first()
+        )
+    return request._modificacao_produto
+
+
+def etag_detalhe(request, id, slug):
+    """ETag da página de detalhe do produto"""
+    modificacao = _modificacao_produto(request, id, slug)
+    visitante = _estado_visitante(request)
+    if modificacao is None or visitante is None:
+        return None
+    return _etag('detalhe', id, modificacao, ultima_alteracao_catalogo(), visitante)
+
+
+def modificacao_detalhe(request, id, slug):
+    """Last-Modified do detalhe, só para visitantes anônimos sem carrinho"""
+    modificacao = _modificacao_produto(request, id, slug)
+    if modificacao is None or not _visitante_anonimo(request) or len(get_messages(request)):
+        return None
+    return max(modificacao, ultima_alteracao_catalogo())
+
+
+def etag_lista(request, categoria_slug=None):
+    """ETag da listagem: endereço completo, catálogo e visitante"""
+    visitante = _estado_visitante(request)
+    if visitante is None:
+        return None
+    return _etag('lista', request.get_full_path(), ultima_alteracao_catalogo(), visitante)
+
+
+def modificacao_lista(request, categoria_slug=None):
+    """Last-Modified da listagem, só para visitantes anônimos sem carrinho"""
+    if not _visitante_anonimo(request) or len(get_messages(request)):
+        return None
+    return ultima_alteracao_catalogo()
@@ -0,0 +1,79 @@
+# produtos/exportacao.py
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Produto
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Mesmas colunas aceitas pelo import_produtos, mais o id
+COLUNAS_PRODUTOS = ('id', 'slug', 'nome', 'descricao', 'preco', 'estoque', 'disponivel', 'categoria')
+CONSULTA_PRODUTOS = ('id', 'slug', 'nome', 'descricao', 'preco', 'estoque', 'disponivel', 'categoria__slug')
+
+_codificador = DjangoJSONEncoder(ensure_ascii=False)
+
+
+class _Eco:
+    """Arquivo falso: o csv.writer escreve e a linha volta pronta para o gerador"""
+
+    def write(self, valor):
+        return valor
+
+
+def tamanho_bloco():
+    """Linhas lidas do banco por vez durante a exportação"""
+    return getattr(settings, 'EXPORTACAO_BLOCO', 2000)
+
+
+def gerar_csv(colunas, linhas):
+    """Gera o CSV linha a linha a partir de tuplas na ordem das colunas"""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(colunas)
+    for linha in linhas:
+        yield escritor.writerow(linha)
+
+
+def gerar_jsonl(colunas, linhas):
+    """Gera um objeto JSON por linha a partir de tuplas na ordem das colunas"""
+    for linha in linhas:
+        yield _codificador.encode(dict(zip(colunas, linha))) + '\n'
+
+
+def gerar_exportacao(formato, colunas, linhas):
+    """Escolhe o gerador do formato pedido"""
+    if formato == 'csv':
+        return gerar_csv(colunas, linhas)
+    return gerar_jsonl(colunas, linhas)
+
+
+def resposta_exportacao(nome, formato, colunas, linhas):
+    """
+    Resposta em streaming com o arquivo exportado.
+
+    As linhas devem vir de um iterator(): nada é acumulado em memória,
+    cada bloco lido do banco já é enviado ao cliente.
+    """
+    resposta = StreamingHttpResponse(
+        gerar_exportacao(formato, colunas, linhas), content_type=FORMATOS[formato]
+    )
+    data = timezone.localdate().isoformat()
+    resposta['Content-Disposition'] = f'attachment; filename="{nome}-{data}.{formato}"'
+    return resposta
+
+
+def linhas_produtos(queryset=None):
+    """Linhas da exportação de produtos, lidas do banco em blocos"""
+    queryset = Produto.objects.all() if queryset is None else queryset
+    return (
+        queryset.order_by('id')
+        .values_list(*CONSULTA_PRODUTOS)
+        .iterator(chunk_size=tamanho_bloco())
+    )
@@ -0,0 +1,158 @@
+# produtos/facetas.py
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import ContagemFaceta, Produto
+
+
+def limites_preco():
+    """Limites das faixas de preço, em reais"""
+    return getattr(settings, 'FAIXAS_PRECO', [10, 50, 100, 500])
+
+
+def faixa_preco(preco):
+    """Índice da faixa de preço em que o valor se encaixa"""
+    return bisect_right(limites_preco(), Decimal(str(preco)))
+
+
+def rotulo_faixa(indice):
+    """Texto exibido para a faixa de preço"""
+    limites = limites_preco()
+    if indice == 0:
+        return f'Até R${limites[0]}'
+    if indice >= len(limites):
+        return f'Acima de R${limites[-1]}'
+    return f'R${limites[indice - 1]} a R${limites[indice]}'
+
+
+def chave_faceta(categoria_id, preco, estoque, disponivel):
+    """Linha do resumo em que o produto é contado, ou None se fica de fora"""
+    if not disponivel:
+        return None
+    return (categoria_id, faixa_preco(preco), estoque > 0)
+
+
+def chave_do_produto(produto):
+    """Linha do resumo correspondente ao estado atual do produto"""
+    return chave_faceta(produto.categoria_id, produto.preco, produto.estoque, produto.disponivel)
+
+
+def ajustar_contagem(chave, delta):
+    """Soma delta ao total da linha do resumo, criando a linha se necessário"""
+    if chave is None:
+        return
+    categoria_id, faixa, em_estoque = chave
+    linha = ContagemFaceta.objects.filter(
+        categoria_id=categoria_id, faixa_preco=faixa, em_estoque=em_estoque
+    )
+    if not linha.update(total=F('total') + delta) and delta > 0:
+        with transaction.atomic():
+            ContagemFaceta.objects.get_or_create(
+                categoria_id=categoria_id, faixa_preco=faixa, em_estoque=em_estoque
+            )
+            linha.update(total=F('total') + delta)
+
+
+def registrar_alteracao(anterior, atual):
+    """Move o produto de uma linha do resumo para outra"""
+    if anterior == atual:
+        return
+    ajustar_contagem(anterior, -1)
+    ajustar_contagem(atual, 1)
+
+
+def recalcular_facetas():
+    """Reconstrói o resumo inteiro a partir da tabela de produtos"""
+    totais = defaultdict(int)
+    linhas = (
+        Produto.objects.filter(disponivel=True)
+        .values('categoria_id', 'preco', 'estoque')
+        .iterator(chunk_size=2000)
+    )
+    for linha in linhas:
+        totais[chave_faceta(linha['categoria_id'], linha['preco'], linha['estoque'], True)] += 1
+
+    with transaction.atomic():
+        ContagemFaceta.objects.all().delete()
+        ContagemFaceta.objects.bulk_create([
+            ContagemFaceta(categoria_id=categoria_id, faixa_preco=faixa, em_estoque=em_estoque, total=total)
+            for (categoria_id, faixa, em_estoque), total in totais.items()
+        ])
+    return len(totais)
+
+
+def ler_filtros(params):
+    """Extrai os filtros de faceta da querystring, ignorando valores inválidos"""
+    filtros = {'preco': None, 'estoque': params.get('estoque') == '1'}
+    try:
+        preco = int(params.get('preco', ''))
+    except ValueError:
+        preco = None
+    if preco is not None and 0 <= preco <= len(limites_preco()):
+        filtros['preco'] = preco
+    return filtros
+
+
+def aplicar_filtros(queryset, filtros):
+    """Restringe o queryset de produtos às facetas selecionadas"""
+    if filtros['preco'] is not None:
+        limites = limites_preco()
+        indice = filtros['preco']
+        if indice > 0:
+            queryset = queryset.filter(preco__gte=limites[indice - 1])
+        if indice < len(limites):
+            queryset = queryset.filter(preco__lt=limites[indice])
+    if filtros['estoque']:
+        queryset = queryset.filter(estoque__gt=0)
+    return queryset
+
+
+def contar_facetas(categorias, filtros, categoria=None):
+    """
+    Monta as contagens da barra lateral a partir do resumo.
+
+    Uma única consulta na tabela de resumo serve todas as facetas; cada
+    dimensão é contada respeitando os filtros das outras dimensões. O total
+    de uma categoria inclui as subcategorias.
+    """
+    linhas = ContagemFaceta.objects.filter(total__gt=0).values_list(
+        'categoria_id', 'faixa_preco', 'em_estoque', 'total'
+    )
+    # Cada categoria conta também para as ancestrais, lidas do caminho
+    por_slug = {c.slug: c.id for c in categorias}
+    ancestrais = {c.id: [por_slug[s] for s in c.slugs_caminho if s in por_slug] for c in categorias}
+    
+    por_categoria = defaultdict(int)
+    por_preco = defaultdict(int)
+    em_estoque = 0
+    for categoria_id, faixa, tem_estoque, total in linhas:
+        linhagem = ancestrais.get(categoria_id, [categoria_id])
+        casa_categoria = categoria is None or categoria.id in linhagem
+        casa_preco = filtros['preco'] is None or faixa == filtros['preco']
+        casa_estoque = not filtros['estoque'] or tem_estoque
+        if casa_preco and casa_estoque:
+            for ancestral_id in linhagem:
+                por_categoria[ancestral_id] += total
+        if casa_categoria and casa_estoque:
+            por_preco[faixa] += total
+        if casa_categoria and casa_preco and tem_estoque:
+            em_estoque += total
+
+    return {
+        'categorias': [(c, por_categoria[c.id]) for c in categorias],
+        'precos': [
+            {
+                'indice': indice,
+                'rotulo': rotulo_faixa(indice),
+                'total': por_preco[indice],
+                'ativo': filtros['preco'] == indice,
+            }
+            for indice in range(len(limites_preco()) + 1)
+        ],
+        'em_estoque': em_estoque,
+    }
@@ -0,0 +1,140 @@
+# produtos/fatias.py
+#
+# Estoque fatiado para produtos muito disputados (lançamentos, promoções relâmpago).
+#
+# Um produto com fatias_estoque = N tem o estoque dividido em N linhas de
+# FatiaEstoque. Cada baixa escolhe uma fatia ao acaso, então compras
+# simultâneas do mesmo produto travam linhas diferentes em vez de fazer
+# fila no lock da linha do produto: a vazão cresce com o número de fatias.
+#
+# A soma das fatias é o estoque real. Produto.estoque vira uma cópia,
+# sincronizada quando uma fatia esvazia e pelo comando rebalancear_estoque:
+# ela só serve para filtros de "tem estoque" (zera junto com a última
+# fatia). Quem exibe ou compara a quantidade lê a soma com estoque_real()
+# ou estoque_real_linhas(). Mudanças de estoque de produtos fatiados
+# (admin, importação) passam por fatiar(). Produtos fatiados não usam
+# reservas de carrinho: a disputa é resolvida na baixa.
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import FatiaEstoque, Produto
+
+
+def dividir(total, fatias):
+    """Divide o total em partes quase iguais (diferença máxima de uma unidade)"""
+    base, resto = divmod(total, fatias)
+    return [base + (1 if numero < resto else 0) for numero in range(fatias)]
+
+
+def estoque_fatiado(produto_ids):
+    """Estoque real {produto_id: soma das fatias} dos produtos informados"""
+    return dict(
+        FatiaEstoque.objects.filter(produto_id__in=produto_ids)
+        .values('produto_id').annotate(total=Sum('quantidade'))
+        .values_list('produto_id', 'total')
+    )
+
+
+def estoque_real(produtos):
+    """Troca a cópia Produto.estoque pela soma das fatias nos produtos fatiados (uma consulta)"""
+    fatiados = [produto for produto in produtos if produto.fatias_estoque]
+    if fatiados:
+        totais = estoque_fatiado([produto.id for produto in fatiados])
+        for produto in fatiados:
+            produto.estoque = totais.get(produto.id, 0)
+    return produtos
+
+
+def estoque_real_linhas(linhas):
+    """O mesmo que estoque_real() para linhas de values() com id, estoque e fatias_estoque"""
+    fatiadas = [linha for linha in linhas if linha.get('fatias_estoque')]
+    if fatiadas:
+        totais = estoque_fatiado([linha['id'] for linha in fatiadas])
+        for linha in fatiadas:
+            linha['estoque'] = totais.get(linha['id'], 0)
+    return linhas
+
+
+def sincronizar(produto_id):
+    """Copia a soma das fatias para Produto.estoque"""
+    soma = (
+        FatiaEstoque.objects.filter(produto_id=OuterRef('id'))
+        .values('produto_id').annotate(total=Sum('quantidade')).values('total')
+    )
+    Produto.objects.filter(id=produto_id).update(estoque=Coalesce(Subquery(soma), 0))
+
+
+def retirar(produto_id, quantidade):
+    """
+    Desconta a quantidade das fatias do produto; deve rodar em transação.
+
+    Tenta fatias sorteadas entre as que têm a quantidade inteira, com o
+    mesmo UPDATE condicional da baixa comum. Se nenhuma fatia tem tudo,
+    junta de várias, travando-as em ordem de número. Retorna False se a
+    soma das fatias não basta.
+    """
+    candidatas = list(
+        FatiaEstoque.objects.filter(produto_id=produto_id, quantidade__gte=quantidade)
+        .values_list('id', 'quantidade')
+    )
+    random.shuffle(candidatas)
+    for fatia_id, anterior in candidatas:
+        if FatiaEstoque.objects.filter(id=fatia_id, quantidade__gte=quantidade).update(
+            quantidade=F('quantidade') - quantidade
+        ):
+            if anterior == quantidade:
+                # A fatia esvaziou: a cópia no produto pode ter chegado a zero
+                sincronizar(produto_id)
+            return True
+
+    fatias = list(
+        FatiaEstoque.objects.select_for_update()
+        .filter(produto_id=produto_id, quantidade__gt=0).order_by('numero')
+    )
+    if sum(fatia.quantidade for fatia in fatias) < quantidade:
+        return False
+    restante = quantidade
+    alteradas = []
+    for fatia in fatias:
+        parte = min(fatia.quantidade, restante)
+        fatia.quantidade -= parte
+        restante -= parte
+        alteradas.append(fatia)
+        if not restante:
+            break
+    FatiaEstoque.objects.bulk_update(alteradas, ['quantidade'])
+    sincronizar(produto_id)
+    return True
+
+
+def fatiar(produto, fatias, estoque=None):
+    """
+    Redistribui o estoque do produto em partes iguais entre as fatias.
+
+    Com fatias=0 o produto volta ao estoque comum. Com estoque, o total
+    passa a ser esse valor (reposição); sem ele, mantém a soma atual.
+    Reservas de carrinho do produto são desfeitas ao fatiar.
+    """
+    with transaction.atomic():
+        produto = Produto.objects.select_for_update().get(pk=produto.pk)
+        if estoque is None:
+            estoque = (
+                estoque_fatiado([produto.id]).get(produto.id, 0)
+                if produto.fatias_estoque else produto.estoque
+            )
+        FatiaEstoque.objects.filter(produto=produto).delete()
+        if fatias:
+            FatiaEstoque.objects.bulk_create([
+                FatiaEstoque(produto=produto, numero=numero, quantidade=quantidade)
+                for numero, quantidade in enumerate(dividir(estoque, fatias))
+            ])
+            produto.reservas.all().delete()
+            produto.reservado = 0
+        produto.estoque = estoque
+        produto.fatias_estoque = fatias
+        # save() dispara os sinais: facetas, busca e marca do catálogo
+        produto.save(update_fields=['estoque', 'reservado', 'fatias_estoque', 'data_atualizacao'])
+    return produto
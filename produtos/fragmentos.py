@@ -0,0 +1,62 @@
+# produtos/fragmentos.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+# Marcador gravado no fragmento no lugar do token CSRF, trocado a cada requisição
+MARCADOR_CSRF = 'CSRFTOKENFRAGMENTO'
+
+
+def chave_card(produto_id):
+    """Chave do fragmento do card no cache"""
+    return f'card_produto:{produto_id}'
+
+
+def versao_card(produto):
+    """Versão do fragmento: muda sempre que o produto é salvo"""
+    return produto.data_atualizacao.isoformat()
+
+
+def renderizar_cards(produtos, request):
+    """
+    Renderiza os cards da listagem reaproveitando os fragmentos em cache.
+
+    Uma única leitura em lote busca todos os cards da página; só os que
+    faltam (ou cuja versão mudou) são renderizados e gravados de volta.
+    """
+    produtos = list(produtos)
+    encontrados = cache.get_many([chave_card(p.id) for p in produtos])
+    faltantes = [
+        p for p in produtos
+        if encontrados.get(chave_card(p.id), (None,))[0] != versao_card(p)
+    ]
+    # As rendições das imagens só são carregadas para os cards renderizados
+    prefetch_related_objects(faltantes, 'rendicoes')
+    
+    fragmentos = []
+    novos = {}
+    for produto in produtos:
+        chave = chave_card(produto.id)
+        versao = versao_card(produto)
+        guardado = encontrados.get(chave)
+        if guardado and guardado[0] == versao:
+            html = guardado[1]
+        else:
+            html = render_to_string('produtos/card.html', {
+                'produto': produto,
+                'csrf_token': MARCADOR_CSRF
+            })
+            novos[chave] = (versao, html)
+        fragmentos.append(html)
+
+    if novos:
+        cache.set_many(novos, getattr(settings, 'CARD_PRODUTO_CACHE_TIMEOUT', 60 * 60 * 24))
+
+    return ''.join(fragmentos).replace(MARCADOR_CSRF, get_token(request))
+
+
+def invalidar_card(produto_id):
+    """Descarta o fragmento do card do produto"""
+    cache.delete(chave_card(produto_id))
@@ -0,0 +1,176 @@
+# produtos/importacao.py
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from carrinho.reservas import cortar_excedentes
+
+from .fatias import estoque_fatiado, fatiar
+from .models import Categoria, Produto
+
+# Colunas gravadas a partir do arquivo; a categoria chega como slug
+CAMPOS_IMPORTADOS = ('nome', 'descricao', 'preco', 'estoque', 'disponivel', 'categoria_id')
+VERDADEIROS = {'1', 'true', 'sim', 's', 'yes', 'y', 'verdadeiro'}
+# Campos conferidos com os validadores do modelo (formato do slug, max_length, dígitos)
+CAMPOS_VALIDADOS = ('slug', 'nome', 'preco', 'estoque')
+
+
+class LinhaInvalida(ValueError):
+    """Linha do arquivo que não pode ser importada"""
+
+
+def ler_linhas(arquivo, formato):
+    """Gera um dicionário por linha do arquivo aberto, sem carregá-lo inteiro"""
+    if formato == 'csv':
+        yield from csv.DictReader(arquivo)
+        return
+    for numero, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            linha = json.loads(texto)
+        except json.JSONDecodeError as e:
+            # Repassa a linha problemática para ser contada como inválida
+            linha = {'_erro': f'JSON inválido na linha {numero}: {e.msg}'}
+        if not isinstance(linha, dict):
+            linha = {'_erro': f'a linha {numero} não é um objeto JSON'}
+        yield linha
+
+
+def converter_linha(linha, categorias):
+    """Valida a linha e devolve (slug, valores) prontos para gravar"""
+    if '_erro' in linha:
+        raise LinhaInvalida(linha['_erro'])
+
+    slug = str(linha.get('slug') or '').strip()
+    nome = str(linha.get('nome') or '').strip()
+    if not slug or not nome:
+        raise LinhaInvalida('slug e nome são obrigatórios')
+
+    categoria_id = categorias.get(str(linha.get('categoria') or '').strip())
+    if categoria_id is None:
+        raise LinhaInvalida(f"categoria desconhecida: {linha.get('categoria')!r}")
+
+    try:
+        preco = Decimal(str(linha.get('preco'))).quantize(Decimal('0.01'))
+        estoque = int(linha.get('estoque') or 0)
+    except (InvalidOperation, TypeError, ValueError):
+        raise LinhaInvalida(f'preço ou estoque inválido no produto {slug}')
+    if preco < 0 or estoque < 0:
+        raise LinhaInvalida(f'preço ou estoque negativo no produto {slug}')
+
+    valores = {'slug': slug, 'nome': nome, 'preco': preco, 'estoque': estoque}
+    for campo in CAMPOS_VALIDADOS:
+        try:
+            Produto._meta.get_field(campo).run_validators(valores[campo])
+        except ValidationError as e:
+            raise LinhaInvalida(f"{campo} inválido no produto {slug[:50]!r}: {' '.join(e.messages)}")
+
+    disponivel = linha.get('disponivel', True)
+    if not isinstance(disponivel, bool):
+        disponivel = str(disponivel).strip().lower() in VERDADEIROS
+
+    return slug, {
+        'nome': nome,
+        'descricao': str(linha.get('descricao') or ''),
+        'preco': preco,
+        'estoque': estoque,
+        'disponivel': disponivel,
+        'categoria_id': categoria_id,
+    }
+
+
+def gravar_lote(valores_por_slug):
+    """
+    Insere ou atualiza um lote de produtos em uma transação.
+
+    Uma consulta traz o estado atual dos slugs do lote; produtos iguais ao
+    arquivo não são regravados, o que torna a reimportação idempotente.
+    Reservas de carrinho que não cabem mais no estoque novo são encolhidas.
+    """
+    agora = timezone.now()
+    novos, alterados, refatiar, excedidos = [], [], [], []
+    with transaction.atomic():
+        existentes = {
+            linha[0]: linha[1:]
+            for linha in Produto.objects.filter(slug__in=list(valores_por_slug))
+            .values_list('slug', 'id', 'fatias_estoque', 'reservado', *CAMPOS_IMPORTADOS)
+        }
+        # Produtos fatiados: o estoque comparado é a soma das fatias, não a cópia
+        fatiados = estoque_fatiado([atual[0] for atual in existentes.values() if atual[1]])
+        posicao_estoque = CAMPOS_IMPORTADOS.index('estoque')
+        for slug, valores in valores_por_slug.items():
+            atual = existentes.get(slug)
+            if atual is None:
+                novos.append(Produto(slug=slug, **valores))
+                continue
+            produto_id, fatias, reservado, atual = atual[0], atual[1], atual[2], list(atual[3:])
+            if fatias:
+                atual[posicao_estoque] = fatiados.get(produto_id, 0)
+            if tuple(atual) == tuple(valores[campo] for campo in CAMPOS_IMPORTADOS):
+                continue
+            # bulk_update não aplica auto_now; a data nova também invalida o card em cache
+            alterados.append(Produto(id=produto_id, slug=slug, data_atualizacao=agora, **valores))
+            if fatias and atual[posicao_estoque] != valores['estoque']:
+                refatiar.append((produto_id, fatias, valores['estoque']))
+            elif valores['estoque'] < reservado:
+                excedidos.append(produto_id)
+
+        Produto.objects.bulk_create(novos)
+        # A cópia do estoque dos fatiados é regravada por fatiar(), junto com as fatias
+        comuns = [produto for produto in alterados if not existentes[produto.slug][1]]
+        Produto.objects.bulk_update(comuns, CAMPOS_IMPORTADOS + ('data_atualizacao',))
+        Produto.objects.bulk_update(
+            [produto for produto in alterados if existentes[produto.slug][1]],
+            tuple(campo for campo in CAMPOS_IMPORTADOS if campo != 'estoque') + ('data_atualizacao',),
+        )
+        for produto_id, fatias, estoque in refatiar:
+            fatiar(Produto(id=produto_id), fatias, estoque=estoque)
+    if excedidos:
+        # Fora da transação do lote: as reservas travam antes dos produtos
+        cortar_excedentes(excedidos)
+    return len(novos), len(alterados)
+
+
+def importar_produtos(linhas, lote=1000, ao_gravar=None, ao_errar=None):
+    """
+    Importa as linhas em lotes de tamanho fixo.
+
+    A memória usada depende só do tamanho do lote: as categorias ficam em
+    um mapa slug -> id carregado uma vez e as linhas são consumidas sob demanda.
+    Retorna um dicionário com os totais; ao_gravar(totais) é chamado a cada
+    lote e ao_errar(numero, mensagem) a cada linha inválida.
+    """
+    categorias = dict(Categoria.objects.values_list('slug', 'id'))
+    totais = {'lidas': 0, 'criados': 0, 'atualizados': 0, 'inalterados': 0, 'invalidas': 0}
+
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, lote))
+        if not bloco:
+            break
+        valores_por_slug = {}
+        for linha in bloco:
+            totais['lidas'] += 1
+            try:
+                slug, valores = converter_linha(linha, categorias)
+            except LinhaInvalida as e:
+                totais['invalidas'] += 1
+                if ao_errar:
+                    ao_errar(totais['lidas'], str(e))
+                continue
+            # Slug repetido no mesmo lote: vale a última ocorrência
+            valores_por_slug[slug] = valores
+
+        criados, atualizados = gravar_lote(valores_por_slug) if valores_por_slug else (0, 0)
+        totais['criados'] += criados
+        totais['atualizados'] += atualizados
+        totais['inalterados'] += len(valores_por_slug) - criados - atualizados
+        if ao_gravar:
+            ao_gravar(totais)
+    return totais
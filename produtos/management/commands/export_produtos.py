@@ -0,0 +1,23 @@
+# produtos/management/commands/export_produtos.py
+from django.core.management.base import BaseCommand
+
+from produtos.exportacao import COLUNAS_PRODUTOS, FORMATOS, gerar_exportacao, linhas_produtos
+
+
+class Command(BaseCommand):
+    help = 'Exporta o catálogo em CSV ou JSONL, lendo o banco em blocos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--saida', help='Arquivo de destino (padrão: saída padrão)')
+
+    def handle(self, *args, **options):
+        pedacos = gerar_exportacao(options['formato'], COLUNAS_PRODUTOS, linhas_produtos())
+        if not options['saida']:
+            # self.stdout respeita o stdout= do call_command; os pedaços já trazem as quebras de linha
+            for pedaco in pedacos:
+                self.stdout.write(pedaco, ending='')
+            return
+        with open(options['saida'], 'w', encoding='utf-8', newline='') as arquivo:
+            arquivo.writelines(pedacos)
+        self.stderr.write(self.style.SUCCESS(f"Produtos exportados para {options['saida']}"))
@@ -0,0 +1,28 @@
+# produtos/management/commands/generate_renditions.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from produtos.models import Produto
+from produtos.rendicoes import gerar_rendicoes
+
+
+class Command(BaseCommand):
+    help = 'Gera as rendições (tamanhos e formatos) das imagens de produtos já cadastradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=None,
+                            help='Número de processos do pool (padrão: um por CPU)')
+        parser.add_argument('--todos', action='store_true',
+                            help='Regera também os produtos que já possuem rendições')
+
+    def handle(self, *args, **options):
+        produtos = Produto.objects.exclude(imagem='').only('id', 'imagem').order_by('id')
+        if not options['todos']:
+            produtos = produtos.filter(rendicoes__isnull=True)
+
+        inicio = time.monotonic()
+        gerados = gerar_rendicoes(produtos.iterator(chunk_size=500), processos=options['processos'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendições geradas para {gerados} produtos em {time.monotonic() - inicio:.2f}s'
+        ))
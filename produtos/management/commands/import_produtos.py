@@ -0,0 +1,59 @@
+# produtos/management/commands/import_produtos.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos.busca import backend_busca
+from produtos.condicional import marcar_alteracao_catalogo
+from produtos.facetas import recalcular_facetas
+from produtos.importacao import importar_produtos, ler_linhas
+
+
+class Command(BaseCommand):
+    help = 'Importa produtos de um arquivo CSV ou JSONL, criando ou atualizando pelo slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo .csv ou .jsonl')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'],
+                            help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--lote', type=int, default=getattr(settings, 'IMPORTACAO_LOTE', 1000),
+                            help='Linhas gravadas por transação')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        formato = options['formato'] or ('csv' if caminho.lower().endswith('.csv') else 'jsonl')
+        if options['lote'] < 1:
+            raise CommandError('--lote deve ser maior que zero')
+
+        inicio = time.monotonic()
+
+        def ao_gravar(totais):
+            if options['verbosity'] > 1:
+                decorrido = time.monotonic() - inicio
+                self.stdout.write(f"{totais['lidas']} linhas ({totais['lidas'] / decorrido:.0f} linhas/s)")
+
+        def ao_errar(numero, mensagem):
+            self.stderr.write(f'Linha {numero} ignorada: {mensagem}')
+
+        try:
+            with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+                totais = importar_produtos(
+                    ler_linhas(arquivo, formato), lote=options['lote'],
+                    ao_gravar=ao_gravar, ao_errar=ao_errar
+                )
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler {caminho}: {e}')
+
+        # bulk_create/bulk_update não disparam os sinais de Produto
+        if totais['criados'] or totais['atualizados']:
+            backend_busca().reconstruir()
+            recalcular_facetas()
+            marcar_alteracao_catalogo()
+
+        decorrido = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['lidas']} linhas em {decorrido:.2f}s ({totais['lidas'] / max(decorrido, 1e-6):.0f} linhas/s): "
+            f"{totais['criados']} criados, {totais['atualizados']} atualizados, "
+            f"{totais['inalterados']} inalterados, {totais['invalidas']} inválidas"
+        ))
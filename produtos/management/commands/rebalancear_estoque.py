@@ -0,0 +1,32 @@
+# produtos/management/commands/rebalancear_estoque.py
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos.fatias import fatiar
+from produtos.models import Produto
+
+
+class Command(BaseCommand):
+    help = 'Redistribui o estoque dos produtos fatiados igualmente entre as fatias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('produtos', nargs='*', type=int,
+                            help='Ids dos produtos (padrão: todos os fatiados)')
+        parser.add_argument('--fatias', type=int,
+                            help='Novo número de fatias (0 volta ao estoque comum)')
+        parser.add_argument('--estoque', type=int,
+                            help='Novo estoque total, dividido entre as fatias (reposição)')
+
+    def handle(self, *args, **options):
+        if (options['fatias'] is not None or options['estoque'] is not None) and not options['produtos']:
+            raise CommandError('--fatias e --estoque exigem os ids dos produtos.')
+        produtos = (
+            Produto.objects.filter(id__in=options['produtos']) if options['produtos']
+            else Produto.objects.filter(fatias_estoque__gt=0)
+        )
+        total = 0
+        for produto in produtos.order_by('id'):
+            quantas = produto.fatias_estoque if options['fatias'] is None else options['fatias']
+            produto = fatiar(produto, quantas, estoque=options['estoque'])
+            self.stdout.write(f'{produto}: {produto.estoque} unidades em {quantas} fatias')
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} produtos rebalanceados'))
@@ -0,0 +1,21 @@
+# produtos/management/commands/rebuild_search_index.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from produtos.busca import backend_busca
+from produtos.models import Produto
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual dos produtos'
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        with transaction.atomic():
+            backend_busca().reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de busca reconstruído com {Produto.objects.count()} produtos '
+            f'em {time.monotonic() - inicio:.2f}s'
+        ))
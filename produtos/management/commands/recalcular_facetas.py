@@ -0,0 +1,12 @@
+# produtos/management/commands/recalcular_facetas.py
+from django.core.management.base import BaseCommand
+
+from produtos.facetas import recalcular_facetas
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo de contagens de facetas do catálogo'
+
+    def handle(self, *args, **options):
+        linhas = recalcular_facetas()
+        self.stdout.write(self.style.SUCCESS(f'Resumo de facetas recalculado ({linhas} linhas)'))
@@ -0,0 +1,58 @@
+# produtos/marcas.py
+#
+# Marcas d'água compartilhadas entre processos.
+#
+# A marca fica no banco (MarcaAlteracao): comandos de gerenciamento e
+# todos os processos web enxergam a mesma. Cada processo guarda a última
+# leitura no cache padrão por MARCAS_TTL segundos, então uma alteração
+# feita em outro processo aparece em até esse tempo; no processo que a
+# fez, aparece na hora.
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import MarcaAlteracao
+
+
+def _chave_cache(chave):
+    return f'marca:{chave}'
+
+
+def _guardar(chave, versao):
+    cache.set(_chave_cache(chave), versao, getattr(settings, 'MARCAS_TTL', 2))
+    return versao
+
+
+def avancar(chave):
+    """
+    Grava uma marca nova e a devolve.
+
+    A marca nunca volta no tempo, mesmo com relógios diferentes entre
+    servidores: ela é usada como Last-Modified.
+    """
+    agora = timezone.now()
+    if not MarcaAlteracao.objects.filter(chave=chave).update(
+        versao=Greatest(agora, F('versao') + timedelta(microseconds=1))
+    ):
+        MarcaAlteracao.objects.get_or_create(chave=chave, defaults={'versao': agora})
+    return _guardar(chave, MarcaAlteracao.objects.values_list('versao', flat=True).get(chave=chave))
+
+
+def atual(chave):
+    """
+    Marca atual, do cache local se lida há pouco ou do banco.
+
+    Sem marca gravada, começa de agora: exclusões não deixam rastro em
+    data_atualizacao, então só assim é seguro.
+    """
+    versao = cache.get(_chave_cache(chave))
+    if versao is None:
+        versao = MarcaAlteracao.objects.get_or_create(
+            chave=chave, defaults={'versao': timezone.now()}
+        )[0].versao
+        _guardar(chave, versao)
+    return versao
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['disponivel', 'data_criacao', 'id'], name='produto_disp_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['categoria', 'disponivel', 'data_criacao', 'id'], name='produto_cat_criacao_idx'),
+        ),
+    ]
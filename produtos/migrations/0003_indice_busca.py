@@ -0,0 +1,45 @@
+from django.db import migrations
+
+TABELA_FTS = 'produtos_produto_fts'
+INDICE_GIN = 'produto_busca_gin_idx'
+DOCUMENTO_POSTGRES = (
+    "(setweight(to_tsvector('portuguese', coalesce(nome, '')), 'A') || "
+    "setweight(to_tsvector('portuguese', coalesce(descricao, '')), 'B'))"
+)
+
+
+def criar_indice_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} "
+            f"USING fts5(nome, descricao, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {TABELA_FTS} (rowid, nome, descricao) '
+            f'SELECT id, nome, descricao FROM produtos_produto'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDICE_GIN} ON produtos_produto '
+            f'USING GIN ({DOCUMENTO_POSTGRES})'
+        )
+
+
+def remover_indice_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABELA_FTS}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE_GIN}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0002_produto_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-17 00:10
+
+import django.db.models.deletion
+from bisect import bisect_right
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def popular_contagens(apps, schema_editor):
+    Produto = apps.get_model('produtos', 'Produto')
+    ContagemFaceta = apps.get_model('produtos', 'ContagemFaceta')
+    limites = getattr(settings, 'FAIXAS_PRECO', [10, 50, 100, 500])
+    totais = Counter(
+        (categoria_id, bisect_right(limites, preco), estoque > 0)
+        for categoria_id, preco, estoque in Produto.objects.filter(disponivel=True)
+        .values_list('categoria_id', 'preco', 'estoque').iterator()
+    )
+    ContagemFaceta.objects.bulk_create([
+        ContagemFaceta(categoria_id=categoria_id, faixa_preco=faixa, em_estoque=em_estoque, total=total)
+        for (categoria_id, faixa, em_estoque), total in totais.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0003_indice_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContagemFaceta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('faixa_preco', models.PositiveSmallIntegerField()),
+                ('em_estoque', models.BooleanField()),
+                ('total', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contagens_faceta', to='produtos.categoria')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('categoria', 'faixa_preco', 'em_estoque'), name='contagem_faceta_unica')],
+            },
+        ),
+        migrations.RunPython(popular_contagens, migrations.RunPython.noop),
+    ]
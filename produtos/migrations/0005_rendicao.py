@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0004_contagemfaceta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rendicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('largura', models.PositiveIntegerField()),
+                ('altura', models.PositiveIntegerField()),
+                ('formato', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10)),
+                ('arquivo', models.ImageField(max_length=255, upload_to='produtos/rendicoes/')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rendicoes', to='produtos.produto')),
+            ],
+            options={
+                'ordering': ['largura'],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'largura', 'formato'), name='rendicao_unica')],
+            },
+        ),
+    ]
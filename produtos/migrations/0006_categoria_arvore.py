@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-17 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def preencher_caminhos(apps, schema_editor):
+    # Todas as categorias existentes viram raízes da árvore
+    Categoria = apps.get_model('produtos', 'Categoria')
+    usados = set(Categoria.objects.exclude(slug='').values_list('slug', flat=True))
+    categorias = list(Categoria.objects.all())
+    for categoria in categorias:
+        if not categoria.slug:
+            base = slugify(categoria.nome)[:40] or 'categoria'
+            slug, sufixo = base, 2
+            while slug in usados:
+                slug, sufixo = f'{base}-{sufixo}', sufixo + 1
+            categoria.slug = slug
+            usados.add(slug)
+        categoria.caminho = f'{categoria.slug}/'
+    Categoria.objects.bulk_update(categorias, ['slug', 'caminho'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0005_rendicao'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='categoria',
+            options={'ordering': ['caminho'], 'verbose_name': 'Categoria', 'verbose_name_plural': 'Categorias'},
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='pai',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='filhas', to='produtos.categoria'),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='caminho',
+            field=models.CharField(default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(preencher_caminhos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['caminho'], name='categoria_caminho_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0006_categoria_arvore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='reservado',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 00:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0007_produto_reservado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='fatias_estoque',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FatiaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fatias', to='produtos.produto')),
+            ],
+            options={
+                'ordering': ['produto', 'numero'],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'numero'), name='fatia_estoque_unica')],
+            },
+        ),
+    ]
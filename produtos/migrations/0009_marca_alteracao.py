@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0008_estoque_fatiado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAlteracao',
+            fields=[
+                ('chave', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('versao', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0009_marca_alteracao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='produto',
+            name='reservado',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
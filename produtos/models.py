@@ -1,16 +1,104 @@
 # produtos/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Concat, Substr
 from django.urls import reverse
+from django.utils.text import slugify
+
+SEPARADOR_CAMINHO = '/'
+
+
+def _slugs_livres(categorias):
+    """Preenche o slug das categorias que vierem sem, a partir do nome"""
+    sem_slug = [categoria for categoria in categorias if not categoria.slug]
+    if not sem_slug:
+        return
+    usados = set(Categoria.objects.values_list('slug', flat=True))
+    usados.update(categoria.slug for categoria in categorias if categoria.slug)
+    for categoria in sem_slug:
+        base = slugify(categoria.nome)[:40] or 'categoria'
+        slug, sufixo = base, 2
+        while slug in usados:
+            slug, sufixo = f'{base}-{sufixo}', sufixo + 1
+        categoria.slug = slug
+        usados.add(slug)
+
+
+class CategoriaQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create não chama save(): slug e caminho são montados aqui
+        objs = list(objs)
+        _slugs_livres(objs)
+        for categoria in objs:
+            categoria.caminho = categoria.montar_caminho()
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class Categoria(models.Model):
+    """
+    Categoria da árvore do catálogo.
+
+    caminho guarda os slugs da raiz até a categoria ("casa/cozinha/"), de
+    modo que a subárvore inteira é um filtro de prefixo no índice.
+    """
     nome = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
+    pai = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='filhas')
+    caminho = models.CharField(max_length=255, editable=False)
+    
+    objects = CategoriaQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['caminho']
+        verbose_name = 'Categoria'
+        verbose_name_plural = 'Categorias'
+        indexes = [
+            # varchar_pattern_ops deixa o PostgreSQL usar o índice no LIKE 'prefixo%'
+            models.Index(fields=['caminho'], name='categoria_caminho_idx', opclasses=['varchar_pattern_ops']),
+        ]
     
     def __str__(self):
         return self.nome
 
     def get_absolute_url(self):
         return reverse('produtos:lista_por_categoria', args=[self.slug])
+    
+    @property
+    def nivel(self):
+        """Profundidade na árvore; as raízes ficam no nível 0"""
+        return self.caminho.count(SEPARADOR_CAMINHO) - 1
+    
+    @property
+    def slugs_caminho(self):
+        """Slugs da raiz até esta categoria"""
+        return self.caminho.rstrip(SEPARADOR_CAMINHO).split(SEPARADOR_CAMINHO)
+    
+    def montar_caminho(self):
+        """Caminho a partir do caminho atual do pai, lido do banco"""
+        prefixo = ''
+        if self.pai_id:
+            prefixo = Categoria.objects.values_list('caminho', flat=True).get(pk=self.pai_id)
+        return f'{prefixo}{self.slug}{SEPARADOR_CAMINHO}'
+    
+    def subarvore(self):
+        """A categoria e todas as descendentes, em uma consulta por prefixo"""
+        return Categoria.objects.filter(caminho__startswith=self.caminho)
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            _slugs_livres([self])
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = Categoria.objects.filter(pk=self.pk).values_list('caminho', flat=True).first()
+            self.caminho = self.montar_caminho()
+            if anterior and self.caminho.startswith(anterior) and self.caminho != anterior:
+                raise ValueError('Uma categoria não pode ficar dentro da própria subárvore')
+            super().save(*args, **kwargs)
+            if anterior and anterior != self.caminho:
+                # Slug ou pai mudou: as descendentes trocam o prefixo em um único UPDATE
+                Categoria.objects.filter(caminho__startswith=anterior).exclude(pk=self.pk).update(
+                    caminho=Concat(models.Value(self.caminho), Substr('caminho', len(anterior) + 1))
+                )
 
 class Produto(models.Model):
     nome = models.CharField(max_length=200)
@@ -18,14 +106,103 @@ class Produto(models.Model):
     descricao = models.TextField()
     preco = models.DecimalField(max_digits=10, decimal_places=2)
     estoque = models.PositiveIntegerField()
+    # Unidades separadas por carrinhos (carrinho.Reserva), mantido a cada reserva
+    # só por UPDATEs com F(); save() comum não regrava a coluna
+    reservado = models.PositiveIntegerField(default=0, editable=False)
+    # Com N > 0 o estoque fica dividido em N linhas de FatiaEstoque (produtos.fatias)
+    fatias_estoque = models.PositiveSmallIntegerField(default=0)
     disponivel = models.BooleanField(default=True)
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
     imagem = models.ImageField(upload_to='produtos/', blank=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Paginação por cursor da listagem (produtos.paginacao)
+            models.Index(fields=['disponivel', 'data_criacao', 'id'], name='produto_disp_criacao_idx'),
+            models.Index(fields=['categoria', 'disponivel', 'data_criacao', 'id'], name='produto_cat_criacao_idx'),
+        ]
+    
     def __str__(self):
         return self.nome
 
     def get_absolute_url(self):
-        return reverse('produtos:detalhe', args=[self.id, self.slug])
\ No newline at end of file
+        return reverse('produtos:detalhe', args=[self.id, self.slug])
+    
+    def save(self, *args, **kwargs):
+        # Uma instância lida antes de uma reserva traria o contador antigo de volta
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'reservado'
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def disponivel_venda(self):
+        """Unidades que ainda podem ser vendidas: estoque menos reservas (fatiados: após fatias.estoque_real)"""
+        return max(0, self.estoque - self.reservado)
+
+class Rendicao(models.Model):
+    """Versão redimensionada da imagem de um produto"""
+    FORMATO_CHOICES = (
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    )
+    
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='rendicoes')
+    largura = models.PositiveIntegerField()
+    altura = models.PositiveIntegerField()
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    arquivo = models.ImageField(upload_to='produtos/rendicoes/', max_length=255)
+    
+    class Meta:
+        ordering = ['largura']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'largura', 'formato'], name='rendicao_unica'),
+        ]
+    
+    def __str__(self):
+        return f'{self.produto_id} {self.largura}w {self.formato}'
+
+
+class ContagemFaceta(models.Model):
+    """Resumo de produtos disponíveis por categoria, faixa de preço e estoque"""
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='contagens_faceta')
+    faixa_preco = models.PositiveSmallIntegerField()
+    em_estoque = models.BooleanField()
+    total = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['categoria', 'faixa_preco', 'em_estoque'], name='contagem_faceta_unica'),
+        ]
+    
+    def __str__(self):
+        return f'{self.categoria_id}/{self.faixa_preco}/{self.em_estoque}: {self.total}'
+
+
+class FatiaEstoque(models.Model):
+    """Parte do estoque de um produto fatiado; a soma das fatias é o estoque real"""
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='fatias')
+    numero = models.PositiveSmallIntegerField()
+    quantidade = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['produto', 'numero']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'numero'], name='fatia_estoque_unica'),
+        ]
+    
+    def __str__(self):
+        return f'{self.produto_id}#{self.numero}: {self.quantidade}'
+
+
+class MarcaAlteracao(models.Model):
+    """Marca d'água compartilhada entre processos (catálogo, categorias); ver produtos.marcas"""
+    chave = models.CharField(max_length=100, primary_key=True)
+    versao = models.DateTimeField()
+    
+    def __str__(self):
+        return f'{self.chave}: {self.versao:%Y-%m-%d %H:%M:%S.%f}'
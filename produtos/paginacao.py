@@ -0,0 +1,127 @@
+# produtos/paginacao.py
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+# Ordem da listagem: mais recentes primeiro, com o id como desempate
+ORDENACAO = ('-data_criacao', '-id')
+
+
+def codificar_cursor(data_criacao, produto_id):
+    """Gera um cursor opaco a partir da chave (data_criacao, id)"""
+    bruto = f'{data_criacao.isoformat()}|{produto_id}'.encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna a chave (data_criacao, id) do cursor ou None se for inválido"""
+    if not cursor:
+        return None
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        bruto = base64.urlsafe_b64decode(cursor + preenchimento).decode()
+        data, produto_id = bruto.split('|')
+        return datetime.fromisoformat(data), int(produto_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def tamanho_pagina(valor=None):
+    """Normaliza o tamanho de página pedido respeitando o limite configurado"""
+    padrao = getattr(settings, 'PRODUTOS_POR_PAGINA', 24)
+    maximo = getattr(settings, 'PRODUTOS_POR_PAGINA_MAX', 96)
+    try:
+        tamanho = int(valor) if valor else padrao
+    except (TypeError, ValueError):
+        tamanho = padrao
+    return max(1, min(tamanho, maximo))
+
+
+def _depois(chave, inclusivo=False):
+    """Filtro das linhas que vêm depois da chave na ordem da listagem"""
+    data, produto_id = chave
+    desempate = {'id__lte' if inclusivo else 'id__lt': produto_id}
+    return Q(data_criacao__lt=data) | Q(data_criacao=data, **desempate)
+
+
+def _antes(chave):
+    """Filtro das linhas que vêm antes da chave na ordem da listagem"""
+    data, produto_id = chave
+    return Q(data_criacao__gt=data) | Q(data_criacao=data, id__gt=produto_id)
+
+
+def _chave(item):
+    """Chave (data_criacao, id) de um produto ou de uma linha de values()"""
+    if isinstance(item, dict):
+        return item['data_criacao'], item['id']
+    return item.data_criacao, item.id
+
+
+class PaginaKeyset:
+    """Uma página da listagem com os cursores de navegação"""
+
+    def __init__(self, produtos, tamanho, proximo_cursor=None, cursor_anterior=None):
+        self.produtos = produtos
+        self.tamanho = tamanho
+        self.proximo_cursor = proximo_cursor
+        self.cursor_anterior = cursor_anterior
+
+    @property
+    def tem_proxima(self):
+        return self.proximo_cursor is not None
+
+    @property
+    def tem_anterior(self):
+        return self.cursor_anterior is not None
+
+
+def paginar_keyset(queryset, apos=None, antes=None, tamanho=None):
+    """
+    Pagina o queryset por cursor sobre (data_criacao, id).
+
+    Cada página custa o mesmo que a primeira: o início da página é
+    localizado pelo índice composto, sem OFFSET.
+    """
+    tamanho = tamanho_pagina(tamanho)
+    queryset = queryset.order_by(*ORDENACAO)
+    inicio = None
+
+    chave_apos = decodificar_cursor(apos)
+    chave_antes = decodificar_cursor(antes)
+    if chave_apos:
+        filtro = _depois(chave_apos)
+        inicio = chave_apos
+    elif chave_antes:
+        # Volta até o início da página anterior andando na ordem inversa
+        anteriores = list(
+            queryset.filter(_antes(chave_antes))
+            .order_by('data_criacao', 'id')
+            .values_list('data_criacao', 'id')[:tamanho]
+        )
+        if len(anteriores) == tamanho:
+            filtro = _depois(anteriores[-1], inclusivo=True)
+            inicio = anteriores[-1]
+        else:
+            filtro = Q()
+    else:
+        filtro = Q()
+
+    produtos = queryset.filter(filtro)[:tamanho]
+    itens = list(produtos)
+
+    proximo_cursor = None
+    if len(itens) == tamanho:
+        ultimo = _chave(itens[-1])
+        if queryset.filter(_depois(ultimo)).exists():
+            proximo_cursor = codificar_cursor(*ultimo)
+
+    cursor_anterior = None
+    if inicio and itens:
+        primeiro = _chave(itens[0])
+        if queryset.filter(_antes(primeiro)).exists():
+            cursor_anterior = codificar_cursor(*primeiro)
+
+    return PaginaKeyset(produtos, tamanho, proximo_cursor, cursor_anterior)
@@ -0,0 +1,36 @@
+# produtos/processamento_imagens.py
+# Executado nos processos do pool: não importa nada do Django.
+import os
+
+from PIL import Image, ImageOps
+
+FORMATOS = (
+    ('webp', 'WEBP', 'webp'),
+    ('jpeg', 'JPEG', 'jpg'),
+)
+
+
+def gerar_arquivos(origem, pasta, base, larguras, qualidade=80):
+    """
+    Gera as versões redimensionadas de uma imagem em WebP e JPEG.
+
+    Nunca amplia a imagem: larguras maiores que a original são trocadas
+    pela largura original. Retorna [(largura, altura, formato, nome)].
+    """
+    os.makedirs(pasta, exist_ok=True)
+    resultados = []
+    with Image.open(origem) as imagem:
+        imagem = ImageOps.exif_transpose(imagem).convert('RGB')
+        feitas = set()
+        for largura in sorted(larguras):
+            alvo = min(largura, imagem.width)
+            if alvo in feitas:
+                continue
+            feitas.add(alvo)
+            altura = max(1, round(imagem.height * alvo / imagem.width))
+            copia = imagem.resize((alvo, altura), Image.LANCZOS)
+            for formato, formato_pil, extensao in FORMATOS:
+                nome = f'{base}-{alvo}.{extensao}'
+                copia.save(os.path.join(pasta, nome), format=formato_pil, quality=qualidade, optimize=True)
+                resultados.append((alvo, altura, formato, nome))
+    return resultados
@@ -0,0 +1,125 @@
+# produtos/rendicoes.py
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from .condicional import marcar_alteracao_catalogo
+from .fragmentos import invalidar_card
+from .models import Rendicao
+from .processamento_imagens import gerar_arquivos
+
+logger = logging.getLogger(__name__)
+
+PASTA_RENDICOES = 'produtos/rendicoes'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _configuracao():
+    """Larguras e qualidade configuradas para as rendições"""
+    return (
+        getattr(settings, 'RENDICOES_LARGURAS', [320, 640, 1024]),
+        getattr(settings, 'RENDICOES_QUALIDADE', 80),
+    )
+
+
+def _tarefa(produto):
+    """Argumentos do gerar_arquivos para a imagem atual do produto"""
+    larguras, qualidade = _configuracao()
+    pasta = f'{PASTA_RENDICOES}/{produto.id}'
+    base = os.path.splitext(os.path.basename(produto.imagem.name))[0]
+    return pasta, (produto.imagem.path, default_storage.path(pasta), base, larguras, qualidade)
+
+
+def salvar_rendicoes(produto_id, pasta, resultados):
+    """Substitui as rendições registradas do produto pelas recém-geradas"""
+    novos = {f'{pasta}/{nome}' for _, _, _, nome in resultados}
+    with transaction.atomic():
+        antigas = list(Rendicao.objects.filter(produto_id=produto_id))
+        Rendicao.objects.filter(produto_id=produto_id).delete()
+        Rendicao.objects.bulk_create([
+            Rendicao(
+                produto_id=produto_id,
+                largura=largura,
+                altura=altura,
+                formato=formato,
+                arquivo=f'{pasta}/{nome}'
+            )
+            for largura, altura, formato, nome in resultados
+        ])
+    for rendicao in antigas:
+        if rendicao.arquivo.name not in novos:
+            rendicao.arquivo.delete(save=False)
+    invalidar_card(produto_id)
+    marcar_alteracao_catalogo()
+
+
+def gerar_rendicoes(produtos, processos=None, lote=100):
+    """
+    Gera as rendições de vários produtos em um pool de processos.
+
+    As tarefas são enviadas em lotes para manter a memória constante
+    mesmo em backfills grandes. Retorna quantos produtos foram processados.
+    """
+    processos = processos or getattr(settings, 'RENDICOES_PROCESSOS', None)
+    gerados = 0
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        pendentes = []
+        for produto in produtos:
+            if produto.imagem:
+                pendentes.append(produto)
+            if len(pendentes) >= lote:
+                gerados += _processar_lote(pool, pendentes)
+                pendentes = []
+        if pendentes:
+            gerados += _processar_lote(pool, pendentes)
+    return gerados
+
+
+def _processar_lote(pool, produtos):
+    """Processa um lote no pool e registra os resultados conforme ficam prontos"""
+    futuros = {}
+    for produto in produtos:
+        pasta, argumentos = _tarefa(produto)
+        futuros[pool.submit(gerar_arquivos, *argumentos)] = (produto.id, pasta)
+
+    gerados = 0
+    for futuro in as_completed(futuros):
+        produto_id, pasta = futuros[futuro]
+        try:
+            salvar_rendicoes(produto_id, pasta, futuro.result())
+            gerados += 1
+        except Exception as e:
+            logger.error(f"Erro ao gerar rendições do produto {produto_id}: {e}")
+    return gerados
+
+
+def _pool_compartilhado():
+    """Pool do processo web, criado na primeira imagem enviada"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'RENDICOES_PROCESSOS', None))
+        return _pool
+
+
+def agendar_rendicoes(produto):
+    """Envia a imagem do produto ao pool sem bloquear a requisição"""
+    pasta, argumentos = _tarefa(produto)
+    produto_id = produto.id
+
+    def concluir(futuro):
+        try:
+            salvar_rendicoes(produto_id, pasta, futuro.result())
+        except Exception as e:
+            logger.error(f"Erro ao gerar rendições do produto {produto_id}: {e}")
+        finally:
+            connections.close_all()
+
+    _pool_compartilhado().submit(gerar_arquivos, *argumentos).add_done_callback(concluir)
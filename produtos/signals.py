@@ -0,0 +1,86 @@
+# produtos/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import facetas
+from .condicional import marcar_alteracao_catalogo
+from .busca import backend_busca
+from .fragmentos import invalidar_card
+from .rendicoes import agendar_rendicoes
+from .models import Categoria, Produto
+
+
+@receiver(pre_save, sender=Produto)
+def guardar_estado_anterior(sender, instance, raw=False, **kwargs):
+    """Lê do banco o estado do produto antes do save (facetas e imagem)"""
+    instance._faceta_anterior = None
+    instance._imagem_anterior = None
+    if raw or instance.pk is None:
+        return
+    anterior = (
+        Produto.objects.filter(pk=instance.pk)
+        .values_list('categoria_id', 'preco', 'estoque', 'disponivel', 'imagem')
+        .first()
+    )
+    if anterior:
+        instance._faceta_anterior = facetas.chave_faceta(*anterior[:4])
+        instance._imagem_anterior = anterior[4]
+
+
+@receiver(post_save, sender=Produto)
+def indexar_produto_busca(sender, instance, raw=False, **kwargs):
+    """Mantém o índice de busca em dia com o produto salvo"""
+    if raw:
+        return
+    backend_busca().indexar(instance)
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_facetas(sender, instance, raw=False, **kwargs):
+    """Atualiza incrementalmente as contagens de facetas"""
+    if raw:
+        return
+    facetas.registrar_alteracao(
+        getattr(instance, '_faceta_anterior', None),
+        facetas.chave_do_produto(instance)
+    )
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_rendicoes(sender, instance, raw=False, **kwargs):
+    """Agenda novas rendições quando a imagem do produto muda"""
+    if raw or not getattr(settings, 'RENDICOES_AUTOMATICAS', True):
+        return
+    if not instance.imagem or instance.imagem.name == getattr(instance, '_imagem_anterior', None):
+        return
+    transaction.on_commit(lambda: agendar_rendicoes(instance))
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def invalidar_card_produto(sender, instance, **kwargs):
+    """Descarta o fragmento em cache do card do produto"""
+    invalidar_card(instance.id)
+
+
+@receiver(post_delete, sender=Produto)
+def remover_produto_busca(sender, instance, **kwargs):
+    """Remove o produto excluído do índice de busca"""
+    backend_busca().remover(instance.id)
+
+
+@receiver(post_delete, sender=Produto)
+def remover_produto_facetas(sender, instance, **kwargs):
+    """Desconta o produto excluído das contagens de facetas"""
+    facetas.ajustar_contagem(facetas.chave_do_produto(instance), -1)
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def avancar_marca_catalogo(sender, **kwargs):
+    """Avança a marca d'água usada nas respostas condicionais"""
+    marcar_alteracao_catalogo()
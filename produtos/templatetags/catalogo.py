@@ -0,0 +1,64 @@
+# produtos/templatetags/catalogo.py
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from produtos.fragmentos import renderizar_cards
+
+register = template.Library()
+
+SIZES_CARD = '(max-width: 768px) 100vw, 33vw'
+
+
+@register.simple_tag(takes_context=True)
+def cards_produtos(context, produtos):
+    """Renderiza os cards dos produtos usando o cache de fragmentos"""
+    return mark_safe(renderizar_cards(produtos, context['request']))
+
+
+def _srcset(rendicoes):
+    """Valor do atributo srcset para as rendições de um formato"""
+    return format_html_join(', ', '{} {}w', ((r.arquivo.url, r.largura) for r in rendicoes))
+
+
+@register.simple_tag
+def imagem_produto(produto, classe='card-img-top', sizes=SIZES_CARD, estilo=''):
+    """
+    Imagem do produto com srcset das rendições WebP/JPEG.
+
+    Enquanto as rendições não existem, usa a imagem original. Em listas,
+    carregue os produtos com prefetch_related('rendicoes'): o all() abaixo
+    usa o prefetch em vez de uma consulta por produto.
+    """
+    atributos = format_html('class="{}"', classe)
+    if estilo:
+        atributos = format_html('{} style="{}"', atributos, estilo)
+
+    if not produto.imagem:
+        return format_html(
+            '<img src="{}" alt="Sem imagem" {}>',
+            static('img/no_image.png'), atributos
+        )
+
+    rendicoes = list(produto.rendicoes.all())
+    webp = [r for r in rendicoes if r.formato == 'webp']
+    jpeg = [r for r in rendicoes if r.formato == 'jpeg']
+    if not jpeg:
+        return format_html(
+            '<img src="{}" alt="{}" {} loading="lazy">',
+            produto.imagem.url, produto.nome, atributos
+        )
+
+    fonte_webp = ''
+    if webp:
+        fonte_webp = format_html(
+            '<source type="image/webp" srcset="{}" sizes="{}">',
+            _srcset(webp), sizes
+        )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" {} loading="lazy"></picture>',
+        fonte_webp, jpeg[0].arquivo.url, _srcset(jpeg), sizes,
+        jpeg[0].largura, jpeg[0].altura, produto.nome, atributos
+    )
@@ -184,6 +184,16 @@ class ProdutoModelTest(TestCase):
         # Deletar categoria deve deletar o produto
         categoria_temp.delete()
         self.assertFalse(Produto.objects.filter(id=produto_temp.id).exists())
+    
+    def test_save_nao_regrava_reservado(self):
+        """Testa se salvar uma instância antiga não desfaz reservas feitas depois da leitura"""
+        from carrinho.reservas import reservar
+        produto = Produto.objects.get(id=self.produto.id)
+        reservar('carrinho', produto.id, 3)
+        produto.nome = 'Produto Renomeado'
+        produto.save()
+        produto.refresh_from_db()
+        self.assertEqual((produto.nome, produto.reservado), ('Produto Renomeado', 3))
 
 
 class ProdutosViewsTest(TestCase):
@@ -443,3 +453,972 @@ class ProdutosIntegrationTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+
+
+class PaginacaoKeysetTest(TestCase):
+    """Testes para a paginação por cursor da listagem de produtos"""
+    
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome='Doces', slug='doces')
+        self.outra_categoria = Categoria.objects.create(nome='Salgados', slug='salgados')
+        self.produtos = [
+            Produto.objects.create(
+                nome=f'Produto {i}',
+                slug=f'produto-{i}',
+                descricao='Descrição',
+                preco=Decimal('10.00'),
+                estoque=1,
+                categoria=self.categoria
+            )
+            for i in range(7)
+        ]
+        # Mais recentes primeiro
+        self.produtos.reverse()
+    
+    def test_cursor_ida_e_volta(self):
+        """Testa se o cursor decodifica a mesma chave"""
+        from .paginacao import codificar_cursor, decodificar_cursor
+        produto = self.produtos[0]
+        cursor = codificar_cursor(produto.data_criacao, produto.id)
+        self.assertEqual(decodificar_cursor(cursor), (produto.data_criacao, produto.id))
+    
+    def test_cursor_invalido(self):
+        """Testa se um cursor inválido é ignorado"""
+        from .paginacao import decodificar_cursor
+        self.assertIsNone(decodificar_cursor('lixo!'))
+        self.assertIsNone(decodificar_cursor(''))
+    
+    def test_tamanho_pagina_limitado(self):
+        """Testa o limite máximo do tamanho de página"""
+        from .paginacao import tamanho_pagina
+        with self.settings(PRODUTOS_POR_PAGINA=3, PRODUTOS_POR_PAGINA_MAX=5):
+            self.assertEqual(tamanho_pagina(), 3)
+            self.assertEqual(tamanho_pagina('1000'), 5)
+            self.assertEqual(tamanho_pagina('abc'), 3)
+            self.assertEqual(tamanho_pagina('0'), 1)
+    
+    def test_navegacao_completa(self):
+        """Testa a navegação para frente e para trás pelos cursores"""
+        url = reverse('produtos:lista')
+        with self.settings(PRODUTOS_POR_PAGINA=3):
+            response = self.client.get(url)
+            pagina = response.context['pagina']
+            self.assertEqual(list(response.context['produtos']), self.produtos[:3])
+            self.assertFalse(pagina.tem_anterior)
+            self.assertTrue(pagina.tem_proxima)
+            
+            response = self.client.get(url, {'apos': pagina.proximo_cursor})
+            pagina = response.context['pagina']
+            self.assertEqual(list(response.context['produtos']), self.produtos[3:6])
+            self.assertTrue(pagina.tem_anterior)
+            
+            response = self.client.get(url, {'apos': pagina.proximo_cursor})
+            pagina = response.context['pagina']
+            self.assertEqual(list(response.context['produtos']), self.produtos[6:])
+            self.assertFalse(pagina.tem_proxima)
+            
+            response = self.client.get(url, {'antes': pagina.cursor_anterior})
+            pagina = response.context['pagina']
+            self.assertEqual(list(response.context['produtos']), self.produtos[3:6])
+            
+            response = self.client.get(url, {'antes': pagina.cursor_anterior})
+            pagina = response.context['pagina']
+            self.assertEqual(list(response.context['produtos']), self.produtos[:3])
+            self.assertFalse(pagina.tem_anterior)
+    
+    def test_paginacao_por_categoria(self):
+        """Testa a paginação na rota de categoria"""
+        Produto.objects.create(
+            nome='Coxinha',
+            slug='coxinha',
+            descricao='Descrição',
+            preco=Decimal('5.00'),
+            estoque=1,
+            categoria=self.outra_categoria
+        )
+        url = reverse('produtos:lista_por_categoria', args=['doces'])
+        response = self.client.get(url, {'tamanho': 5})
+        pagina = response.context['pagina']
+        self.assertEqual(list(response.context['produtos']), self.produtos[:5])
+        self.assertContains(response, f'apos={pagina.proximo_cursor}')
+    
+    def test_consultas_constantes_em_paginas_profundas(self):
+        """Testa se páginas profundas custam o mesmo número de consultas"""
+        from .paginacao import paginar_keyset
+        produtos = Produto.objects.filter(disponivel=True)
+        pagina = paginar_keyset(produtos, tamanho=2)
+        pagina = paginar_keyset(produtos, apos=pagina.proximo_cursor, tamanho=2)
+        with self.assertNumQueries(3):
+            pagina = paginar_keyset(produtos, apos=pagina.proximo_cursor, tamanho=2)
+        self.assertEqual(list(pagina.produtos), self.produtos[4:6])
+
+
+class BuscaProdutosTest(TestCase):
+    """Testes para a busca textual de produtos"""
+    
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome='Doces', slug='doces')
+        self.brigadeiro = Produto.objects.create(
+            nome='Brigadeiro Gourmet',
+            slug='brigadeiro-gourmet',
+            descricao='Feito com chocolate belga',
+            preco=Decimal('3.50'),
+            estoque=100,
+            categoria=self.categoria
+        )
+        self.bolo = Produto.objects.create(
+            nome='Bolo de Chocolate',
+            slug='bolo-de-chocolate',
+            descricao='Massa fofa com cobertura de brigadeiro',
+            preco=Decimal('45.00'),
+            estoque=5,
+            categoria=self.categoria
+        )
+        self.pacoca = Produto.objects.create(
+            nome='Paçoca',
+            slug='pacoca',
+            descricao='Doce de amendoim',
+            preco=Decimal('1.00'),
+            estoque=50,
+            disponivel=False,
+            categoria=self.categoria
+        )
+    
+    def test_extrair_termos_ignora_sintaxe(self):
+        """Testa se operadores de consulta são descartados"""
+        from .busca import extrair_termos
+        self.assertEqual(extrair_termos('bolo" OR *(choc'), ['bolo', 'OR', 'choc'])
+        self.assertEqual(extrair_termos(''), [])
+    
+    def test_busca_ordenada_por_relevancia(self):
+        """Testa se o nome pesa mais que a descrição"""
+        from .busca import buscar_produtos
+        resultados = buscar_produtos('brigadeiro')
+        self.assertEqual(resultados, [self.brigadeiro, self.bolo])
+    
+    def test_busca_por_prefixo_e_sem_acento(self):
+        """Testa a busca enquanto o usuário digita"""
+        from .busca import buscar_produtos
+        self.assertEqual(buscar_produtos('choc'), [self.bolo, self.brigadeiro])
+        self.pacoca.disponivel = True
+        self.pacoca.save()
+        self.assertEqual(buscar_produtos('pacoca'), [self.pacoca])
+    
+    def test_busca_ignora_indisponiveis(self):
+        """Testa se produtos indisponíveis ficam fora dos resultados"""
+        from .busca import buscar_produtos
+        self.assertEqual(buscar_produtos('amendoim'), [])
+    
+    def test_indice_acompanha_alteracoes(self):
+        """Testa se os sinais mantêm o índice atualizado"""
+        from .busca import buscar_produtos
+        self.bolo.nome = 'Torta de Morango'
+        self.bolo.descricao = 'Com chantilly'
+        self.bolo.save()
+        self.assertEqual(buscar_produtos('morango'), [self.bolo])
+        self.assertEqual(buscar_produtos('chocolate'), [self.brigadeiro])
+        
+        self.brigadeiro.delete()
+        self.assertEqual(buscar_produtos('chocolate'), [])
+    
+    def test_rebuild_search_index(self):
+        """Testa o comando que reconstrói o índice"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from .busca import TABELA_FTS, buscar_produtos
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABELA_FTS}')
+        self.assertEqual(buscar_produtos('brigadeiro'), [])
+        
+        saida = StringIO()
+        call_command('rebuild_search_index', stdout=saida)
+        self.assertIn('3 produtos', saida.getvalue())
+        self.assertEqual(buscar_produtos('brigadeiro'), [self.brigadeiro, self.bolo])
+    
+    def test_view_busca(self):
+        """Testa a view de busca"""
+        response = self.client.get(reverse('produtos:busca'), {'q': 'bolo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'produtos/busca.html')
+        self.assertEqual(response.context['produtos'], [self.bolo])
+        self.assertContains(response, 'Bolo de Chocolate')
+    
+    def test_view_busca_sem_termo(self):
+        """Testa a view de busca sem termo digitado"""
+        response = self.client.get(reverse('produtos:busca'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['produtos'], [])
+
+
+class FacetasTest(TestCase):
+    """Testes para o resumo de facetas e os filtros da listagem"""
+    
+    def setUp(self):
+        self.doces = Categoria.objects.create(nome='Doces', slug='doces')
+        self.bolos = Categoria.objects.create(nome='Bolos', slug='bolos')
+        self.brigadeiro = Produto.objects.create(
+            nome='Brigadeiro', slug='brigadeiro', descricao='Doce',
+            preco=Decimal('3.50'), estoque=10, categoria=self.doces
+        )
+        self.cocada = Produto.objects.create(
+            nome='Cocada', slug='cocada', descricao='Doce',
+            preco=Decimal('5.00'), estoque=0, categoria=self.doces
+        )
+        self.bolo = Produto.objects.create(
+            nome='Bolo', slug='bolo', descricao='Bolo',
+            preco=Decimal('60.00'), estoque=2, categoria=self.bolos
+        )
+    
+    def contagens(self):
+        from .models import ContagemFaceta
+        return {
+            (c.categoria_id, c.faixa_preco, c.em_estoque): c.total
+            for c in ContagemFaceta.objects.filter(total__gt=0)
+        }
+    
+    def test_faixa_preco(self):
+        """Testa o enquadramento dos preços nas faixas"""
+        from .facetas import faixa_preco, rotulo_faixa
+        self.assertEqual(faixa_preco(Decimal('9.99')), 0)
+        self.assertEqual(faixa_preco(Decimal('10.00')), 1)
+        self.assertEqual(faixa_preco(Decimal('1000')), 4)
+        self.assertEqual(rotulo_faixa(0), 'Até R$10')
+        self.assertEqual(rotulo_faixa(4), 'Acima de R$500')
+    
+    def test_contagens_incrementais(self):
+        """Testa se criar, alterar e excluir produtos atualiza o resumo"""
+        self.assertEqual(self.contagens(), {
+            (self.doces.id, 0, True): 1,
+            (self.doces.id, 0, False): 1,
+            (self.bolos.id, 2, True): 1,
+        })
+        
+        self.cocada.estoque = 4
+        self.cocada.save()
+        self.bolo.disponivel = False
+        self.bolo.save()
+        self.assertEqual(self.contagens(), {(self.doces.id, 0, True): 2})
+        
+        self.brigadeiro.delete()
+        self.assertEqual(self.contagens(), {(self.doces.id, 0, True): 1})
+    
+    def test_recalcular_facetas(self):
+        """Testa se o recálculo completo coincide com as contagens incrementais"""
+        from .facetas import recalcular_facetas
+        incrementais = self.contagens()
+        recalcular_facetas()
+        self.assertEqual(self.contagens(), incrementais)
+    
+    def test_ler_filtros_invalidos(self):
+        """Testa se filtros inválidos são ignorados"""
+        from .facetas import ler_filtros
+        self.assertEqual(ler_filtros({'preco': 'x'}), {'preco': None, 'estoque': False})
+        self.assertEqual(ler_filtros({'preco': '99'}), {'preco': None, 'estoque': False})
+        self.assertEqual(ler_filtros({'preco': '1', 'estoque': '1'}), {'preco': 1, 'estoque': True})
+    
+    def test_listagem_filtrada(self):
+        """Testa a listagem com filtros de preço e estoque"""
+        url = reverse('produtos:lista')
+        response = self.client.get(url, {'preco': 0})
+        self.assertEqual(set(response.context['produtos']), {self.brigadeiro, self.cocada})
+        
+        response = self.client.get(url, {'preco': 0, 'estoque': 1})
+        self.assertEqual(list(response.context['produtos']), [self.brigadeiro])
+    
+    def test_contagens_da_barra_lateral(self):
+        """Testa se cada faceta é contada com os filtros das outras"""
+        response = self.client.get(reverse('produtos:lista'), {'estoque': 1})
+        facetas = response.context['facetas']
+        self.assertEqual(dict(facetas['categorias']), {self.doces: 1, self.bolos: 1})
+        precos = {f['indice']: f['total'] for f in facetas['precos']}
+        self.assertEqual(precos, {0: 1, 1: 0, 2: 1, 3: 0, 4: 0})
+        self.assertEqual(facetas['em_estoque'], 2)
+        self.assertContains(response, 'Doces (1)')
+        
+        url = reverse('produtos:lista_por_categoria', args=['doces'])
+        facetas = self.client.get(url).context['facetas']
+        self.assertEqual(dict(facetas['categorias']), {self.doces: 2, self.bolos: 1})
+        self.assertEqual(facetas['precos'][0]['total'], 2)
+        self.assertEqual(facetas['em_estoque'], 1)
+    
+    def test_barra_lateral_uma_consulta(self):
+        """Testa se todas as facetas saem de uma única consulta"""
+        from .facetas import contar_facetas
+        categorias = list(Categoria.objects.all())
+        with self.assertNumQueries(1):
+            contar_facetas(categorias, {'preco': None, 'estoque': False})
+
+
+class FragmentosCardTest(TestCase):
+    """Testes para o cache de fragmentos dos cards de produto"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.categoria = Categoria.objects.create(nome='Doces', slug='doces')
+        self.produtos = [
+            Produto.objects.create(
+                nome=f'Doce {i}', slug=f'doce-{i}', descricao='Doce',
+                preco=Decimal('2.00'), estoque=5, categoria=self.categoria
+            )
+            for i in range(3)
+        ]
+        self.request = Client().get(reverse('produtos:lista')).wsgi_request
+    
+    def test_renderiza_apenas_faltantes(self):
+        """Testa se só os cards fora do cache são renderizados"""
+        from unittest.mock import patch
+        from . import fragmentos
+        with patch.object(fragmentos, 'render_to_string', wraps=fragmentos.render_to_string) as render:
+            fragmentos.renderizar_cards(self.produtos, self.request)
+            self.assertEqual(render.call_count, 0)  # já renderizados pela listagem
+            
+            fragmentos.invalidar_card(self.produtos[0].id)
+            fragmentos.renderizar_cards(self.produtos, self.request)
+            self.assertEqual(render.call_count, 1)
+    
+    def test_salvar_produto_invalida_card(self):
+        """Testa se salvar o produto gera um novo fragmento"""
+        from .fragmentos import renderizar_cards
+        renderizar_cards(self.produtos, self.request)
+        produto = self.produtos[1]
+        produto.nome = 'Doce Renomeado'
+        produto.save()
+        html = renderizar_cards(Produto.objects.filter(id=produto.id), self.request)
+        self.assertIn('Doce Renomeado', html)
+    
+    def test_versao_antiga_ignorada(self):
+        """Testa se um fragmento de versão diferente não é reaproveitado"""
+        from django.core.cache import cache
+        from .fragmentos import chave_card, renderizar_cards
+        produto = self.produtos[2]
+        cache.set(chave_card(produto.id), ('versao-antiga', 'HTML ANTIGO'))
+        html = renderizar_cards([produto], self.request)
+        self.assertNotIn('HTML ANTIGO', html)
+        self.assertIn(produto.nome, html)
+    
+    def test_token_csrf_injetado(self):
+        """Testa se o token CSRF é inserido depois da leitura do cache"""
+        import re
+        from .fragmentos import MARCADOR_CSRF, renderizar_cards
+        html = renderizar_cards(self.produtos, self.request)
+        self.assertNotIn(MARCADOR_CSRF, html)
+        tokens = re.findall(r'name="csrfmiddlewaretoken" value="(\w+)"', html)
+        self.assertEqual(len(tokens), 3)
+        self.assertEqual(len(set(tokens)), 1)
+        self.assertEqual(len(tokens[0]), 64)
+    
+    def test_listagem_usa_fragmentos(self):
+        """Testa se a listagem exibe os cards com formulário válido"""
+        response = self.client.get(reverse('produtos:lista'))
+        self.assertContains(response, 'Doce 0')
+        self.assertContains(response, 'name="csrfmiddlewaretoken"', count=3)
+        self.assertNotContains(response, 'CSRFTOKENFRAGMENTO')
+
+
+class RendicoesImagemTest(TestCase):
+    """Testes para as rendições das imagens de produto"""
+    
+    def setUp(self):
+        import tempfile
+        from io import BytesIO
+        from PIL import Image
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name, RENDICOES_LARGURAS=[320, 640, 1024])
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='PNG')
+        self.categoria = Categoria.objects.create(nome='Doces', slug='doces')
+        self.produto = Produto.objects.create(
+            nome='Bolo', slug='bolo', descricao='Bolo',
+            preco=Decimal('30.00'), estoque=3, categoria=self.categoria,
+            imagem=SimpleUploadedFile('bolo.png', buffer.getvalue(), content_type='image/png')
+        )
+    
+    def test_gerar_arquivos_sem_ampliar(self):
+        """Testa se as larguras maiores que a original não ampliam a imagem"""
+        from .processamento_imagens import gerar_arquivos
+        resultados = gerar_arquivos(
+            self.produto.imagem.path, os.path.join(self.media.name, 'saida'), 'bolo', [320, 640, 1024]
+        )
+        self.assertEqual(
+            sorted((largura, altura, formato) for largura, altura, formato, _ in resultados),
+            [(320, 160, 'jpeg'), (320, 160, 'webp'), (640, 320, 'jpeg'), (640, 320, 'webp'),
+             (800, 400, 'jpeg'), (800, 400, 'webp')]
+        )
+        for _, _, _, nome in resultados:
+            self.assertTrue(os.path.isfile(os.path.join(self.media.name, 'saida', nome)))
+    
+    def test_gerar_rendicoes_com_pool(self):
+        """Testa a geração no pool de processos e o registro no banco"""
+        from .models import Rendicao
+        from .rendicoes import gerar_rendicoes
+        self.assertEqual(gerar_rendicoes([self.produto], processos=1), 1)
+        rendicoes = Rendicao.objects.filter(produto=self.produto)
+        self.assertEqual(rendicoes.count(), 6)
+        self.assertEqual(set(rendicoes.values_list('formato', flat=True)), {'webp', 'jpeg'})
+        for rendicao in rendicoes:
+            self.assertTrue(os.path.isfile(rendicao.arquivo.path))
+        
+        # Regerar substitui os registros em vez de duplicar
+        gerar_rendicoes([self.produto], processos=1)
+        self.assertEqual(rendicoes.count(), 6)
+    
+    def test_tag_emite_srcset(self):
+        """Testa a tag imagem_produto com e sem rendições"""
+        from .rendicoes import gerar_rendicoes
+        from .templatetags.catalogo import imagem_produto
+        html = imagem_produto(self.produto)
+        self.assertIn(self.produto.imagem.url, html)
+        self.assertNotIn('srcset', html)
+        
+        gerar_rendicoes([self.produto], processos=1)
+        produto = Produto.objects.get(id=self.produto.id)
+        html = imagem_produto(produto, sizes='50vw')
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('-320.webp 320w', html)
+        self.assertIn('-640.jpg 640w', html)
+        self.assertIn('sizes="50vw"', html)
+    
+    def test_tag_sem_imagem(self):
+        """Testa a tag para produto sem imagem"""
+        from .templatetags.catalogo import imagem_produto
+        self.produto.imagem = ''
+        html = imagem_produto(self.produto, estilo='max-width: 80px;')
+        self.assertIn('no_image.png', html)
+        self.assertIn('style="max-width: 80px;"', html)
+    
+    def test_nova_imagem_agenda_rendicoes(self):
+        """Testa se trocar a imagem agenda a geração após o commit"""
+        from unittest.mock import patch
+        with patch('produtos.signals.agendar_rendicoes') as agendar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.produto.nome = 'Bolo de Fubá'
+                self.produto.save()
+            agendar.assert_not_called()
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                self.produto.imagem = SimpleUploadedFile('outra.png', b'png', content_type='image/png')
+                self.produto.save()
+            agendar.assert_called_once_with(self.produto)
+    
+    def test_generate_renditions(self):
+        """Testa o comando de backfill das rendições"""
+        from io import StringIO
+        from django.core.management import call_command
+        saida = StringIO()
+        call_command('generate_renditions', '--processos', '1', stdout=saida)
+        self.assertIn('1 produtos', saida.getvalue())
+        self.assertEqual(self.produto.rendicoes.count(), 6)
+        
+        saida = StringIO()
+        call_command('generate_renditions', '--processos', '1', stdout=saida)
+        self.assertIn('0 produtos', saida.getvalue())
+
+
+class RespostasCondicionaisTest(TestCase):
+    """Testes para ETag/Last-Modified das páginas do catálogo"""
+    
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome='Doces', slug='doces')
+        self.produto = Produto.objects.create(
+            nome='Quindim', slug='quindim', descricao='Doce de gema',
+            preco=Decimal('4.00'), estoque=8, categoria=self.categoria
+        )
+        self.url_detalhe = self.produto.get_absolute_url()
+    
+    def test_detalhe_304_com_etag(self):
+        """Testa se o detalhe responde 304 quando nada mudou"""
+        response = self.client.get(self.url_detalhe)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        response = self.client.get(self.url_detalhe, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+    
+    def test_detalhe_alterado_renderiza_de_novo(self):
+        """Testa se alterar o produto invalida o ETag"""
+        etag = self.client.get(self.url_detalhe)['ETag']
+        self.produto.preco = Decimal('5.00')
+        self.produto.save()
+        response = self.client.get(self.url_detalhe, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_detalhe_last_modified_anonimo(self):
+        """Testa o If-Modified-Since para visitantes anônimos sem carrinho"""
+        response = self.client.get(self.url_detalhe)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(self.url_detalhe, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_carrinho_muda_etag(self):
+        """Testa se o cabeçalho com o carrinho entra no ETag"""
+        etag = self.client.get(self.url_detalhe)['ETag']
+        self.client.post(reverse('carrinho:adicionar', args=[self.produto.id]))
+        response = self.client.get(self.url_detalhe, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+    
+    def test_usuario_muda_etag(self):
+        """Testa se o login muda o ETag da página"""
+        etag = self.client.get(self.url_detalhe)['ETag']
+        usuario = User.objects.create_user(username='cliente', password='senha12345')
+        self.client.force_login(usuario)
+        response = self.client.get(self.url_detalhe, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_lista_304_e_marca_do_catalogo(self):
+        """Testa a listagem condicional e a marca d'água do catálogo"""
+        url = reverse('produtos:lista')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        # Excluir não muda data_atualizacao de ninguém, mas avança a marca
+        Produto.objects.create(
+            nome='Cocada', slug='cocada', descricao='Doce',
+            preco=Decimal('2.00'), estoque=1, categoria=self.categoria
+        ).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_lista_etag_por_endereco(self):
+        """Testa se filtros e cursores geram ETags diferentes"""
+        url = reverse('produtos:lista')
+        self.assertNotEqual(
+            self.client.get(url)['ETag'],
+            self.client.get(url, {'preco': 0})['ETag']
+        )
+    
+    def test_marca_gravada_por_outro_processo(self):
+        """Testa se uma alteração feita por um comando (outro processo) chega às páginas"""
+        from datetime import timedelta
+        from django.core.cache import cache
+        from .condicional import CHAVE_MARCA_CATALOGO
+        from .models import MarcaAlteracao
+        url = reverse('produtos:lista')
+        etag = self.client.get(url)['ETag']
+        # Outro processo avança a marca no banco; o cache local deste não muda
+        MarcaAlteracao.objects.filter(chave=CHAVE_MARCA_CATALOGO).update(
+            versao=MarcaAlteracao.objects.get(chave=CHAVE_MARCA_CATALOGO).versao + timedelta(seconds=1)
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Passado MARCAS_TTL, a leitura vai ao banco
+        cache.delete(f'marca:{CHAVE_MARCA_CATALOGO}')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_marca_nao_volta_no_tempo(self):
+        """Testa se a marca avança mesmo quando outro servidor gravou uma hora à frente"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .condicional import CHAVE_MARCA_CATALOGO, marcar_alteracao_catalogo
+        from .models import MarcaAlteracao
+        futuro = timezone.now() + timedelta(hours=1)
+        MarcaAlteracao.objects.update_or_create(chave=CHAVE_MARCA_CATALOGO, defaults={'versao': futuro})
+        self.assertGreater(marcar_alteracao_catalogo(), futuro)
+    
+    def test_detalhe_304_sem_renderizar(self):
+        """Testa se o 304 não renderiza template"""
+        etag = self.client.get(self.url_detalhe)['ETag']
+        with self.assertTemplateNotUsed('produtos/detalhe.html'):
+            self.client.get(self.url_detalhe, HTTP_IF_NONE_MATCH=etag)
+
+
+class ApiCatalogoTest(TestCase):
+    """Testes para a API JSON do catálogo"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.categoria = Categoria.objects.create(nome='Frutas', slug='frutas')
+        self.outra = Categoria.objects.create(nome='Verduras', slug='verduras')
+        self.produtos = [
+            Produto.objects.create(
+                nome=f'Fruta {i}', slug=f'fruta-{i}', descricao='Fresca',
+                preco=Decimal('3.00') + i, estoque=5, categoria=self.categoria
+            )
+            for i in range(5)
+        ]
+        self.alface = Produto.objects.create(
+            nome='Alface', slug='alface', descricao='Crespa',
+            preco=Decimal('2.00'), estoque=5, categoria=self.outra
+        )
+        self.url = reverse('produtos:api_lista')
+    
+    def ler(self, response):
+        import json
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content))
+        return json.loads(response.content)
+    
+    def test_lista_com_cursores(self):
+        """Testa a listagem paginada e o cursor da próxima página"""
+        dados = self.ler(self.client.get(self.url, {'tamanho': 4}))
+        self.assertEqual(len(dados['resultados']), 4)
+        self.assertIsNotNone(dados['proximo'])
+        self.assertIsNone(dados['anterior'])
+        
+        dados = self.ler(self.client.get(self.url, {'tamanho': 4, 'apos': dados['proximo']}))
+        self.assertEqual(len(dados['resultados']), 2)
+        self.assertIsNone(dados['proximo'])
+        self.assertIsNotNone(dados['anterior'])
+    
+    def test_lote_de_ids_em_uma_consulta(self):
+        """Testa se ?ids= devolve os produtos na ordem pedida com uma consulta"""
+        ids = [self.produtos[3].id, self.alface.id, 999999, self.produtos[0].id]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'ids': ','.join(map(str, ids))})
+            dados = self.ler(response)
+        self.assertEqual(
+            [item['id'] for item in dados['resultados']],
+            [self.produtos[3].id, self.alface.id, self.produtos[0].id]
+        )
+    
+    def test_campos_esparsos(self):
+        """Testa se ?fields= limita os campos serializados"""
+        dados = self.ler(self.client.get(self.url, {'fields': 'id,nome,url'}))
+        item = dados['resultados'][0]
+        self.assertEqual(set(item), {'id', 'nome', 'url'})
+        self.assertEqual(item['url'], self.alface.get_absolute_url())
+    
+    def test_parametros_invalidos(self):
+        """Testa se campos ou ids inválidos respondem 400"""
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,senha'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,abc'}).status_code, 400)
+        with self.settings(API_MAX_IDS=2):
+            self.assertEqual(self.client.get(self.url, {'ids': '1,2,3'}).status_code, 400)
+    
+    def test_filtro_por_categoria(self):
+        """Testa o filtro pelo slug da categoria"""
+        dados = self.ler(self.client.get(self.url, {'categoria': 'verduras'}))
+        self.assertEqual([item['id'] for item in dados['resultados']], [self.alface.id])
+        self.assertEqual(self.client.get(self.url, {'categoria': 'nada'}).status_code, 400)
+    
+    def test_resposta_em_cache(self):
+        """Testa se a segunda requisição igual vem do cache sem consultar o banco"""
+        primeira = b''.join(self.client.get(self.url).streaming_content)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, primeira)
+        
+        # Alterar o catálogo invalida o corpo guardado
+        self.alface.nome = 'Alface americana'
+        self.alface.save()
+        self.assertIn('Alface americana', self.ler(self.client.get(self.url))['resultados'][0]['nome'])
+    
+    def test_304_com_etag(self):
+        """Testa se a API responde 304 quando o catálogo não mudou"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_produto_individual(self):
+        """Testa o endpoint de um produto e o 404 em JSON"""
+        url = reverse('produtos:api_detalhe', args=[self.alface.id])
+        dados = self.ler(self.client.get(url, {'fields': 'nome,preco'}))
+        self.assertEqual(dados, {'nome': 'Alface', 'preco': '2.00'})
+        
+        response = self.client.get(reverse('produtos:api_detalhe', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportacaoProdutosTest(TestCase):
+    """Testes para o comando import_produtos"""
+    
+    def setUp(self):
+        import tempfile
+        self.categoria = Categoria.objects.create(nome='Grãos', slug='graos')
+        self.pasta = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.pasta, ignore_errors=True)
+    
+    def arquivo(self, nome, conteudo):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        return caminho
+    
+    def importar(self, caminho, **opcoes):
+        from io import StringIO
+        from django.core.management import call_command
+        saida, erros = StringIO(), StringIO()
+        call_command('import_produtos', caminho, stdout=saida, stderr=erros, **opcoes)
+        return saida.getvalue(), erros.getvalue()
+    
+    def test_importa_csv(self):
+        """Testa a criação de produtos a partir de CSV"""
+        caminho = self.arquivo('produtos.csv', (
+            'slug,nome,descricao,preco,estoque,disponivel,categoria\n'
+            'arroz,Arroz,Tipo 1,25.90,10,1,graos\n'
+            'feijao,Feijão,Carioca,8.5,0,0,graos\n'
+        ))
+        saida, _ = self.importar(caminho)
+        self.assertIn('2 criados', saida)
+        self.assertIn('linhas/s', saida)
+        feijao = Produto.objects.get(slug='feijao')
+        self.assertEqual(feijao.preco, Decimal('8.50'))
+        self.assertFalse(feijao.disponivel)
+        self.assertEqual(feijao.categoria, self.categoria)
+    
+    def test_estoque_menor_encolhe_reservas(self):
+        """Testa se reduzir o estoque abaixo do reservado devolve as reservas mais recentes"""
+        from datetime import timedelta
+        from carrinho.models import Reserva
+        from carrinho.reservas import reservar
+        from .importacao import gravar_lote
+        arroz = Produto.objects.create(
+            nome='Arroz', slug='arroz', descricao='Tipo 1', preco=Decimal('25.90'),
+            estoque=10, categoria=self.categoria
+        )
+        reservar('antigo', arroz.id, 4)
+        reservar('novo', arroz.id, 4)
+        prazo = Reserva.objects.get(chave='antigo').expira_em
+        Reserva.objects.filter(chave='novo').update(expira_em=prazo + timedelta(minutes=1))
+        gravar_lote({'arroz': {
+            'nome': 'Arroz', 'descricao': 'Tipo 1', 'preco': Decimal('25.90'),
+            'estoque': 5, 'disponivel': True, 'categoria_id': self.categoria.id,
+        }})
+        self.assertEqual(dict(Reserva.objects.values_list('chave', 'quantidade')), {'antigo': 4, 'novo': 1})
+        arroz.refresh_from_db()
+        self.assertEqual((arroz.estoque, arroz.reservado), (5, 5))
+    
+    def test_reimportacao_idempotente(self):
+        """Testa se importar o mesmo arquivo de novo não regrava nada"""
+        caminho = self.arquivo('produtos.jsonl', (
+            '{"slug": "milho", "nome": "Milho", "preco": "4.00", "estoque": 3, "categoria": "graos"}\n'
+            '{"slug": "soja", "nome": "Soja", "preco": 6, "estoque": 2, "categoria": "graos"}\n'
+        ))
+        self.importar(caminho)
+        datas = dict(Produto.objects.values_list('slug', 'data_atualizacao'))
+        saida, _ = self.importar(caminho)
+        self.assertIn('0 criados, 0 atualizados, 2 inalterados', saida)
+        self.assertEqual(dict(Produto.objects.values_list('slug', 'data_atualizacao')), datas)
+        self.assertEqual(Produto.objects.count(), 2)
+    
+    def test_atualiza_pelo_slug(self):
+        """Testa a atualização em lote de produtos existentes"""
+        Produto.objects.create(
+            nome='Aveia', slug='aveia', descricao='Flocos',
+            preco=Decimal('5.00'), estoque=1, categoria=self.categoria
+        )
+        caminho = self.arquivo('produtos.jsonl', (
+            '{"slug": "aveia", "nome": "Aveia em flocos", "preco": "7.00", "estoque": 9, "categoria": "graos"}\n'
+        ))
+        saida, _ = self.importar(caminho)
+        self.assertIn('1 atualizados', saida)
+        aveia = Produto.objects.get(slug='aveia')
+        self.assertEqual((aveia.nome, aveia.preco, aveia.estoque), ('Aveia em flocos', Decimal('7.00'), 9))
+        
+        # Índices derivados acompanham a importação
+        from .busca import buscar_produtos
+        self.assertEqual(buscar_produtos('flocos'), [aveia])
+    
+    def test_linhas_invalidas_ignoradas(self):
+        """Testa se linhas inválidas são relatadas sem interromper a importação"""
+        caminho = self.arquivo('produtos.jsonl', (
+            '{"slug": "trigo", "nome": "Trigo", "preco": "3.00", "estoque": 1, "categoria": "graos"}\n'
+            '{"slug": "cevada", "nome": "Cevada", "preco": "x", "estoque": 1, "categoria": "graos"}\n'
+            '{"slug": "quinoa", "nome": "Quinoa", "preco": "9.00", "estoque": 1, "categoria": "nada"}\n'
+            'não é json\n'
+        ))
+        saida, erros = self.importar(caminho)
+        self.assertIn('1 criados', saida)
+        self.assertIn('3 inválidas', saida)
+        self.assertIn('Linha 3', erros)
+        self.assertEqual(list(Produto.objects.values_list('slug', flat=True)), ['trigo'])
+    
+    def test_campos_fora_do_modelo_recusados(self):
+        """Testa se slug mal formado ou valores acima do tamanho das colunas são recusados"""
+        nome_longo = 'N' * 201
+        slug_longo = 's' * 51
+        caminho = self.arquivo('produtos.jsonl', (
+            '{"slug": "camisa azul", "nome": "Camisa", "preco": "3.00", "estoque": 1, "categoria": "graos"}\n'
+            f'{{"slug": "{slug_longo}", "nome": "Camisa", "preco": "3.00", "estoque": 1, "categoria": "graos"}}\n'
+            f'{{"slug": "camisa", "nome": "{nome_longo}", "preco": "3.00", "estoque": 1, "categoria": "graos"}}\n'
+            '{"slug": "cara", "nome": "Cara", "preco": "123456789.00", "estoque": 1, "categoria": "graos"}\n'
+            '{"slug": "milho", "nome": "Milho", "preco": "4.00", "estoque": 1, "categoria": "graos"}\n'
+        ))
+        saida, erros = self.importar(caminho)
+        self.assertIn('1 criados', saida)
+        self.assertIn('4 inválidas', saida)
+        self.assertIn('slug inválido', erros)
+        self.assertIn('nome inválido', erros)
+        self.assertIn('preco inválido', erros)
+        self.assertEqual(list(Produto.objects.values_list('slug', flat=True)), ['milho'])
+    
+    def test_lotes_com_consultas_constantes(self):
+        """Testa se o número de consultas depende dos lotes, não das linhas"""
+        from .importacao import importar_produtos
+        linhas = [
+            {'slug': f'grao-{i}', 'nome': f'Grão {i}', 'preco': '1.00', 'estoque': 1, 'categoria': 'graos'}
+            for i in range(50)
+        ]
+        # Categorias + (consulta, inserção) por lote, dentro de savepoints
+        with self.assertNumQueries(1 + 5 * 4):
+            totais = importar_produtos(iter(linhas), lote=10)
+        self.assertEqual(totais['criados'], 50)
+
+
+class ExportacaoProdutosTest(TestCase):
+    """Testes para a exportação do catálogo"""
+    
+    def setUp(self):
+        from django.utils.text import slugify
+        self.categoria = Categoria.objects.create(nome='Chás', slug='chas')
+        for nome in ('Camomila', 'Hortelã'):
+            Produto.objects.create(
+                nome=nome, slug=slugify(nome), descricao='Sachês',
+                preco=Decimal('6.00'), estoque=4, categoria=self.categoria
+            )
+    
+    def test_acao_admin_jsonl(self):
+        """Testa a ação do admin que exporta produtos em streaming"""
+        import json
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha12345')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:produtos_produto_changelist'), {
+            'action': 'exportar_jsonl',
+            '_selected_action': list(Produto.objects.values_list('id', flat=True)),
+        })
+        self.assertTrue(response.streaming)
+        linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([linha['nome'] for linha in linhas], ['Camomila', 'Hortelã'])
+        self.assertEqual(linhas[0]['categoria'], 'chas')
+    
+    def test_exportacao_reimportavel(self):
+        """Testa se o CSV exportado pode ser importado de volta sem alterações"""
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'catalogo.csv')
+            call_command('export_produtos', saida=caminho, stderr=StringIO())
+            saida = StringIO()
+            call_command('import_produtos', caminho, stdout=saida)
+        self.assertIn('0 criados, 0 atualizados, 2 inalterados', saida.getvalue())
+
+
+class EstoqueFatiadoTest(TestCase):
+    """Testes para o estoque dividido em fatias"""
+    
+    def setUp(self):
+        categoria = Categoria.objects.create(nome='Lançamentos', slug='lancamentos')
+        self.produto = Produto.objects.create(
+            nome='Console', slug='console', descricao='Edição limitada',
+            preco=Decimal('3000.00'), estoque=10, categoria=categoria
+        )
+    
+    def test_fatiar_divide_o_estoque(self):
+        """Testa se o estoque é dividido em partes quase iguais"""
+        from .fatias import fatiar
+        fatiar(self.produto, 4)
+        self.assertEqual(list(self.produto.fatias.values_list('quantidade', flat=True)), [3, 3, 2, 2])
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.estoque, self.produto.fatias_estoque), (10, 4))
+    
+    def test_retirar_junta_varias_fatias(self):
+        """Testa se a baixa junta fatias quando nenhuma tem tudo e sincroniza o produto"""
+        from django.db import transaction
+        from .fatias import fatiar, retirar
+        fatiar(self.produto, 4)
+        with transaction.atomic():
+            self.assertTrue(retirar(self.produto.id, 2))
+            self.assertTrue(retirar(self.produto.id, 5))
+            self.assertFalse(retirar(self.produto.id, 4))
+        self.assertEqual(sum(self.produto.fatias.values_list('quantidade', flat=True)), 3)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 3)
+    
+    def test_checkout_esgota_produto_fatiado(self):
+        """Testa se a baixa de estoque usa as fatias e não vende além da soma"""
+        from pedidos.estoque import EstoqueInsuficiente, baixar_estoque
+        from .fatias import fatiar
+        fatiar(self.produto, 3)
+        for _ in range(5):
+            baixar_estoque({self.produto.id: 2})
+        with self.assertRaises(EstoqueInsuficiente) as erro:
+            baixar_estoque({self.produto.id: 1})
+        self.assertEqual(erro.exception.faltas[0][2], 0)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 0)
+    
+    def test_reserva_ignora_produto_fatiado(self):
+        """Testa se o carrinho não reserva unidades de produto fatiado"""
+        from carrinho.reservas import reservar
+        from .fatias import fatiar
+        fatiar(self.produto, 2)
+        self.assertEqual(reservar('carrinho', self.produto.id, 3), 3)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.reservado, 0)
+    
+    def test_comando_rebalancear(self):
+        """Testa se o comando repõe e redistribui o estoque entre as fatias"""
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('rebalancear_estoque', self.produto.id, fatias=2, estoque=7, stdout=StringIO())
+        self.assertEqual(list(self.produto.fatias.values_list('quantidade', flat=True)), [4, 3])
+        call_command('rebalancear_estoque', self.produto.id, fatias=0, stdout=StringIO())
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.estoque, self.produto.fatias_estoque), (7, 0))
+        self.assertFalse(self.produto.fatias.exists())
+    
+    def test_leituras_usam_a_soma_das_fatias(self):
+        """Testa se API e carrinho mostram a soma das fatias, não a cópia em Produto.estoque"""
+        import json
+        from django.core.cache import cache
+        from django.db import transaction
+        from carrinho.cart import Carrinho
+        from .fatias import fatiar, retirar
+        cache.clear()
+        fatiar(self.produto, 2)
+        with transaction.atomic():
+            retirar(self.produto.id, 3)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 10)
+        
+        url = reverse('produtos:api_detalhe', args=[self.produto.id])
+        dados = json.loads(self.client.get(url, {'fields': 'id,estoque'}).content)
+        self.assertEqual(dados, {'id': self.produto.id, 'estoque': 7})
+        
+        request = self.client.get('/').wsgi_request
+        carrinho = Carrinho(request)
+        carrinho.adicionar(self.produto, quantidade=1)
+        self.assertEqual(carrinho.itens()[0]['produto'].estoque, 7)
+    
+    def test_importacao_redistribui_as_fatias(self):
+        """Testa se a importação muda o estoque de produto fatiado pelas fatias"""
+        from .fatias import fatiar
+        from .importacao import gravar_lote
+        fatiar(self.produto, 2)
+        valores = {
+            'nome': 'Console', 'descricao': 'Edição limitada', 'preco': Decimal('3000.00'),
+            'estoque': 10, 'disponivel': True, 'categoria_id': self.produto.categoria_id,
+        }
+        self.assertEqual(gravar_lote({'console': valores}), (0, 0))
+        self.assertEqual(gravar_lote({'console': dict(valores, estoque=5)}), (0, 1))
+        self.assertEqual(list(self.produto.fatias.values_list('quantidade', flat=True)), [3, 2])
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.estoque, self.produto.fatias_estoque), (5, 2))
+    
+    def test_admin_redistribui_as_fatias(self):
+        """Testa se alterar o estoque no admin refaz as fatias em vez de gravar só a cópia"""
+        from .fatias import fatiar
+        fatiar(self.produto, 2)
+        User.objects.create_superuser('admin', 'admin@exemplo.com', 'senha')
+        self.client.login(username='admin', password='senha')
+        url = reverse('admin:produtos_produto_change', args=[self.produto.id])
+        response = self.client.post(url, {
+            'nome': 'Console', 'slug': 'console', 'descricao': 'Edição limitada',
+            'preco': '3000.00', 'estoque': '9', 'fatias_estoque': '3',
+            'disponivel': 'on', 'categoria': self.produto.categoria_id,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(self.produto.fatias.values_list('quantidade', flat=True)), [3, 3, 3])
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.estoque, self.produto.fatias_estoque), (9, 3))
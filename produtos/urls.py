@@ -1,11 +1,14 @@
 # produtos/urls.py
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'produtos'
 
 urlpatterns = [
     path('', views.lista_produtos, name='lista'),
+    path('busca/', views.busca, name='busca'),
+    path('api/produtos/', api.produtos_api, name='api_lista'),
+    path('api/produtos/<int:id>/', api.produto_api, name='api_detalhe'),
     path('categoria/<slug:categoria_slug>/', views.lista_produtos, name='lista_por_categoria'),
     path('<int:id>/<slug:slug>/', views.detalhe_produto, name='detalhe'),
 ]
\ No newline at end of file
@@ -1,26 +1,67 @@
 # produtos/views.py
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404
-from .models import Categoria, Produto
+from django.views.decorators.http import condition
+from categorias.cache import ids_da_subarvore, obter_categoria_por_slug, obter_categorias
+from pedidos.ranking import mais_vendidos
+from pedidos.recomendacoes import comprados_junto
+from .busca import buscar_produtos
+from .condicional import etag_detalhe, etag_lista, modificacao_detalhe, modificacao_lista
+from .facetas import aplicar_filtros, contar_facetas, ler_filtros
+from .fatias import estoque_real
+from .models import Produto
+from .paginacao import paginar_keyset
 
+@condition(etag_func=etag_lista, last_modified_func=modificacao_lista)
 def lista_produtos(request, categoria_slug=None):
     categoria = None
-    categorias = Categoria.objects.all()
+    categorias = obter_categorias()
     produtos = Produto.objects.filter(disponivel=True)
     
     if categoria_slug:
-        categoria = get_object_or_404(Categoria, slug=categoria_slug)
-        produtos = produtos.filter(categoria=categoria)
+        categoria = obter_categoria_por_slug(categoria_slug)
+        if categoria is None:
+            raise Http404('Categoria não encontrada')
+        # A categoria e todas as descendentes, pelos ids da árvore em cache (sem JOIN)
+        produtos = produtos.filter(categoria_id__in=ids_da_subarvore(categoria))
+    
+    filtros = ler_filtros(request.GET)
+    produtos = aplicar_filtros(produtos, filtros)
+    
+    pagina = paginar_keyset(
+        produtos,
+        apos=request.GET.get('apos'),
+        antes=request.GET.get('antes'),
+        tamanho=request.GET.get('tamanho')
+    )
     
     return render(request, 'produtos/lista.html', {
         'categoria': categoria,
         'categorias': categorias,
-        'produtos': produtos
+        'produtos': pagina.produtos,
+        'pagina': pagina,
+        'filtros': filtros,
+        'facetas': contar_facetas(categorias, filtros, categoria),
+        'mais_vendidos': mais_vendidos(categoria=categoria)
     })
 
+@condition(etag_func=etag_detalhe, last_modified_func=modificacao_detalhe)
 def detalhe_produto(request, id, slug):
     produto = get_object_or_404(Produto, id=id, slug=slug, disponivel=True)
-    categorias = Categoria.objects.all()
+    estoque_real([produto])
+    categorias = obter_categorias()
     return render(request, 'produtos/detalhe.html', {
         'produto': produto,
+        'categorias': categorias,
+        'comprados_junto': comprados_junto(produto)
+    })
+
+def busca(request):
+    termo = request.GET.get('q', '').strip()
+    produtos = buscar_produtos(termo) if termo else []
+    categorias = obter_categorias()
+    return render(request, 'produtos/busca.html', {
+        'termo': termo,
+        'produtos': produtos,
         'categorias': categorias
-    })
\ No newline at end of file
+    })
@@ -0,0 +1,127 @@
+// static/js/script.js
+//
+// Carrinho sem recarregar a página.
+//
+// Formulários com data-carrinho-ajax (adicionar, atualizar e remover) são
+// enviados para a view AJAX indicada. A resposta traz só o que mudou: o
+// contador do cabeçalho e a linha do produto já renderizados, além do
+// total. Sem JavaScript, ou se a rede falhar antes de qualquer resposta,
+// o formulário segue o caminho normal (POST e redirecionamento para o
+// carrinho). Com resposta de erro não há reenvio, que repetiria a alteração.
+(function () {
+    'use strict';
+
+    function mostrarMensagem(texto, tipo) {
+        if (!texto) return;
+        let lista = document.querySelector('.messages');
+        if (!lista) {
+            lista = document.createElement('div');
+            lista.className = 'messages';
+            const principal = document.querySelector('.main-wrapper') || document.body;
+            principal.prepend(lista);
+        }
+        const alerta = document.createElement('div');
+        alerta.className = 'alert alert-' + tipo + ' alert-dismissible';
+        alerta.setAttribute('role', 'alert');
+
+        const conteudo = document.createElement('div');
+        conteudo.className = 'alert-content';
+        const span = document.createElement('span');
+        span.textContent = texto;
+        conteudo.appendChild(span);
+
+        const fechar = document.createElement('button');
+        fechar.type = 'button';
+        fechar.className = 'alert-close';
+        fechar.setAttribute('aria-label', 'Fechar alerta');
+        fechar.innerHTML = '<i class="bi bi-x"></i>';
+        fechar.addEventListener('click', function () { alerta.remove(); });
+
+        alerta.appendChild(conteudo);
+        alerta.appendChild(fechar);
+        lista.appendChild(alerta);
+    }
+
+    function trocarHtml(elemento, html) {
+        if (!elemento) return;
+        if (html) {
+            elemento.outerHTML = html.trim();
+        } else {
+            elemento.remove();
+        }
+    }
+
+    function aplicarResposta(form, dados) {
+        trocarHtml(document.getElementById('carrinhoContador'), dados.contador);
+
+        const linha = form.closest('[data-carrinho-linha]');
+        if (linha) {
+            trocarHtml(linha, dados.linha);
+            if (!document.querySelector('[data-carrinho-linha]')) {
+                // Carrinho vazio: a página mostra outro conteúdo
+                window.location.reload();
+                return;
+            }
+        }
+        document.querySelectorAll('[data-carrinho-total]').forEach(function (celula) {
+            celula.textContent = 'R$' + dados.total_formatado;
+        });
+
+        if (dados.aviso) {
+            mostrarMensagem(dados.aviso, 'warning');
+        } else if (!linha) {
+            mostrarMensagem(dados.message, 'success');
+        }
+    }
+
+    function enviar(form) {
+        const botao = form.querySelector('button[type="submit"]');
+        if (botao) botao.disabled = true;
+
+        fetch(form.dataset.carrinhoAjax, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            credentials: 'same-origin'
+        })
+            .then(function (resposta) {
+                if (botao) botao.disabled = false;
+                if (!resposta.ok) {
+                    // O servidor respondeu: reenviar o formulário poderia repetir a alteração
+                    mostrarMensagem('Não foi possível atualizar o carrinho. Recarregue a página.', 'error');
+                    return;
+                }
+                return resposta.json().then(function (dados) {
+                    if (dados.success) {
+                        aplicarResposta(form, dados);
+                    } else {
+                        mostrarMensagem(dados.error, 'error');
+                    }
+                }).catch(function () {
+                    // Alteração aplicada, mas a página não pôde ser atualizada: mostra o estado real
+                    window.location.reload();
+                });
+            }, function () {
+                // Falha de rede: a requisição não foi concluída, envia do jeito tradicional
+                form.submit();
+            });
+    }
+
+    document.addEventListener('submit', function (event) {
+        const form = event.target;
+        if (!form.dataset || !form.dataset.carrinhoAjax || !window.fetch) return;
+        event.preventDefault();
+        enviar(form);
+    }, true);
+
+    // Página restaurada pelo botão voltar: o contador pode estar desatualizado
+    window.addEventListener('pageshow', function (event) {
+        const contador = document.getElementById('carrinhoContador');
+        if (!event.persisted || !contador) return;
+        fetch(contador.dataset.url, { credentials: 'same-origin' })
+            .then(function (resposta) { return resposta.ok ? resposta.text() : ''; })
+            .then(function (html) {
+                if (html) trocarHtml(document.getElementById('carrinhoContador'), html);
+            });
+    });
+})();